@@ -36,6 +36,11 @@ try:
         from .server import browser_server
         return await browser_server.browse_directory(request)
     
+    @PromptServer.instance.routes.get('/browser/api/browse/stream')
+    async def browse_stream_route(request):
+        from .server import browser_server
+        return await browser_server.browse_stream(request)
+    
     @PromptServer.instance.routes.get('/browser/api/quick-access')
     async def quick_access_route(request):
         from .server import browser_server
@@ -51,6 +56,31 @@ try:
         from .server import browser_server
         return await browser_server.get_thumbnail(request)
     
+    @PromptServer.instance.routes.post('/browser/api/thumbnails')
+    async def thumbnails_batch_route(request):
+        from .server import browser_server
+        return await browser_server.get_thumbnails_batch(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/atlas')
+    async def atlas_route(request):
+        from .server import browser_server
+        return await browser_server.get_atlas(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/atlas/image')
+    async def atlas_image_route(request):
+        from .server import browser_server
+        return await browser_server.get_atlas_image(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/prewarm')
+    async def prewarm_status_route(request):
+        from .server import browser_server
+        return await browser_server.get_prewarm_status(request)
+    
+    @PromptServer.instance.routes.post('/browser/api/prewarm/cancel')
+    async def prewarm_cancel_route(request):
+        from .server import browser_server
+        return await browser_server.cancel_prewarm(request)
+    
     @PromptServer.instance.routes.get('/browser/api/image')
     async def image_route(request):
         from .server import browser_server
@@ -66,6 +96,56 @@ try:
         from .server import browser_server
         return await browser_server.get_metadata(request)
     
+    @PromptServer.instance.routes.get('/browser/api/metadata/{resource}')
+    async def metadata_resource_route(request):
+        from .server import browser_server
+        return await browser_server.get_metadata_resource(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/search')
+    async def search_route(request):
+        from .server import browser_server
+        return await browser_server.search_files(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/prompt-search')
+    async def prompt_search_route(request):
+        from .server import browser_server
+        return await browser_server.search_prompts(request)
+    
+    @PromptServer.instance.routes.post('/browser/api/reindex')
+    async def reindex_route(request):
+        from .server import browser_server
+        return await browser_server.reindex(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/index')
+    async def index_status_route(request):
+        from .server import browser_server
+        return await browser_server.get_index_status(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/cache-stats')
+    async def cache_stats_route(request):
+        from .server import browser_server
+        return await browser_server.get_cache_stats(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/duplicates')
+    async def duplicates_route(request):
+        from .server import browser_server
+        return await browser_server.get_duplicates(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/similar')
+    async def similar_route(request):
+        from .server import browser_server
+        return await browser_server.get_similar(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/near-duplicates')
+    async def near_duplicates_route(request):
+        from .server import browser_server
+        return await browser_server.get_near_duplicates(request)
+    
+    @PromptServer.instance.routes.get('/browser/api/ws')
+    async def live_updates_route(request):
+        from .server import browser_server
+        return await browser_server.live_updates_socket(request)
+    
     print("[CatSee浏览器] 路由直接注册成功")
 except Exception as e:
     print(f"[CatSee浏览器] 直接路由注册失败: {e}")
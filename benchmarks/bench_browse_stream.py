@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+流式浏览基准测试：完整列表（扫描+排序+序列化）vs NDJSON流式输出的首屏时间和峰值内存
+
+用法:
+    python benchmarks/bench_browse_stream.py [文件数量] [--dir 已有目录]
+
+不指定 --dir 时在临时目录中生成空的png文件。两种方式都绕过目录列表缓存
+（冷扫描），峰值内存用 tracemalloc 单独统计。
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import itertools
+import contextlib
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from json_codec import json_codec
+from dir_listing import listing_cache
+from file_manager import file_manager
+from server import BROWSE_STREAM_FIRST_BATCH, BROWSE_STREAM_BATCH
+
+
+def full_listing(directory):
+    listing_cache.clear()
+    start = time.perf_counter()
+    result = file_manager.browse_directory(directory)
+    json_codec.dumps({"success": True, "data": result})
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, elapsed
+
+
+def streamed(directory):
+    listing_cache.clear()
+    start = time.perf_counter()
+    records = file_manager.stream_directory(directory)
+    first = None
+    count = BROWSE_STREAM_FIRST_BATCH
+    while True:
+        batch = list(itertools.islice(records, count))
+        b"".join(json_codec.dumps(record) + b"\n" for record in batch)
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+        if len(batch) < count:
+            break
+        count = BROWSE_STREAM_BATCH
+    return first, (time.perf_counter() - start) * 1000
+
+
+def run(label, func, directory):
+    # 扫描时的日志输出不计入；tracemalloc 会显著拖慢执行，计时和测内存分开跑
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        first, total = func(directory)
+        tracemalloc.start()
+        func(directory)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(f"{label:<8} first records {first:9.1f} ms   total {total:9.1f} ms   peak {peak / 1024 / 1024:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=100000)
+    parser.add_argument("--dir", help="使用已有目录")
+    args = parser.parse_args()
+
+    tmp = None
+    directory = args.dir
+    if directory is None:
+        tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+        directory = tmp
+        for i in range(args.count):
+            open(os.path.join(directory, f"ComfyUI_{i:06d}_.png"), "wb").close()
+    try:
+        print(f"Directory: {directory} ({len(os.listdir(directory))} entries)")
+        run("full", full_listing, directory)
+        run("stream", streamed, directory)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+ComfyUI图分析基准测试：不同规模工作流的单次遍历分析耗时
+
+用法:
+    python benchmarks/bench_comfy_graph.py [--sizes 50,300,1000] [--workflow 文件.json ...]
+
+合成的prompt/workflow按真实工作流的节点构成生成（加载器、LoRA链、ControlNet、
+多组CLIPTextEncode/KSampler、自定义文本节点、放大节点）；也可以用 --workflow
+传入从ComfyUI导出的PNG或API格式JSON。输出 analyze 以及完整的
+FileManager._parse_png_text（含JSON解析）每次的耗时。
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comfy_graph import graph_analyzer
+from file_manager import file_manager
+
+WORDS = "masterpiece best quality detailed cyberpunk neon girl rain city night cinematic lighting".split()
+
+
+def make_graph(size, seed=0):
+    """生成 size 个节点的 (prompt, workflow)"""
+    rng = random.Random(seed)
+    prompt = {}
+    nodes = []
+
+    def add(class_type, inputs):
+        node_id = str(len(prompt) + 1)
+        prompt[node_id] = {"class_type": class_type, "inputs": inputs}
+        nodes.append({"id": int(node_id), "type": class_type, "widgets_values": list(inputs.values())[:4]})
+        return [node_id, 0]
+
+    model = add("CheckpointLoaderSimple", {"ckpt_name": "sdxl/juggernaut.safetensors"})
+    add("VAELoader", {"vae_name": "sdxl_vae.safetensors"})
+    while len(prompt) < size:
+        kind = rng.random()
+        if kind < 0.15:
+            model = add("LoraLoader", {"lora_name": f"style_{len(prompt)}.safetensors", "strength_model": 0.8,
+                                       "strength_clip": 0.8, "model": model, "clip": model})
+        elif kind < 0.2:
+            add("ControlNetLoader", {"control_net_name": "canny.safetensors"})
+        elif kind < 0.5:
+            add("CLIPTextEncode", {"text": ", ".join(rng.sample(WORDS, 6)), "clip": model})
+        elif kind < 0.6:
+            add("ShowText|pysssss", {"text": [str(rng.randint(1, len(prompt))), 0]})
+        elif kind < 0.7:
+            add("UpscaleModelLoader", {"model_name": "4x-UltraSharp.pth"})
+        elif kind < 0.85:
+            add("KSampler", {"seed": rng.randrange(1 << 32), "steps": 30, "cfg": 6.5, "sampler_name": "dpmpp_2m",
+                             "scheduler": "karras", "denoise": 1.0, "model": model,
+                             "positive": ["3", 0], "negative": ["4", 0], "latent_image": ["5", 0]})
+        else:
+            add("ImageScaleBy", {"upscale_method": "lanczos", "scale_by": 1.5, "image": ["6", 0]})
+    return prompt, {"nodes": nodes, "links": [], "version": 0.4}
+
+
+def load_graph(path):
+    """从PNG文本块或JSON文件读取 (prompt, workflow)"""
+    if path.lower().endswith(".png"):
+        from png_chunks import read_png_text
+        text = read_png_text(path)["text"]
+        return json.loads(text.get("prompt", "null")), json.loads(text.get("workflow", "null"))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "nodes" in data:
+        return None, data
+    return data, None
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="50,300,1000,3000")
+    parser.add_argument("--workflow", action="append", default=[], help="真实工作流（PNG或JSON）")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    graphs = [(f"synthetic {size}", *make_graph(int(size))) for size in args.sizes.split(",")]
+    graphs += [(os.path.basename(path), *load_graph(path)) for path in args.workflow]
+
+    print(f"{'graph':<22} {'nodes':>6} {'analyze ms':>11} {'parse_png_text ms':>18}")
+    for label, prompt, workflow in graphs:
+        png_info = {}
+        if prompt is not None:
+            png_info["prompt"] = json.dumps(prompt)
+        if workflow is not None:
+            png_info["workflow"] = json.dumps(workflow)
+        analyze_ms = measure(lambda: graph_analyzer.analyze(prompt, workflow), args.repeat)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            parse_ms = measure(lambda: file_manager._parse_png_text({}, png_info), args.repeat)
+        nodes = len(prompt) if isinstance(prompt, dict) else len((workflow or {}).get("nodes", []))
+        print(f"{label:<22} {nodes:>6} {analyze_ms:11.3f} {parse_ms:18.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩基准测试：目录列表和工作流JSON在各编码下的体积与耗时
+
+用法:
+    python benchmarks/bench_compression.py [条目数量]
+
+生成与 browse 接口相同结构的合成目录列表，以及一个较大的ComfyUI工作流，
+对每种可用编码（gzip，以及安装了的 br、zstd）输出压缩后体积、压缩比
+和一次压缩的耗时；另外统计流式输出（每块sync flush）的体积。
+"""
+import sys
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_compression import ResponseCompressor
+from bench_comfy_graph import make_graph
+
+
+def make_listing(count):
+    items = []
+    for i in range(count):
+        path = f"/data/ComfyUI/output/2024-06-01/ComfyUI_{i:05d}_.png"
+        items.append({
+            "name": f"ComfyUI_{i:05d}_.png",
+            "path": path,
+            "relative_path": f"2024-06-01/ComfyUI_{i:05d}_.png",
+            "size": 1500000 + i * 37,
+            "type": "image",
+            "extension": ".png",
+            "created_time": 1717200000.0 + i,
+            "modified_time": 1717200000.0 + i,
+            "hash": hashlib.md5(path.encode()).hexdigest(),
+            "is_folder": False
+        })
+    return {"success": True, "data": {"items": items, "total": count, "page": 1, "per_page": 10000,
+                                      "current_path": "/data/ComfyUI/output/2024-06-01", "parent_path": None}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    compressor = ResponseCompressor()
+    listing = make_listing(args.count)
+    _, workflow = make_graph(1000)
+    payloads = [
+        (f"listing {args.count}", json.dumps(listing).encode()),
+        ("workflow 1000 nodes", json.dumps({"success": True, "data": workflow}).encode()),
+    ]
+
+    print(f"encodings: {', '.join(compressor.encodings)}")
+    print(f"{'payload':<22} {'encoding':<9} {'bytes':>10} {'ratio':>7} {'ms':>8}")
+    for label, data in payloads:
+        print(f"{label:<22} {'identity':<9} {len(data):>10} {1.0:7.2f} {0.0:8.2f}")
+        for encoding in compressor.encodings:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                body = compressor.compress(data, encoding)
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:<22} {encoding:<9} {len(body):>10} {len(data) / len(body):7.2f} {best:8.2f}")
+
+    # 流式输出：每 stream_chunk_items 个条目 flush 一次
+    items = listing["data"]["items"]
+    chunk = compressor.stream_chunk_items
+    for encoding in compressor.encodings:
+        stream = compressor.compressobj(encoding)
+        size = 0
+        for start in range(0, len(items), chunk):
+            size += len(stream.compress(json.dumps(items[start:start + chunk]).encode()))
+            size += len(stream.flush())
+        size += len(stream.finish())
+        print(f"{'listing (streamed)':<22} {encoding:<9} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
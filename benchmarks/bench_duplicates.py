@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+查重基准测试：逐个完整读取文件计算MD5 vs 大小+部分哈希预筛选（首次/复用保存的哈希）
+
+用法:
+    python benchmarks/bench_duplicates.py [文件数量] [--size-kb 2048] [--dup-ratio 0.1]
+
+在临时目录中生成随机内容的png文件（大小在 size-kb 附近随机，部分大小相同但内容
+不同），其中 dup-ratio 比例的文件是其他文件的副本。
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from content_hash import ContentHasher
+from dir_listing import walk_directory
+
+
+def make_tree(directory, count, size_kb, dup_ratio, seed=0):
+    rng = random.Random(seed)
+    sources = []
+    for i in range(count):
+        path = os.path.join(directory, f"sub{i % 10}", f"ComfyUI_{i:06d}_.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if sources and rng.random() < dup_ratio:
+            shutil.copyfile(rng.choice(sources), path)
+            continue
+        # 大小取整到4KB，制造大小相同但内容不同的文件
+        size = max(4096, int(rng.gauss(size_kb, size_kb / 4)) // 4 * 4096)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        sources.append(path)
+
+
+def legacy(directory, type_map):
+    """旧做法：每个文件 md5(f.read())，按哈希分组"""
+    groups = {}
+    for item in walk_directory(directory, type_map):
+        with open(item["path"], "rb") as f:
+            groups.setdefault(hashlib.md5(f.read()).hexdigest(), []).append(item["path"])
+    return sum(1 for paths in groups.values() if len(paths) > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--dup-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+    type_map = {".png": "image"}
+    try:
+        make_tree(tmp, args.count, args.size_kb, args.dup_ratio)
+        total = sum(item["size"] for item in walk_directory(tmp, type_map))
+        print(f"{args.count} files, {total / 1024 / 1024:.0f} MB (page cache warm)")
+
+        start = time.perf_counter()
+        groups = legacy(tmp, type_map)
+        print(f"{'legacy full read':<22} {(time.perf_counter() - start) * 1000:9.1f} ms   "
+              f"read {total / 1024 / 1024:8.1f} MB   groups {groups}")
+
+        hasher = ContentHasher(db_path=os.path.join(tmp, "hashes.sqlite3"), options={})
+        for label in ("prefilter (first)", "prefilter (stored)"):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = hasher.find_duplicates([tmp], type_map)
+            stats = result["stats"]
+            print(f"{label:<22} {stats['seconds'] * 1000:9.1f} ms   "
+                  f"read {stats['bytes_read'] / 1024 / 1024:8.1f} MB   groups {stats['groups']}")
+        hasher.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+目录列表基准测试：旧的 Path.iterdir 实现 vs os.scandir 列表引擎
+
+用法:
+    python benchmarks/bench_listing.py [文件数量] [--dir 已有目录]
+
+不指定 --dir 时在临时目录中生成空文件（png/json/mp4 混合，另加10%不支持的扩展名）。
+输出每种实现的总耗时和每个条目的平均开销。
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dir_listing import list_directory, build_type_map, ALLOWED_EXTENSIONS
+
+IMAGES = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tiff"]
+VIDEOS = [".mp4", ".avi", ".mov", ".mkv", ".webm"]
+WORKFLOWS = [".json"]
+
+
+def legacy_list(dir_path, outputs_dir):
+    """重现旧版 browse_directory 的扫描逻辑（每个文件约5-6次系统调用+md5）"""
+    items = []
+    for item in dir_path.iterdir():
+        if item.is_dir():
+            items.append({
+                "name": item.name,
+                "path": str(item),
+                "type": "folder",
+                "size": 0,
+                "modified_time": item.stat().st_mtime,
+                "created_time": item.stat().st_ctime,
+                "is_folder": True
+            })
+        elif item.is_file():
+            ext = item.suffix.lower()
+            if ext not in ALLOWED_EXTENSIONS:
+                continue
+            stat = item.stat()
+            # 旧版每个文件都调用 config.get_outputs_dir()（包含mkdir）
+            outputs_dir.mkdir(parents=True, exist_ok=True)
+            if outputs_dir in item.parents:
+                relative_path = str(item.relative_to(outputs_dir))
+            else:
+                relative_path = str(item)
+            st = item.stat()
+            file_hash = hashlib.md5(f"{item}_{st.st_size}_{st.st_mtime}".encode()).hexdigest()
+            items.append({
+                "name": item.name,
+                "path": str(item),
+                "relative_path": relative_path,
+                "size": stat.st_size,
+                "extension": ext,
+                "created_time": stat.st_ctime,
+                "modified_time": stat.st_mtime,
+                "hash": file_hash,
+                "is_folder": False
+            })
+    return items
+
+
+def make_tree(root, count):
+    exts = [".png"] * 6 + [".json", ".mp4", ".webp", ".txt"]
+    for i in range(count):
+        open(os.path.join(root, f"ComfyUI_{i:06d}_{exts[i % len(exts)]}"), "wb").close()
+    for i in range(max(1, count // 1000)):
+        os.mkdir(os.path.join(root, f"folder_{i}"))
+
+
+def bench(label, func, entries, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_entry = best / max(1, entries) * 1e6
+    print(f"{label:<10} {best * 1000:9.1f} ms   {per_entry:6.2f} us/entry   ({len(result)} items)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=20000)
+    parser.add_argument("--dir", help="使用已有目录而不是生成临时文件")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.dir:
+        root = Path(args.dir)
+    else:
+        tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+        root = Path(tmp)
+        make_tree(tmp, args.count)
+
+    try:
+        entries = len(os.listdir(root))
+        outputs_dir = root.parent
+        type_map = build_type_map(IMAGES, VIDEOS, WORKFLOWS)
+        print(f"Directory: {root} ({entries} entries)")
+        old = bench("iterdir", lambda: legacy_list(root, outputs_dir), entries, args.repeat)
+        new = bench("scandir", lambda: list_directory(root, type_map, outputs_dir)[0], entries, args.repeat)
+        print(f"speedup    {old / new:9.2f}x")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
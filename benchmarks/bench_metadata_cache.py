@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+元数据缓存基准测试：get_file_metadata 冷读取 vs 内存命中 vs 磁盘溢出命中
+
+用法:
+    python benchmarks/bench_metadata_cache.py [图片数量] [--nodes 300]
+
+生成带大型ComfyUI工作流文本块的PNG，模拟在预览面板里来回切换图片：
+第一轮全部未命中，第二轮命中内存缓存；再用很小的内存预算重跑一次，
+让条目溢出到磁盘后测磁盘命中的耗时。
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, PngImagePlugin
+
+from config import config
+
+_tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+config.get_temp_dir = lambda: Path(_tmp) / "temp"
+
+import file_manager as file_manager_module
+from metadata_cache import MetadataCache
+from file_manager import file_manager
+
+
+def make_images(folder, count, nodes):
+    rng = random.Random(0)
+    paths = []
+    for i in range(count):
+        prompt = {}
+        for n in range(nodes):
+            if n % 3 == 0:
+                prompt[str(n)] = {"class_type": "KSampler", "inputs": {
+                    "seed": rng.randrange(1 << 32), "steps": 20, "cfg": 7.0,
+                    "sampler_name": "euler", "scheduler": "normal",
+                    "positive": [str(n + 1), 0], "negative": [str(n + 2), 0]}}
+            else:
+                prompt[str(n)] = {"class_type": "CLIPTextEncode", "inputs": {
+                    "text": " ".join(rng.choice(["neon", "city", "girl", "rain", "cat"]) for _ in range(30))}}
+        workflow = {"nodes": [{"id": n, "type": "Node", "widgets_values": [n] * 10} for n in range(nodes)],
+                    "links": [], "version": 0.4}
+        info = PngImagePlugin.PngInfo()
+        info.add_text("prompt", json.dumps(prompt))
+        info.add_text("workflow", json.dumps(workflow))
+        path = os.path.join(folder, f"ComfyUI_{i:05d}_.png")
+        Image.new("RGB", (512, 512)).save(path, pnginfo=info)
+        paths.append(path)
+    return paths
+
+
+def run(paths):
+    # 元数据提取会打印大量调试日志，计时期间丢弃输出
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for path in paths:
+            file_manager.get_file_metadata(path, metadata_only=True)
+        return (time.perf_counter() - start) * 1000 / len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=200)
+    parser.add_argument("--nodes", type=int, default=300, help="合成工作流的节点数")
+    args = parser.parse_args()
+
+    try:
+        folder = os.path.join(_tmp, "images")
+        os.makedirs(folder)
+        paths = make_images(folder, args.count, args.nodes)
+        print(f"{args.count} images, {sum(os.path.getsize(p) for p in paths) / len(paths) / 1024:.0f} KB each")
+
+        # 替换 file_manager 使用的全局缓存实例
+        cache = MetadataCache(spill=False)
+        file_manager_module.metadata_cache = cache
+        cold = run(paths)
+        warm = run(paths)
+        print(f"cold (miss)      {cold:8.3f} ms/file")
+        print(f"memory hit       {warm:8.3f} ms/file  ({cache.stats()['bytes'] / 1024:.0f} KB cached)")
+
+        # 内存只放得下一个条目，其余都溢出到磁盘
+        cache = MetadataCache(max_bytes=1, spill=True)
+        file_manager_module.metadata_cache = cache
+        run(paths)
+        spilled = run(paths)
+        stats = cache.stats()
+        print(f"disk spill hit   {spilled:8.3f} ms/file  (spill hits {stats['spill_hits']}, misses {stats['misses']})")
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+搜索基准测试：旧的 scan_directory 全量扫描 vs SQLite元数据索引
+
+用法:
+    python benchmarks/bench_metadata_index.py [文件数量] [--dir 已有输出目录] [--legacy]
+
+不指定 --dir 时生成带ComfyUI prompt文本块的小PNG（分布在多个子目录中）。
+输出索引冷启动构建、无变化时增量reindex、以及几类查询的耗时。
+--legacy 同时测量旧版 search_files（打开每张图片、解析文本块并生成缩略图）。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+CHECKPOINTS = ["sd_xl_base_1.0.safetensors", "dreamshaper_8.safetensors", "flux1-dev.safetensors"]
+SAMPLERS = ["euler", "dpmpp_2m", "euler_ancestral"]
+
+
+def make_prompt(i):
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": CHECKPOINTS[i % 3]}},
+        "10": {"class_type": "LoraLoader", "inputs": {"lora_name": f"style_{i % 7}.safetensors",
+                                                      "model": ["4", 0], "clip": ["4", 1]}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": f"a cat number {i}, masterpiece", "clip": ["10", 1]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "blurry, lowres", "clip": ["10", 1]}},
+        "3": {"class_type": "KSampler", "inputs": {
+            "seed": i, "steps": 20 + i % 10, "cfg": 7.0, "sampler_name": SAMPLERS[i % 3],
+            "scheduler": "karras", "denoise": 1.0,
+            "model": ["10", 0], "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0]}},
+    }
+
+
+def make_tree(root, count):
+    img = Image.new("RGB", (64, 64), (120, 80, 200))
+    for i in range(count):
+        sub = os.path.join(root, f"2024-01-{i % 28 + 1:02d}")
+        os.makedirs(sub, exist_ok=True)
+        info = PngInfo()
+        info.add_text("prompt", json.dumps(make_prompt(i)))
+        info.add_text("workflow", json.dumps({"nodes": [{"type": "KSampler"}] * 20}))
+        img.save(os.path.join(sub, f"ComfyUI_{i:06d}_.png"), pnginfo=info)
+
+
+def timed(label, func, repeat=1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    size = len(result) if isinstance(result, list) else ""
+    print(f"{label:<34} {best * 1000:10.1f} ms  {size}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=5000)
+    parser.add_argument("--dir", help="使用已有目录而不是生成临时文件")
+    parser.add_argument("--legacy", action="store_true", help="同时测量旧版全量扫描搜索")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+    if args.dir:
+        root = os.path.abspath(args.dir)
+    else:
+        root = os.path.join(tmp, "output")
+        os.makedirs(root)
+        print(f"Generating {args.count} PNG files...")
+        make_tree(root, args.count)
+
+    from config import config
+    config.config["outputs"] = root
+    config.config["temp"] = os.path.join(tmp, "temp")
+    from file_manager import file_manager
+    from metadata_index import MetadataIndex
+
+    try:
+        index = MetadataIndex(db_path=os.path.join(tmp, "index.sqlite3"))
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            stats = index.reindex(root, file_manager.type_map)
+            cold = time.perf_counter() - start
+        print(f"{'reindex (cold)':<34} {cold * 1000:10.1f} ms  {stats['added']} files")
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            index.reindex(root, file_manager.type_map)
+            warm = time.perf_counter() - start
+        print(f"{'reindex (no changes)':<34} {warm * 1000:10.1f} ms")
+
+        timed("search name '00012'", lambda: index.search("00012"), repeat=5)
+        timed("search all images", lambda: index.search(file_type="image"), repeat=5)
+        timed("search checkpoint=flux", lambda: index.search(checkpoint="flux"), repeat=5)
+        timed("search prompts='number 42'", lambda: index.search(prompts="number 42"), repeat=5)
+        timed("search seed=1234", lambda: index.search(seed=1234), repeat=5)
+        timed("search page (limit 100)", lambda: index.search(limit=100, offset=100), repeat=5)
+
+        if args.legacy:
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                start = time.perf_counter()
+                files = file_manager.scan_directory(root, metadata=True)
+                files = [f for f in files if "00012" in f["name"].lower()]
+                legacy = time.perf_counter() - start
+            print(f"{'legacy scan_directory search':<34} {legacy * 1000:10.1f} ms  {len(files)}")
+        index.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+分页基准测试：每次请求重新排序+切片 vs 缓存的排序视图（偏移/游标）
+
+用法:
+    python benchmarks/bench_pagination.py [文件数量] [--per-page 200]
+
+在内存中生成目录条目（不涉及磁盘扫描），对 name/mtime 两种排序分别测：
+旧做法每次请求对整个列表排序再按页码切片；新做法首次请求建立排序视图，
+之后的浅页、深页、游标翻页都只是二分查找加切片。
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dir_listing import DirectoryListing, SORT_KEYS, normalize_sort, encode_cursor, decode_cursor
+
+
+def make_items(count, seed=0):
+    rng = random.Random(seed)
+    items = [{"name": f"dir_{i}", "path": f"/out/dir_{i}", "type": "folder", "size": 0,
+              "modified_time": rng.uniform(1.7e9, 1.72e9), "is_folder": True} for i in range(count // 100)]
+    for i in range(count):
+        name = f"ComfyUI_{rng.randrange(10 ** 8):08d}_.png"
+        items.append({"name": name, "path": f"/out/{name}", "type": "image", "extension": ".png",
+                      "size": rng.randrange(10 ** 7), "modified_time": rng.uniform(1.7e9, 1.72e9),
+                      "is_folder": False})
+    return items
+
+
+def legacy_page(items, sort, order, page, per_page):
+    """每次请求都排序整个列表再切片"""
+    key = SORT_KEYS[sort]
+    folders = sorted((item for item in items if item["is_folder"]), key=key, reverse=order == "desc")
+    files = sorted((item for item in items if not item["is_folder"]), key=key, reverse=order == "desc")
+    ordered = folders + files
+    start = (page - 1) * per_page
+    return ordered[start:start + per_page]
+
+
+def measure(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=100000)
+    parser.add_argument("--per-page", type=int, default=200)
+    args = parser.parse_args()
+
+    items = make_items(args.count)
+    per_page = args.per_page
+    deep_page = len(items) // per_page - 1
+    print(f"{len(items)} items, {per_page} per page, deep page = {deep_page}")
+    print(f"{'sort':<12} {'operation':<26} {'ms':>9}")
+
+    for sort in ("name", "mtime"):
+        sort, order = normalize_sort(sort)
+        label = f"{sort} {order}"
+        print(f"{label:<12} {'legacy page 1':<26} {measure(lambda: legacy_page(items, sort, order, 1, per_page)):9.3f}")
+        print(f"{label:<12} {'legacy deep page':<26} "
+              f"{measure(lambda: legacy_page(items, sort, order, deep_page, per_page)):9.3f}")
+
+        listing = DirectoryListing(items, {}, 0, 0)
+        start = time.perf_counter()
+        view = listing.sorted_view(sort, order)
+        print(f"{label:<12} {'build view (once)':<26} {(time.perf_counter() - start) * 1000:9.3f}")
+        offset = deep_page * per_page
+        print(f"{label:<12} {'cached deep page (offset)':<26} "
+              f"{measure(lambda: view.items[offset:offset + per_page]):9.3f}")
+
+        cursor = encode_cursor(sort, order, None, view.items[offset - 1])
+
+        def cursor_page():
+            position = decode_cursor(cursor)["position"]
+            begin = view.index_after(position)
+            return view.items[begin:begin + per_page]
+        assert cursor_page() == view.items[offset:offset + per_page]
+        print(f"{label:<12} {'cached deep page (cursor)':<26} {measure(cursor_page):9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+PNG元数据读取基准测试：Image.open + img.info（以及旧的"元数据+缩略图"路径）vs 只读文本块
+
+用法:
+    python benchmarks/bench_png_metadata.py [图片数量] [--size 4000x3000]
+
+生成带ComfyUI prompt/workflow文本块的大尺寸PNG，分别统计：
+  pillow     Image.open + img.info（解析到第一个IDAT为止）
+  pillow+thumb  旧的元数据接口：img.info + 解码像素生成缩略图
+  chunks     png_chunks.read_png_text（按块seek，只读IHDR和文本块）
+输出每张图的平均耗时和读取字节数（Linux下取 /proc/self/io 的 rchar）。
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, PngImagePlugin
+
+from png_chunks import read_png_text
+
+
+def make_workflow(nodes, rng):
+    prompt = {}
+    for i in range(nodes):
+        prompt[str(i)] = {
+            "class_type": rng.choice(["KSampler", "CLIPTextEncode", "VAEDecode", "LoraLoader"]),
+            "inputs": {"text": " ".join(rng.choice("abcdefgh") * 6 for _ in range(20)), "seed": i},
+        }
+    workflow = {"nodes": [{"id": i, "type": "Node", "widgets_values": [i] * 10} for i in range(nodes)]}
+    return json.dumps(prompt), json.dumps(workflow)
+
+
+def make_images(folder, count, size, nodes):
+    rng = random.Random(0)
+    # 噪声图：压缩后接近真实生成图的体积
+    noise = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    paths = []
+    for i in range(count):
+        prompt, workflow = make_workflow(nodes, rng)
+        info = PngImagePlugin.PngInfo()
+        info.add_text("prompt", prompt)
+        info.add_text("workflow", workflow)
+        path = os.path.join(folder, f"ComfyUI_{i:05d}_.png")
+        noise.save(path, pnginfo=info, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def read_rchar():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def pillow_info(path):
+    with Image.open(path) as img:
+        return dict(img.info)
+
+
+def pillow_thumbnail(path):
+    with Image.open(path) as img:
+        info = dict(img.info)
+        img.thumbnail((256, 256))
+        return info
+
+
+def chunks(path):
+    return read_png_text(path)["text"]
+
+
+def measure(func, paths):
+    before = read_rchar()
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = (time.perf_counter() - start) * 1000 / len(paths)
+    after = read_rchar()
+    read = (after - before) / len(paths) if before is not None and after is not None else None
+    return elapsed, read
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=20)
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--nodes", type=int, default=200, help="合成工作流的节点数")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+    try:
+        paths = make_images(tmp, args.count, size, args.nodes)
+        file_size = sum(os.path.getsize(p) for p in paths) / len(paths)
+        print(f"{args.count} images {size[0]}x{size[1]}, {file_size / 1024 / 1024:.1f} MB each")
+
+        for path in paths:
+            text = read_png_text(path)["text"]
+            assert text == {k: v for k, v in pillow_info(path).items() if isinstance(v, str)}
+
+        print(f"{'method':<14} {'ms/image':>10} {'KB read/image':>14}")
+        for label, func in (("pillow", pillow_info), ("pillow+thumb", pillow_thumbnail), ("chunks", chunks)):
+            func(paths[0])  # 预热导入和页缓存
+            elapsed, read = measure(func, paths)
+            read_text = f"{read / 1024:14.1f}" if read is not None else f"{'n/a':>14}"
+            print(f"{label:<14} {elapsed:10.2f} {read_text}")
+        print(f"chunks bytes_read (parser): {read_png_text(paths[0])['bytes_read'] / 1024:.1f} KB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+提示词全文搜索基准测试：FTS5倒排索引 vs LIKE全表扫描
+
+用法:
+    python benchmarks/bench_prompt_search.py [条目数量]
+
+直接向临时数据库写入合成的索引行（中英文混合提示词，不生成图片），
+输出建索引耗时和各类查询（词、短语、前缀、中文、排除、翻页）的延迟。
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metadata_index import MetadataIndex
+
+ENGLISH = ("masterpiece best quality cyberpunk alley neon rain night city girl boy cat dog portrait "
+           "landscape mountain river forest sunset detailed lighting cinematic bokeh studio anime "
+           "realistic photo watercolor oil painting futuristic robot castle dragon flower").split()
+CHINESE = ["赛博朋克", "霓虹灯", "小巷", "雨夜", "城市", "少女", "猫咪", "山水", "水墨画", "古风",
+           "机甲", "樱花", "夕阳", "森林", "精致细节", "电影感"]
+NEGATIVE = "lowres, bad anatomy, blurry, worst quality, 模糊, 低质量".split(", ")
+
+QUERIES = [
+    ("word", "cyberpunk"),
+    ("two words", "neon girl"),
+    ("phrase", '"cyberpunk alley"'),
+    ("prefix", "cyber*"),
+    ("chinese", "赛博朋克"),
+    ("mixed", "赛博朋克 neon"),
+    ("exclude", "cat -dog"),
+    ("rare", "dragon castle watercolor"),
+]
+
+
+def make_rows(count, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    now = time.time()
+    for i in range(count):
+        words = rng.sample(ENGLISH, 8) + rng.sample(CHINESE, 2)
+        rng.shuffle(words)
+        path = f"/bench/output/{i // 1000:04d}/ComfyUI_{i:07d}_.png"
+        rows.append({
+            "path": path,
+            "name": os.path.basename(path),
+            "relative_path": path[len("/bench/output/"):],
+            "directory": os.path.dirname(path),
+            "type": "image",
+            "extension": ".png",
+            "size": 1000,
+            "modified_time": now - i,
+            "created_time": now - i,
+            "hash": f"{i:032x}",
+            "indexed_at": now,
+            "width": 1024, "height": 1024,
+            "checkpoint": None, "loras": None, "sampler": None, "scheduler": None,
+            "seed": i, "steps": 20, "cfg": 7.0,
+            "positive_prompt": ", ".join(words),
+            "negative_prompt": ", ".join(rng.sample(NEGATIVE, 3)),
+            "prompts": None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+    try:
+        index = MetadataIndex(db_path=os.path.join(tmp, "index.sqlite3"))
+        rows = make_rows(args.count)
+        start = time.perf_counter()
+        for i in range(0, len(rows), 1000):
+            index._write(rows[i:i + 1000])
+        print(f"build {args.count} rows (files + FTS): {time.perf_counter() - start:.2f} s "
+              f"(FTS5 {'available' if index.prompt_index.available else 'unavailable'})")
+
+        conn = index._connect()
+        print(f"{'query':<12} {'expression':<28} {'hits':>7} {'fts ms':>8} {'like ms':>8}")
+        for label, query in QUERIES:
+            best = None
+            for _ in range(args.repeat):
+                result = index.search_prompts(query, page=2, per_page=50)
+                best = result["took_ms"] if best is None else min(best, result["took_ms"])
+            start = time.perf_counter()
+            _, like_total = index.prompt_index._search_like(conn, query, "all", 50, 50)
+            like_ms = (time.perf_counter() - start) * 1000
+            print(f"{label:<12} {query:<28} {result['total']:>7} {best:8.2f} {like_ms:8.2f}"
+                  + ("" if like_total == result["total"] else f"  (like: {like_total})"))
+        index.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+递归扫描基准测试：旧的 glob("**/*") + 逐个 is_file/stat vs 并行 walk_directory
+
+用法:
+    python benchmarks/bench_scan_directory.py [目录数] [--files 100] [--dir 已有目录]
+
+不指定 --dir 时在临时目录中生成两层子目录，每个目录 files 个空png文件和同样数量的
+不显示的文件（.txt/.safetensors 等，测试扩展名在stat之前剪枝）。只比较遍历和
+轻量条目；元数据提取（enrich_files）是单独的阶段，不在这里计时。
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dir_listing import walk_directory
+from file_manager import file_manager
+
+
+def legacy(root):
+    """旧 scan_directory 的遍历部分：glob + is_file + 类型判断 + stat（不提取元数据）"""
+    files = []
+    for path in Path(root).glob("**/*"):
+        if path.is_file() and file_manager._get_file_type(path) != "unknown":
+            st = path.stat()
+            files.append({"path": str(path), "size": st.st_size, "modified_time": st.st_mtime})
+    files.sort(key=lambda x: x["modified_time"], reverse=True)
+    return files
+
+
+def walked(root, workers):
+    start = time.perf_counter()
+    first = None
+    files = []
+    for record in walk_directory(root, file_manager.type_map, workers=workers):
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+        files.append(record)
+    files.sort(key=lambda x: x["modified_time"], reverse=True)
+    return files, first
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dirs", nargs="?", type=int, default=400)
+    parser.add_argument("--files", type=int, default=100, help="每个目录的文件数")
+    parser.add_argument("--dir", help="使用已有目录")
+    args = parser.parse_args()
+
+    tmp = None
+    root = args.dir
+    if root is None:
+        tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+        root = tmp
+        for d in range(args.dirs):
+            directory = os.path.join(root, f"batch_{d // 20:03d}", f"run_{d:04d}")
+            os.makedirs(directory)
+            for i in range(args.files):
+                open(os.path.join(directory, f"ComfyUI_{i:05d}_.png"), "wb").close()
+                open(os.path.join(directory, f"notes_{i:05d}.txt" if i % 2 else f"model_{i:05d}.safetensors"), "wb").close()
+    try:
+        print(f"Directory: {root}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            files = legacy(root)
+            legacy_ms = (time.perf_counter() - start) * 1000
+        print(f"{'legacy glob':<20} {legacy_ms:9.1f} ms   {'':>22} {len(files)} files")
+        for workers in (1, 4, 8, 16):
+            start = time.perf_counter()
+            records, first = walked(root, workers)
+            total = (time.perf_counter() - start) * 1000
+            assert len(records) == len(files)
+            print(f"{f'walk ({workers} threads)':<20} {total:9.1f} ms   first record {first:7.1f} ms {len(records)} files")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+JSON序列化基准测试：目录列表和大型工作流元数据在各后端下的序列化耗时
+
+用法:
+    python benchmarks/bench_serialization.py [条目数量] [--nodes 1000]
+
+对比旧的序列化方式（json.dumps；元数据中有无法序列化的值时先失败、再逐字段
+试探、再序列化一次）与 json_codec 的各个后端，另外给出提取时 sanitize 一次的耗时
+（只在提取时执行一次，结果随元数据缓存）。
+"""
+import sys
+import json
+import time
+import argparse
+import fractions
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from json_codec import JSONCodec, sanitize, _BACKENDS
+from comfy_graph import graph_analyzer
+from file_manager import PARSED_JSON_FIELDS
+from bench_comfy_graph import make_graph
+from bench_compression import make_listing
+
+
+def make_metadata(nodes):
+    prompt, workflow = make_graph(nodes)
+    metadata = {
+        "name": "ComfyUI_00001_.png", "path": "/data/ComfyUI/output/ComfyUI_00001_.png",
+        "size": 1843210, "type": "image", "extension": ".png", "width": 1024, "height": 1024,
+        "format": "PNG", "mode": "RGB", "comfy_prompt": prompt, "comfy_workflow": workflow
+    }
+    metadata.update(graph_analyzer.analyze(prompt, workflow))
+    return metadata
+
+
+def legacy_serialize(metadata):
+    """旧的 BrowserServer._serialize_metadata（去掉日志输出）"""
+    try:
+        return json.dumps({"success": True, "data": metadata}, ensure_ascii=False)
+    except (TypeError, ValueError):
+        safe_metadata = {}
+        for key, value in metadata.items():
+            try:
+                json.dumps(value)
+                safe_metadata[key] = value
+            except (TypeError, ValueError):
+                safe_metadata[key] = str(value)[:1000]
+        return json.dumps({"success": True, "data": safe_metadata}, ensure_ascii=False)
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=10000)
+    parser.add_argument("--nodes", type=int, default=1000, help="合成工作流的节点数")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    listing = make_listing(args.count)
+    metadata = make_metadata(args.nodes)
+    # 一个没有经过 sanitize 的值（如EXIF里的有理数），触发旧代码的逐字段试探
+    dirty = dict(metadata, exif_info={"XResolution": fractions.Fraction(72, 1)})
+    codecs = [JSONCodec(name) for name in sorted(_BACKENDS)]
+
+    print(f"{'payload':<26} {'serializer':<22} {'ms':>9} {'bytes':>10}")
+
+    def row(label, name, func, sized=True):
+        size = len(func()) if sized else "-"
+        print(f"{label:<26} {name:<22} {measure(func, args.repeat):9.3f} {size:>10}")
+
+    label = f"listing {args.count}"
+    row(label, "legacy json.dumps", lambda: json.dumps(listing).encode())
+    for codec in codecs:
+        row(label, codec.backend, lambda: codec.dumps(listing))
+
+    label = f"metadata {args.nodes} nodes"
+    row(label, "legacy", lambda: legacy_serialize(metadata).encode())
+    for codec in codecs:
+        row(label, codec.backend, lambda: codec.dumps({"success": True, "data": metadata}))
+
+    label = "metadata + bad value"
+    row(label, "legacy (per-field)", lambda: legacy_serialize(dirty).encode())
+    # FileManager._get_file_info 在提取时 sanitize 一次（跳过JSON解析得到的prompt/workflow）
+    fields = {key: value for key, value in dirty.items() if key not in PARSED_JSON_FIELDS}
+    row(label, "sanitize (extraction)", lambda: sanitize(fields), sized=False)
+    row(label, "sanitize (everything)", lambda: sanitize(dirty), sized=False)
+    clean = sanitize(dirty)
+    for codec in codecs:
+        row(label, f"{codec.backend} (sanitized)", lambda: codec.dumps({"success": True, "data": clean}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+相似图片基准测试：多索引哈希（HammingIndex）vs 逐个比较汉明距离
+
+用法:
+    python benchmarks/bench_similarity.py [哈希数量] [--queries 200] [--folder 5000]
+
+生成聚簇的64位哈希（每个“场景”若干个只差几位的变体，模拟种子扫描的输出），
+对比单张“相似图片”查询和一个目录内“近似重复分组”的耗时，并确认结果一致。
+另外给出从256px缩略图计算 dHash/pHash 的单张耗时。
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from perceptual_hash import HammingIndex, hamming, dhash, phash
+
+
+def make_hashes(count, variants=10, max_flips=5, seed=0):
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        base = rng.getrandbits(64)
+        for _ in range(variants):
+            value = base
+            for _ in range(rng.randrange(max_flips + 1)):
+                value ^= 1 << rng.randrange(64)
+            hashes.append(value)
+    return hashes[:count]
+
+
+def brute_search(hashes, value, radius):
+    return sorted((d, i) for i, other in enumerate(hashes) if (d := hamming(value, other)) <= radius)
+
+
+def brute_groups(hashes, radius):
+    parent = list(range(len(hashes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, value in enumerate(hashes):
+        for j in range(i + 1, len(hashes)):
+            if hamming(value, hashes[j]) <= radius:
+                a, b = find(i), find(j)
+                if a != b:
+                    parent[b] = a
+    members = {}
+    for i in range(len(hashes)):
+        members.setdefault(find(i), []).append(i)
+    return [keys for keys in members.values() if len(keys) > 1]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", nargs="?", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--folder", type=int, default=5000, help="近似重复分组的目录大小")
+    args = parser.parse_args()
+
+    hashes = make_hashes(args.count)
+    index, build_ms = timed(lambda: _build(hashes))
+    print(f"{len(hashes)} hashes, index built in {build_ms:.0f} ms")
+    rng = random.Random(1)
+    queries = [hashes[rng.randrange(len(hashes))] for _ in range(args.queries)]
+
+    print(f"{'operation':<34} {'brute ms':>10} {'index ms':>10}")
+    for radius in (4, 10):
+        brute, brute_ms = timed(lambda: [brute_search(hashes, q, radius) for q in queries])
+        fast, index_ms = timed(lambda: [index.search(q, radius) for q in queries])
+        assert brute == fast
+        print(f"{f'similar (radius {radius}, per query)':<34} "
+              f"{brute_ms / len(queries):10.3f} {index_ms / len(queries):10.3f}")
+
+    folder = hashes[:args.folder]
+    brute, brute_ms = timed(lambda: brute_groups(folder, 4))
+    fast, index_ms = timed(lambda: _build(folder).groups(4))
+    assert sorted(map(sorted, brute)) == sorted(map(sorted, fast))
+    print(f"{f'group folder of {len(folder)} (radius 4)':<34} {brute_ms:10.1f} {index_ms:10.1f}")
+
+    from PIL import Image
+    img = Image.effect_mandelbrot((256, 256), (-2, -1.5, 1, 1.5), 100).convert("RGB")
+    for name, func in (("dhash", dhash), ("phash", phash)):
+        _, ms = timed(lambda: [func(img) for _ in range(50)])
+        print(f"{name + ' from 256px thumbnail':<34} {'':>10} {ms / 50:10.3f}")
+
+
+def _build(hashes):
+    index = HammingIndex()
+    for i, value in enumerate(hashes):
+        index.add(i, value)
+    return index
+
+
+if __name__ == "__main__":
+    main()
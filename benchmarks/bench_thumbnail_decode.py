@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图解码基准测试：完整解码 / 当前路径 / 解码策略层
+
+用法:
+    python benchmarks/bench_thumbnail_decode.py [--size 6000x4000] [--thumb 256] [--files a.jpg b.png ...]
+
+不指定 --files 时生成大尺寸的JPEG/PNG/WebP测试图。每种方法在独立子进程中运行，
+报告每张图的耗时和子进程峰值内存（ru_maxrss，仅Unix）。
+
+方法:
+    full      Image.open + thumbnail(reducing_gap=None)：完整解码后缩放
+    current   Image.open + thumbnail(LANCZOS)：引入策略层之前 _generate_thumbnail 的做法
+    strategy  image_decode.decode_for_thumbnail + thumbnail(LANCZOS)：render_thumbnail 的做法
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+METHODS = ["full", "current", "strategy"]
+
+
+def run_worker(method, path, thumb, repeat):
+    from PIL import Image
+    from image_decode import decode_for_thumbnail
+
+    strategy = method
+    start = time.perf_counter()
+    for _ in range(repeat):
+        img = Image.open(path)
+        if method == "full":
+            img.thumbnail((thumb, thumb), Image.Resampling.LANCZOS, reducing_gap=None)
+        elif method == "current":
+            img.thumbnail((thumb, thumb), Image.Resampling.LANCZOS)
+        else:
+            img, strategy = decode_for_thumbnail(path, thumb, img)
+            img.thumbnail((thumb, thumb), Image.Resampling.LANCZOS)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            maxrss //= 1024
+    except ImportError:
+        maxrss = None
+    print(json.dumps({"seconds": elapsed, "maxrss_kb": maxrss, "strategy": strategy}))
+
+
+def make_images(root, width, height):
+    from PIL import Image
+
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+        Image.effect_noise((width, height), 40),
+    ])
+    paths = []
+    for ext, kwargs in ((".jpg", {"quality": 92}), (".png", {}), (".webp", {"quality": 90})):
+        path = os.path.join(root, f"large{ext}")
+        base.save(path, **kwargs)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker", nargs=2, metavar=("METHOD", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--make", metavar="DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--size", default="6000x4000")
+    parser.add_argument("--thumb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--files", nargs="*")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.thumb, args.repeat)
+        return
+    if args.make:
+        print("\n".join(make_images(args.make, width, height)))
+        return
+
+    tmp = None
+    if args.files:
+        files = args.files
+    else:
+        tmp = tempfile.mkdtemp(prefix="catsee-bench-")
+        print(f"Generating {width}x{height} test images...")
+        # 在子进程中生成：Linux上 ru_maxrss 会跨 fork/exec 继承，主进程必须保持很小
+        files = subprocess.run(
+            [sys.executable, __file__, "--make", tmp, "--size", args.size],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+
+    try:
+        print(f"{'file':<14} {'method':<9} {'strategy':<9} {'ms/img':>9} {'img/s':>7} {'peak RSS':>10}")
+        for path in files:
+            for method in METHODS:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--worker", method, path,
+                     "--thumb", str(args.thumb), "--repeat", str(args.repeat)],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                rss = f"{result['maxrss_kb'] / 1024:.0f} MB" if result["maxrss_kb"] else "n/a"
+                print(f"{os.path.basename(path):<14} {method:<9} {result['strategy']:<9} "
+                      f"{result['seconds'] * 1000:9.1f} {1 / result['seconds']:7.1f} {rss:>10}")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
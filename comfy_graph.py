@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+ComfyUI图分析模块 - 单次遍历prompt/workflow，按class_type查表分派提取器
+"""
+import threading
+
+# 模型文件扩展名
+MODEL_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth')
+# 输入字段名包含这些词且值为模型文件时，视为模型字段
+MODEL_KEY_WORDS = ('model', 'ckpt', 'checkpoint')
+
+# class_type包含这些片段的节点视为文本节点（前者区分大小写，后者不区分）
+TEXT_CLASS_MARKERS = ('提示词列表', '展示文本', '展示任何', 'Custom-Scripts', 'Easy-Use')
+TEXT_CLASS_MARKERS_LOWER = ('prompt', 'text')
+# 文本节点中总是当作文本的字段 / 不当作文本的字段
+TEXT_FIELD_NAMES = frozenset(('输入任何', 'output', 'input', '列表'))
+NON_TEXT_FIELDS = frozenset(('type', 'mode', 'seed', 'steps', 'cfg', 'sampler'))
+# 其他节点的字符串输入包含这些词时视为可能的提示词
+PROMPT_WORDS = ('beautiful', 'detailed', 'high quality', 'masterpiece', '美丽', '详细', '高质量')
+
+UPSCALER_MARKERS = ('upscale', 'esrgan', 'realesrgan')
+
+# 条件输入：KSampler/CFGGuider 的 positive，BasicGuider 的 conditioning，DualCFGGuider 的 cond1
+POSITIVE_KEYS = ('positive', 'conditioning', 'cond1')
+NEGATIVE_KEYS = ('negative',)
+
+
+def link_target(value):
+    """ComfyUI prompt中的连线是 [节点ID, 输出序号]"""
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int):
+        return str(value[0])
+    return None
+
+
+def resolve_text(prompt, node_id, depth=0):
+    """沿连线向上查找提示词文本（经过ControlNet等条件节点时继续向上）"""
+    node = prompt.get(node_id)
+    if depth > 8 or not isinstance(node, dict):
+        return None
+    inputs = node.get("inputs") or {}
+    for key in ("text", "string", "value", "prompt"):
+        value = inputs.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+        target = link_target(value)
+        if target is not None:
+            text = resolve_text(prompt, target, depth + 1)
+            if text:
+                return text
+    for key in ("conditioning", "conditioning_1", "positive", "negative"):
+        target = link_target(inputs.get(key))
+        if target is not None:
+            text = resolve_text(prompt, target, depth + 1)
+            if text:
+                return text
+    return None
+
+
+# ---- 模型提取器：extractor(models, class_type, inputs) ----
+
+def _checkpoint(models, class_type, inputs):
+    models['checkpoint'] = inputs['ckpt_name']
+
+
+def _unet(models, class_type, inputs):
+    models['unet_model'] = inputs['unet_name']
+
+
+def _clip(models, class_type, inputs):
+    models['clip_model'] = inputs['clip_name']
+
+
+def _dual_clip(models, class_type, inputs):
+    if 'clip_name1' in inputs:
+        models['clip_model_1'] = inputs['clip_name1']
+    if 'clip_name2' in inputs:
+        models['clip_model_2'] = inputs['clip_name2']
+
+
+def _vae(models, class_type, inputs):
+    models['vae'] = inputs['vae_name']
+
+
+def _lora(models, class_type, inputs):
+    models.setdefault('loras', []).append({
+        'name': inputs['lora_name'],
+        'strength_model': inputs.get('strength_model', 1.0),
+        'strength_clip': inputs.get('strength_clip', 1.0)
+    })
+
+
+def _controlnet(models, class_type, inputs):
+    models.setdefault('controlnets', []).append(inputs['control_net_name'])
+
+
+def _named_model(models, class_type, inputs):
+    models[f'{class_type.lower()}_model'] = inputs['model_name']
+
+
+# (class_type, 触发的输入字段, 提取器)：按顺序取第一条匹配的规则；
+# class_type为None表示任意节点，输入字段为None表示不要求字段
+MODEL_RULES = [
+    (None, 'ckpt_name', _checkpoint),
+    ('UNETLoader', 'unet_name', _unet),
+    ('CLIPLoader', 'clip_name', _clip),
+    ('DualCLIPLoader', None, _dual_clip),
+    (None, 'vae_name', _vae),
+    (None, 'lora_name', _lora),
+    (None, 'control_net_name', _controlnet),
+    (None, 'model_name', _named_model),
+]
+
+
+# ---- 提示词提取器：extractor(prompts, node_id, class_type, inputs) -> 是否已处理 ----
+
+def _clip_text_encode(prompts, node_id, class_type, inputs):
+    text = inputs.get('text')
+    if not isinstance(text, str):
+        return False  # 文本来自其他节点的连线，按通用文本节点处理
+    text = text.strip()
+    if text:
+        prompts[f'prompt_{node_id}'] = {
+            'text': text,
+            'type': 'CLIPTextEncode',
+            'node_id': node_id
+        }
+    return True
+
+
+PROMPT_EXTRACTORS = {
+    'CLIPTextEncode': _clip_text_encode,
+}
+
+
+def _is_text_class(class_type):
+    lower = class_type.lower()
+    return (any(marker in class_type for marker in TEXT_CLASS_MARKERS) or
+            any(marker in lower for marker in TEXT_CLASS_MARKERS_LOWER))
+
+
+def _is_text_key(key):
+    return key.startswith('prompt_') or 'text' in key.lower()
+
+
+def _is_model_key(key):
+    lower = key.lower()
+    return any(word in lower for word in MODEL_KEY_WORDS)
+
+
+def _workflow_flag(node_type):
+    """节点类型对应的工作流标记（has_controlnet/has_lora/has_upscaler）"""
+    lower = node_type.lower()
+    if 'controlnet' in lower:
+        return 'has_controlnet'
+    if 'lora' in lower:
+        return 'has_lora'
+    if any(marker in lower for marker in UPSCALER_MARKERS):
+        return 'has_upscaler'
+    return None
+
+
+class _Memo(dict):
+    """按键缓存单参数函数的结果（class_type、字段名的种类有限，反复出现）"""
+
+    def __init__(self, func):
+        super().__init__()
+        self.func = func
+
+    def __missing__(self, key):
+        value = self[key] = self.func(key)
+        return value
+
+
+class GraphAnalyzer:
+    """ComfyUI图分析器
+
+    一次遍历prompt（API格式）同时得到 comfy_models、comfy_prompts 和预览面板用的
+    comfy_params，一次遍历workflow（UI格式）得到 workflow_summary；其中
+    comfy_models、comfy_prompts、workflow_summary 与原先三个独立提取函数的输出
+    格式一致。节点按 class_type 查表分派：模型规则见 MODEL_RULES，提示词
+    提取器见 PROMPT_EXTRACTORS，新的节点类型可以用 register_model_rule /
+    register_prompt_extractor 注册。对 class_type 和字段名的字符串判断按值
+    缓存，每种只计算一次。
+    """
+
+    def __init__(self, model_rules=None, prompt_extractors=None):
+        self.model_rules = list(MODEL_RULES if model_rules is None else model_rules)
+        self.prompt_extractors = dict(PROMPT_EXTRACTORS if prompt_extractors is None else prompt_extractors)
+        self._lock = threading.Lock()
+        self._reset_memos()
+
+    def _reset_memos(self):
+        self._rules_for = _Memo(self._compile_rules)
+        self._text_class = _Memo(_is_text_class)
+        self._text_key = _Memo(_is_text_key)
+        self._model_key = _Memo(_is_model_key)
+        self._lower = _Memo(str.lower)
+        self._flags = _Memo(_workflow_flag)
+        self._latent_class = _Memo(lambda class_type: 'EmptyLatentImage' in class_type)
+
+    def register_model_rule(self, class_type, input_key, extractor):
+        """注册模型提取规则（优先于内置规则）
+
+        Args:
+            class_type: 节点类型，None表示任意节点
+            input_key: 节点必须包含的输入字段，None表示不要求
+            extractor: extractor(models, class_type, inputs)
+        """
+        with self._lock:
+            self.model_rules.insert(0, (class_type, input_key, extractor))
+            self._reset_memos()
+
+    def register_prompt_extractor(self, class_type, extractor):
+        """注册提示词提取器 extractor(prompts, node_id, class_type, inputs) -> 是否已处理
+
+        返回False时该节点继续按通用文本节点规则处理。
+        """
+        with self._lock:
+            self.prompt_extractors[class_type] = extractor
+
+    def _compile_rules(self, class_type):
+        return [(key, extractor) for rule_type, key, extractor in self.model_rules
+                if rule_type is None or rule_type == class_type]
+
+    def analyze(self, prompt=None, workflow=None):
+        """分析prompt和workflow
+
+        Returns:
+            {"comfy_models", "comfy_prompts", "comfy_params", "workflow_summary"}，
+            只包含非空的部分
+        """
+        result = {}
+        if isinstance(prompt, dict):
+            models, prompts, params = self.analyze_prompt(prompt)
+            if models:
+                result["comfy_models"] = models
+            if prompts:
+                result["comfy_prompts"] = prompts
+            if params:
+                result["comfy_params"] = params
+        if workflow is not None:
+            summary = self.summarize_workflow(workflow)
+            if summary:
+                result["workflow_summary"] = summary
+        return result
+
+    def analyze_prompt(self, prompt):
+        """单次遍历API格式的prompt，返回 (models, prompts, params)
+
+        params 为预览面板显示的生成参数（与前端 extractComfyUIInfo 的字段相同，另有
+        scheduler）：正/负向提示词从第一个采样器的 positive/negative 连线向上查找；
+        采样器没有条件输入时（SamplerCustomAdvanced + KSamplerSelect 这类拆分的
+        图），从 guider 连线指向的节点（BasicGuider/CFGGuider）查找，种子、步数等
+        取自 RandomNoise、BasicScheduler 这类节点。
+        """
+        models = {}
+        prompts = {}
+        sampler = latent = first_text = None
+        guided = noise = schedule = None
+        rules_for = self._rules_for
+        model_key = self._model_key
+        lower = self._lower
+        extractors = self.prompt_extractors
+
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict):
+                continue
+            inputs = node.get('inputs')
+            if not isinstance(inputs, dict):
+                continue
+            class_type = node.get('class_type', '')
+            if not isinstance(class_type, str):
+                class_type = str(class_type)
+
+            # 生成参数：第一个采样器、第一个空latent、第一段CLIPTextEncode文本
+            if sampler is None and 'sampler_name' in inputs:
+                sampler = inputs
+            if latent is None and 'width' in inputs and self._latent_class[class_type]:
+                latent = inputs
+            if first_text is None and class_type == 'CLIPTextEncode':
+                text = inputs.get('text')
+                if isinstance(text, str) and text.strip():
+                    first_text = text.strip()
+            # 拆分的采样节点：guider连线、噪声种子、调度器
+            if guided is None and 'guider' in inputs and link_target(inputs['guider']) is not None:
+                guided = inputs
+            if 'sampler_name' not in inputs:
+                if noise is None and 'noise_seed' in inputs:
+                    noise = inputs
+                if schedule is None and 'scheduler' in inputs:
+                    schedule = inputs
+
+            # 模型：取第一条匹配的规则，再收集其余指向模型文件的字段
+            for key, extractor in rules_for[class_type]:
+                if key is None or key in inputs:
+                    extractor(models, class_type, inputs)
+                    break
+            for key, value in inputs.items():
+                if isinstance(value, str) and value.endswith(MODEL_EXTENSIONS) and model_key[key]:
+                    models[f'{lower[class_type]}_{key}'] = value
+
+            # 提示词
+            extractor = extractors.get(class_type)
+            if extractor is not None and extractor(prompts, node_id, class_type, inputs):
+                continue
+            if self._text_class[class_type] or any(self._text_key[key] for key in inputs):
+                self._extract_text_node(prompts, node_id, class_type, inputs)
+            else:
+                self._extract_prompt_like(prompts, node_id, class_type, inputs)
+
+        params = self._generation_params(prompt, models, sampler, latent, first_text, guided, noise, schedule)
+        return models, prompts, params
+
+    @staticmethod
+    def _guider_inputs(prompt, guided):
+        """guider 连线指向的节点的输入（BasicGuider/CFGGuider等）"""
+        target = link_target(guided.get("guider")) if guided is not None else None
+        node = prompt.get(target) if target is not None else None
+        inputs = node.get("inputs") if isinstance(node, dict) else None
+        return inputs if isinstance(inputs, dict) else {}
+
+    @staticmethod
+    def _generation_params(prompt, models, sampler, latent, first_text, guided=None, noise=None, schedule=None):
+        params = {}
+        sampler = sampler or {}
+        conditioning = sampler
+        if not any(link_target(sampler.get(key)) is not None for key in POSITIVE_KEYS):
+            conditioning = GraphAnalyzer._guider_inputs(prompt, guided)
+        for keys, field in ((POSITIVE_KEYS, "positive_prompt"), (NEGATIVE_KEYS, "negative_prompt")):
+            for key in keys:
+                target = link_target(conditioning.get(key))
+                text = resolve_text(prompt, target) if target is not None else None
+                if text:
+                    params[field] = text
+                    break
+        sources = (sampler, schedule or {}, conditioning)
+        for key, field in (("sampler_name", "sampler"), ("scheduler", "scheduler"), ("steps", "steps"), ("cfg", "cfg")):
+            for source in sources:
+                value = source.get(key)
+                if isinstance(value, (str, int, float)) and value:
+                    params[field] = value
+                    break
+        for source in (sampler, noise or {}):
+            seed = source.get("seed", source.get("noise_seed"))
+            if isinstance(seed, int) and seed:
+                params["seed"] = seed
+                break
+        if "positive_prompt" not in params and first_text:
+            params["positive_prompt"] = first_text
+
+        model = models.get("checkpoint") or models.get("unet_model")
+        if isinstance(model, str):
+            params["model"] = model
+        loras = []
+        for lora in models.get("loras", []):
+            strength = lora.get("strength_model")
+            loras.append(f"{lora['name']} ({strength})" if strength else str(lora["name"]))
+        if loras:
+            params["lora"] = ", ".join(loras)
+        if latent is not None:
+            width, height = latent.get("width"), latent.get("height")
+            if isinstance(width, int) and isinstance(height, int):
+                params["size"] = f"{width} × {height}"
+        return params
+
+    def _extract_text_node(self, prompts, node_id, class_type, inputs):
+        """文本类节点：提取所有看起来是文本的字符串字段"""
+        text_key = self._text_key
+        for key, value in inputs.items():
+            if not isinstance(value, str):
+                continue
+            text = value.strip()
+            if not text:
+                continue
+            if (text_key[key] or key in TEXT_FIELD_NAMES or
+                    (len(text) > 3 and key not in NON_TEXT_FIELDS)):
+                prompts[f'{class_type}_{key}_{node_id}'] = {
+                    'text': text,
+                    'type': class_type,
+                    'field': key,
+                    'node_id': node_id
+                }
+
+    @staticmethod
+    def _extract_prompt_like(prompts, node_id, class_type, inputs):
+        """其他节点：长度>10且包含常见提示词特征的字符串"""
+        for key, value in inputs.items():
+            if not isinstance(value, str):
+                continue
+            text = value.strip()
+            if len(text) > 10:
+                lowered = text.lower()
+                if any(word in lowered for word in PROMPT_WORDS):
+                    prompts[f'{class_type}_{key}'] = {
+                        'text': text,
+                        'type': class_type,
+                        'field': key,
+                        'node_id': node_id
+                    }
+
+    def summarize_workflow(self, workflow):
+        """UI格式工作流的节点统计"""
+        if not isinstance(workflow, dict):
+            return {}
+        nodes = workflow.get('nodes', [])
+        if not isinstance(nodes, list):
+            nodes = []
+        summary = {
+            'nodes_count': len(nodes),
+            'node_types': {},
+            'has_controlnet': False,
+            'has_lora': False,
+            'has_upscaler': False
+        }
+        node_types = summary['node_types']
+        for node in nodes:
+            if not isinstance(node, dict):
+                continue
+            node_type = node.get('type', 'unknown')
+            if not isinstance(node_type, str):
+                node_type = str(node_type)
+            node_types[node_type] = node_types.get(node_type, 0) + 1
+        flags = self._flags
+        for node_type in node_types:
+            flag = flags[node_type]
+            if flag:
+                summary[flag] = True
+        return summary
+
+
+# 全局图分析器实例
+graph_analyzer = GraphAnalyzer()
@@ -4,16 +4,21 @@
 """
 import os
 import json
-from pathlib import Path
+from pathlib import Path, PureWindowsPath
 
 class Config:
     """配置管理类"""
     
+    # 目录类配置项，读取时转换为绝对路径
+    PATH_KEYS = ("collections", "outputs", "temp")
+    
     def __init__(self):
         self.plugin_dir = Path(__file__).parent
-        self.config_file = self.plugin_dir / "config.json"
+        # CATSEE_CONFIG 可指定其他配置文件（测试时指向临时目录）
+        self.config_file = Path(os.environ.get("CATSEE_CONFIG") or self.plugin_dir / "config.json")
         self.default_config = self._get_default_config()
         self.config = self._load_config()
+        self._warned_paths = set()
     
     def _get_default_config(self):
         """获取默认配置"""
@@ -26,6 +31,88 @@ class Config:
             "temp": str(self.plugin_dir / "temp"),
             "max_items_per_page": 50,
             "thumbnail_size": 256,
+            "thumbnail_cache_max_mb": 512,
+            "listing_cache_max_mb": 64,
+            "atlas_cache_max_mb": 256,
+            "executor": {
+                "io_workers": 8,
+                "decode_workers": 2,
+                "use_process_pool": False,
+                "max_queue": 256,
+                "limits": {
+                    "browse": 2,
+                    "metadata": 4,
+                    "thumbnail": 4,
+                    "image": 8,
+                    "video": 8,
+                    "atlas": 2,
+                    "prewarm": 1,
+                    "search": 4,
+                    "index": 1,
+                    "hash": 1,
+                    "phash": 1,
+                    "io": 8
+                }
+            },
+            "prewarm": {
+                "enabled": True,
+                "max_files": 5000,
+                "delay_ms": 20,
+                "busy_delay_ms": 500,
+                "idle_poll_ms": 200
+            },
+            "metadata_cache": {
+                "enabled": True,
+                "max_mb": 64,
+                "spill": True,
+                "spill_max_mb": 256
+            },
+            "compression": {
+                "enabled": True,
+                "min_size": 1024,
+                "stream_min_items": 2000,
+                "stream_chunk_items": 500,
+                "gzip_level": 6,
+                "brotli_quality": 5,
+                "zstd_level": 3,
+                "cache_max_mb": 64
+            },
+            "serializer": {
+                "backend": "auto"
+            },
+            "metadata_index": {
+                "refresh_interval": 60
+            },
+            "watcher": {
+                "enabled": True,
+                "backend": "auto",
+                "poll_interval": 2.0,
+                "full_scan_every": 30,
+                "debounce_ms": 500,
+                "max_delay_ms": 3000,
+                "paths": []
+            },
+            "duplicates": {
+                "enabled": True,
+                "workers": 4,
+                "chunk_kb": 1024,
+                "partial_kb": 64,
+                "max_age": 300
+            },
+            "similarity": {
+                "enabled": True,
+                "algorithm": "phash",
+                "similar_distance": 10,
+                "duplicate_distance": 4,
+                "max_results": 100,
+                "max_age": 600
+            },
+            "live_updates": {
+                "enabled": True,
+                "poll_interval": 2.0,
+                "max_delta_items": 500,
+                "max_subscriptions": 8
+            },
             "supported_formats": {
                 "images": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tiff"],
                 "videos": [".mp4", ".avi", ".mov", ".mkv", ".webm"],
@@ -78,7 +165,36 @@ class Config:
     
     def get(self, key, default=None):
         """获取配置值"""
-        return self.config.get(key, default)
+        value = self.config.get(key, default)
+        if key in self.PATH_KEYS and value:
+            value = self._resolve_path(key, value)
+        return value
+    
+    def _resolve_path(self, key, value):
+        """目录配置转为绝对路径
+        
+        相对路径相对于插件目录，不受当前工作目录影响；在非Windows系统上
+        遇到带盘符的Windows路径（从Windows复制过来的config.json）时使用默认目录。
+        """
+        if os.name != "nt" and PureWindowsPath(value).drive:
+            if key not in self._warned_paths:
+                self._warned_paths.add(key)
+                print(f"[Catsee] Warning: {key} path {value} is not usable on this system, using {self.default_config[key]}")
+            value = self.default_config[key]
+        path = Path(value).expanduser()
+        if not path.is_absolute():
+            path = self.plugin_dir / path
+        return str(path)
+    
+    def section(self, key, defaults, options=None):
+        """模块的配置节：defaults 与配置文件中 key 一节合并后的副本
+        
+        Args:
+            options: 不为None时代替配置文件中的值（测试、基准测试时使用）
+        """
+        merged = dict(defaults)
+        merged.update(options if options is not None else self.get(key) or {})
+        return merged
     
     def set(self, key, value):
         """设置配置值"""
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+内容哈希模块 - 分块计算文件内容哈希，查找输出目录和收藏目录中内容完全相同的文件
+"""
+import os
+import time
+import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .config import config
+    from .task_executor import task_executor
+    from .dir_listing import walk_directory
+    from .sqlite_store import SQLiteStore
+except ImportError:
+    from config import config
+    from task_executor import task_executor
+    from dir_listing import walk_directory
+    from sqlite_store import SQLiteStore
+
+DEFAULTS = {
+    "enabled": True,
+    "workers": 4,  # 哈希线程数（hashlib在计算时释放GIL）
+    "chunk_kb": 1024,  # 分块读取的块大小
+    "partial_kb": 64,  # 预筛选时读取文件头、尾各多少KB
+    "min_size": 1,  # 小于此大小的文件不参与查重（空文件）
+    "max_age": 300  # 查重结果超过多少秒后，再次请求时重新扫描
+}
+
+CHUNK_SIZE = DEFAULTS["chunk_kb"] * 1024
+PARTIAL_SIZE = DEFAULTS["partial_kb"] * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    fingerprint TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    partial TEXT NOT NULL,
+    content TEXT,
+    hashed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hashes_path ON hashes(path);
+"""
+
+# SQLite单条语句的参数个数上限较低，IN查询分批
+QUERY_BATCH = 500
+
+
+def fingerprint(path, st):
+    """快速指纹（与 FileManager._get_file_hash(fast=True) 相同：路径+大小+修改时间）"""
+    return hashlib.md5(f"{path}_{st.st_size}_{st.st_mtime}".encode()).hexdigest()
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """分块计算整个文件的MD5，内存占用只有一个块"""
+    digest = hashlib.md5()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def partial_hash(path, size, partial_size=PARTIAL_SIZE, chunk_size=CHUNK_SIZE):
+    """预筛选用的部分哈希：文件头、尾各 partial_size 字节
+
+    Returns:
+        (哈希, 是否完整)：文件不超过 2*partial_size 时读取整个文件，
+        返回的就是完整内容哈希（与 hash_file 相同），无需再读第二遍
+    """
+    if size <= 2 * partial_size:
+        return hash_file(path, chunk_size), True
+    digest = hashlib.md5()
+    with open(path, "rb", buffering=0) as f:
+        digest.update(f.read(partial_size))
+        f.seek(size - partial_size)
+        digest.update(f.read(partial_size))
+    return digest.hexdigest(), False
+
+
+class ContentHasher(SQLiteStore):
+    """内容哈希与重复文件查找
+
+    查重分三步，大部分文件不会被完整读取：
+      1. 遍历目录，按大小分组，大小唯一的文件不可能重复
+      2. 大小相同的文件计算部分哈希（头尾各 partial_kb），再次分组
+      3. 部分哈希也相同的文件才分块计算完整哈希
+
+    哈希结果按快速指纹（路径+大小+修改时间）保存在SQLite中，文件没有变化
+    时下次查重直接复用。扫描在 hash 类型的任务中执行，哈希计算使用独立的
+    线程池（workers 个线程）。
+    """
+
+    DB_FILE = "content_hashes.sqlite3"
+
+    def __init__(self, db_path=None, options=None):
+        super().__init__(db_path, SCHEMA)
+        opts = config.section("duplicates", DEFAULTS, options)
+        self.enabled = bool(opts["enabled"])
+        self.workers = max(1, int(opts["workers"]))
+        self.chunk_size = max(4, int(opts["chunk_kb"])) * 1024
+        self.partial_size = max(1, int(opts["partial_kb"])) * 1024
+        self.min_size = max(0, int(opts["min_size"]))
+        self.max_age = max(0, float(opts["max_age"]))
+        self._task = None
+        self._progress = None
+        self.result = None
+        self.last_error = None
+
+    def _load(self, fingerprints):
+        """已保存的哈希：指纹 -> (部分哈希, 完整哈希或None)"""
+        conn = self._connect()
+        known = {}
+        fingerprints = list(fingerprints)
+        with self._lock:
+            for i in range(0, len(fingerprints), QUERY_BATCH):
+                batch = fingerprints[i:i + QUERY_BATCH]
+                sql = f"SELECT fingerprint, partial, content FROM hashes WHERE fingerprint IN ({','.join('?' * len(batch))})"
+                for row in conn.execute(sql, batch):
+                    known[row[0]] = (row[1], row[2])
+        return known
+
+    def _save(self, rows):
+        if not rows:
+            return
+        conn = self._connect()
+        with self._lock:
+            conn.executemany(
+                "INSERT OR REPLACE INTO hashes (fingerprint, path, size, partial, content, hashed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+
+    def _prune(self, roots, walked):
+        """删除扫描范围内已不存在或已变化的文件的记录
+
+        Args:
+            walked: 本次扫描到的文件 路径 -> 快速指纹
+        """
+        conn = self._connect()
+        prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)
+        with self._lock:
+            stale = []
+            for fp, path in conn.execute("SELECT fingerprint, path FROM hashes"):
+                if not path.startswith(prefixes):
+                    continue
+                if walked.get(path) != fp:
+                    stale.append((fp,))
+            if stale:
+                conn.executemany("DELETE FROM hashes WHERE fingerprint = ?", stale)
+                conn.commit()
+        return len(stale)
+
+    def file_hash(self, path):
+        """单个文件的内容哈希（有保存的结果且文件未变化时直接返回）"""
+        path = os.path.abspath(str(path))
+        st = os.stat(path)
+        fp = fingerprint(path, st)
+        partial, content = self._load([fp]).get(fp, (None, None))
+        if content:
+            return content
+        if partial is None:
+            partial, complete = partial_hash(path, st.st_size, self.partial_size, self.chunk_size)
+            if complete:
+                content = partial
+        if content is None:
+            content = hash_file(path, self.chunk_size)
+        self._save([(fp, path, st.st_size, partial, content, time.time())])
+        return content
+
+    @staticmethod
+    def default_roots():
+        """查重范围：输出目录和收藏目录（不存在的跳过，不创建）"""
+        roots = []
+        for key in ("outputs", "collections"):
+            value = config.get(key)
+            if value and os.path.isdir(value):
+                roots.append(os.path.abspath(value))
+        return roots
+
+    def find_duplicates(self, roots=None, type_map=None):
+        """查找内容完全相同的文件（阻塞，在任务线程中调用）
+
+        Returns:
+            {"groups": [{hash, size, count, wasted, files: [...]}, ...]（按可释放空间降序）,
+             "stats": {...}, "roots": [...], "finished_at": 时间戳}
+        """
+        if roots is None:
+            roots = self.default_roots()
+        roots = [os.path.abspath(str(root)) for root in roots]
+        if type_map is None:
+            try:
+                from .file_manager import file_manager
+            except ImportError:
+                from file_manager import file_manager
+            type_map = file_manager.type_map
+
+        start = time.perf_counter()
+        progress = self._progress = {"stage": "scan", "done": 0, "total": 0}
+        stats = {"files": 0, "candidates": 0, "partial_hashed": 0, "full_hashed": 0,
+                 "cached": 0, "bytes_read": 0, "pruned": 0}
+
+        # 1. 遍历并按大小分组（收藏目录可能位于输出目录中，按真实路径去重）；
+        # 条目的 hash 字段就是快速指纹
+        by_size = {}
+        walked = {}  # 路径 -> 指纹
+        seen = set()
+        for root in roots:
+            for item in walk_directory(root, type_map):
+                real = os.path.realpath(item["path"])
+                if real in seen:
+                    continue
+                seen.add(real)
+                walked[item["path"]] = item["hash"]
+                if item["size"] >= self.min_size:
+                    by_size.setdefault(item["size"], []).append(item)
+        candidates = {}  # 指纹 -> 文件条目
+        for files in by_size.values():
+            if len(files) > 1:
+                for item in files:
+                    candidates[item["hash"]] = item
+        stats["files"] = len(walked)
+        stats["candidates"] = len(candidates)
+        known = self._load(candidates)
+        stats["cached"] = len(known)
+        new_rows = {}  # 指纹 -> [路径, 大小, 部分哈希, 完整哈希]
+
+        def record(fp, partial=None, content=None):
+            item = candidates[fp]
+            row = new_rows.get(fp)
+            if row is None:
+                cached = known.get(fp, (None, None))
+                row = new_rows[fp] = [item["path"], item["size"], cached[0], cached[1]]
+            if partial is not None:
+                row[2] = partial
+            if content is not None:
+                row[3] = content
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="catsee-hash") as pool:
+            # 2. 部分哈希
+            todo = [fp for fp in candidates if fp not in known]
+            progress.update(stage="partial", done=0, total=len(todo))
+
+            def run_partial(fp):
+                item = candidates[fp]
+                try:
+                    partial, complete = partial_hash(item["path"], item["size"], self.partial_size, self.chunk_size)
+                except OSError:
+                    return fp, None, None
+                return fp, partial, partial if complete else None
+
+            for fp, partial, content in pool.map(run_partial, todo):
+                progress["done"] += 1
+                if partial is None:
+                    continue
+                stats["partial_hashed"] += 1
+                stats["bytes_read"] += min(candidates[fp]["size"], 2 * self.partial_size)
+                known[fp] = (partial, content)
+                record(fp, partial, content)
+
+            by_partial = {}
+            for fp, (partial, _) in known.items():
+                by_partial.setdefault((candidates[fp]["size"], partial), []).append(fp)
+
+            # 3. 完整哈希
+            todo = [fp for group in by_partial.values() if len(group) > 1
+                    for fp in group if not known[fp][1]]
+            progress.update(stage="full", done=0, total=len(todo))
+
+            def run_full(fp):
+                try:
+                    return fp, hash_file(candidates[fp]["path"], self.chunk_size)
+                except OSError:
+                    return fp, None
+
+            for fp, content in pool.map(run_full, todo):
+                progress["done"] += 1
+                if content is None:
+                    continue
+                stats["full_hashed"] += 1
+                stats["bytes_read"] += candidates[fp]["size"]
+                known[fp] = (known[fp][0], content)
+                record(fp, content=content)
+
+        progress.update(stage="save", done=0, total=0)
+        now = time.time()
+        self._save([(fp, path, size, partial, content, now)
+                    for fp, (path, size, partial, content) in new_rows.items()])
+        stats["pruned"] = self._prune(roots, walked)
+
+        groups = {}
+        for group in by_partial.values():
+            if len(group) < 2:
+                continue
+            for fp in group:
+                content = known[fp][1]
+                if content:
+                    groups.setdefault(content, []).append(fp)
+        result_groups = []
+        for content, fps in groups.items():
+            if len(fps) < 2:
+                continue
+            size = candidates[fps[0]]["size"]
+            files = sorted(
+                ({"path": candidates[fp]["path"], "name": candidates[fp]["name"],
+                  "modified_time": candidates[fp]["modified_time"]} for fp in fps),
+                key=lambda item: item["modified_time"]
+            )
+            result_groups.append({"hash": content, "size": size, "count": len(files),
+                                  "wasted": size * (len(files) - 1), "files": files})
+        result_groups.sort(key=lambda group: group["wasted"], reverse=True)
+
+        stats["groups"] = len(result_groups)
+        stats["wasted"] = sum(group["wasted"] for group in result_groups)
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"[Catsee] Duplicate scan: {stats}")
+        return {"groups": result_groups, "stats": stats, "roots": roots, "finished_at": time.time()}
+
+    # ---- 后台查重 ----
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def is_stale(self):
+        return self.result is None or time.time() - self.result["finished_at"] > self.max_age
+
+    def schedule(self, force=False):
+        """在后台开始查重（已在运行或结果仍然新鲜时不做任何事）
+
+        Returns:
+            是否开始了新的扫描
+        """
+        if not self.enabled or self.running or not (force or self.is_stale()):
+            return False
+        self._task = asyncio.ensure_future(self._run())
+        return True
+
+    async def _run(self):
+        try:
+            self.result = await task_executor.run('hash', self.find_duplicates)
+            self.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[Catsee] Duplicate scan failed: {e}")
+        finally:
+            self._progress = None
+
+    def status(self):
+        """查重状态；有结果时包含重复文件分组"""
+        running = self.running
+        return {
+            "enabled": self.enabled,
+            "running": running,
+            "progress": dict(self._progress) if running and self._progress else None,
+            "stale": self.is_stale(),
+            "error": self.last_error,
+            "result": self.result
+        }
+
+
+# 全局内容哈希实例
+content_hasher = ContentHasher()
@@ -0,0 +1,713 @@
+# -*- coding: utf-8 -*-
+"""
+目录列表引擎 - 基于 os.scandir，复用 DirEntry 缓存的类型和stat信息
+"""
+import os
+import json
+import time
+import re
+import copy
+import base64
+import bisect
+import fnmatch
+import hashlib
+import threading
+from stat import S_ISDIR
+from pathlib import Path
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+# 浏览时允许显示的文件扩展名
+ALLOWED_EXTENSIONS = frozenset({
+    # 图片
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif', '.ico', '.svg',
+    # 视频
+    '.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v', '.mpg', '.mpeg',
+    # JSON文件
+    '.json'
+})
+
+
+def build_type_map(supported_images, supported_videos, supported_workflows):
+    """扩展名 -> 文件类型 的查找表（与 FileManager._get_file_type 一致）"""
+    type_map = {}
+    for ext in supported_workflows:
+        type_map[ext] = "workflow"
+    for ext in supported_videos:
+        type_map[ext] = "video"
+    for ext in supported_images:
+        type_map[ext] = "image"
+    return type_map
+
+
+def relative_prefix(dir_path, outputs_dir):
+    """目录相对于输出目录的前缀；不在输出目录下时返回None
+
+    每次列目录只计算一次，代替对每个文件做 parents 判断。
+    """
+    if outputs_dir is None:
+        return None
+    if dir_path == outputs_dir:
+        return ""
+    if outputs_dir in dir_path.parents:
+        return str(dir_path.relative_to(outputs_dir))
+    return None
+
+
+def _folder_item(name, path, st):
+    return {
+        "name": name,
+        "path": path,
+        "type": "folder",
+        "size": 0,
+        "modified_time": st.st_mtime,
+        "created_time": st.st_ctime,
+        "is_folder": True
+    }
+
+
+def _file_item(name, path, ext, st, file_type, prefix):
+    if file_type:
+        if prefix is None:
+            relative_path = path
+        elif prefix:
+            relative_path = prefix + os.sep + name
+        else:
+            relative_path = name
+        return {
+            "name": name,
+            "path": path,
+            "relative_path": relative_path,
+            "size": st.st_size,
+            "type": file_type,
+            "extension": ext,
+            "created_time": st.st_ctime,
+            "modified_time": st.st_mtime,
+            # 与 FileManager._get_file_hash(fast=True) 相同的快速哈希
+            "hash": hashlib.md5(f"{path}_{st.st_size}_{st.st_mtime}".encode()).hexdigest(),
+            "is_folder": False
+        }
+    # 允许显示但不是受支持的类型，使用简化信息
+    return {
+        "name": name,
+        "path": path,
+        "type": "file",
+        "size": st.st_size,
+        "extension": ext,
+        "modified_time": st.st_mtime,
+        "created_time": st.st_ctime,
+        "is_folder": False
+    }
+
+
+def make_item(path, type_map, outputs_dir=None, allowed_extensions=ALLOWED_EXTENSIONS):
+    """单个路径的目录条目（与 iter_directory 生成的相同）
+
+    Returns:
+        条目字典；扩展名不允许显示时返回None
+
+    Raises:
+        OSError: 路径不存在或无法stat
+    """
+    path = str(path)
+    st = os.stat(path)
+    name = os.path.basename(path)
+    if S_ISDIR(st.st_mode):
+        return _folder_item(name, path, st)
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in allowed_extensions:
+        return None
+    prefix = relative_prefix(Path(os.path.dirname(path)), outputs_dir)
+    return _file_item(name, path, ext, st, type_map.get(ext), prefix)
+
+
+def iter_directory(dir_path, type_map, outputs_dir=None, allowed_extensions=ALLOWED_EXTENSIONS,
+                   counts=None, folders=True, files=True):
+    """按扫描顺序逐个生成目录条目
+
+    每个条目的开销：DirEntry自带的类型判断（Linux/macOS上通常无需系统调用，
+    Windows上完全免费）+ 允许的文件/文件夹各一次stat + 一次短字符串md5。
+    扩展名过滤在stat之前完成，被跳过的文件不产生任何系统调用。
+
+    Args:
+        dir_path: 目录路径（Path）
+        type_map: build_type_map() 生成的扩展名 -> 类型表
+        outputs_dir: 输出目录（Path），用于计算 relative_path
+        allowed_extensions: 允许显示的扩展名集合
+        counts: 传入字典时累加 {"folders", "files", "skipped"}
+        folders/files: 是否生成文件夹/文件条目（不生成的一类不做stat）
+
+    Raises:
+        PermissionError: 目录不可读
+    """
+    base = str(dir_path)
+    prefix = relative_prefix(dir_path, outputs_dir)
+    splitext = os.path.splitext
+    if counts is None:
+        counts = {}
+    for key in ("folders", "files", "skipped"):
+        counts.setdefault(key, 0)
+
+    with os.scandir(base) as it:
+        for entry in it:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+
+            if is_dir:
+                if not folders:
+                    continue
+                # 始终显示文件夹
+                try:
+                    st = entry.stat()
+                except OSError as e:
+                    print(f"[CatSee] Error getting folder info for {name}: {e}")
+                    continue
+                counts["folders"] += 1
+                yield _folder_item(name, entry.path, st)
+                continue
+
+            if not files:
+                continue
+            # 只显示允许的文件类型（在stat之前过滤）
+            ext = splitext(name)[1].lower()
+            if ext not in allowed_extensions:
+                counts["skipped"] += 1
+                continue
+
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError as e:
+                print(f"[CatSee] Error getting file info for {name}: {e}")
+                continue
+
+            counts["files"] += 1
+            yield _file_item(name, entry.path, ext, st, type_map.get(ext), prefix)
+
+
+def list_directory(dir_path, type_map, outputs_dir=None, allowed_extensions=ALLOWED_EXTENSIONS):
+    """列出目录内容（见 iter_directory）
+
+    Returns:
+        (items, counts)，counts 为 {"folders", "files", "skipped"}
+
+    Raises:
+        PermissionError: 目录不可读
+    """
+    counts = {}
+    items = list(iter_directory(dir_path, type_map, outputs_dir, allowed_extensions, counts))
+    return items, counts
+
+
+# 递归遍历的默认线程数（os.scandir在系统调用期间释放GIL）
+WALK_WORKERS = 8
+
+
+def _compile_excludes(patterns):
+    """排除模式（fnmatch通配符）编译成一个正则；没有模式时返回None"""
+    patterns = [os.path.normcase(p) for p in (patterns or ()) if p]
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
+def _walk_one(path, relative, depth, descend, type_map, outputs_dir, excluded):
+    """列出一个目录：返回 (文件条目, [(子目录, 相对路径)], 深度)
+
+    类型判断使用DirEntry缓存的信息，扩展名和排除模式在stat之前过滤，
+    只有要返回的文件才stat。
+    """
+    records = []
+    subdirs = []
+    prefix = relative_prefix(Path(path), outputs_dir)
+    splitext = os.path.splitext
+    normcase = os.path.normcase
+
+    def skip(name, child):
+        return excluded.match(normcase(name)) or excluded.match(normcase(child))
+
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            child = relative + os.sep + name if relative else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if descend and not (excluded and skip(name, child)):
+                        subdirs.append((entry.path, child))
+                    continue
+                ext = splitext(name)[1].lower()
+                file_type = type_map.get(ext)
+                if file_type is None:
+                    continue
+                if excluded and skip(name, child):
+                    continue
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            records.append(_file_item(name, entry.path, ext, st, file_type, prefix))
+    return records, subdirs, depth
+
+
+def walk_directory(root, type_map, outputs_dir=None, max_depth=None, exclude=None, max_results=None,
+                   workers=WALK_WORKERS):
+    """并行递归遍历目录树，逐个生成文件条目（与 iter_directory 的文件条目相同）
+
+    每个子目录是线程池中的一个任务，某个目录列完后立即把它的子目录派发出去，
+    条目按目录完成的顺序生成（不排序），调用方可以边遍历边处理。只包含
+    type_map 中的文件类型；符号链接的目录不进入。
+
+    Args:
+        root: 根目录
+        type_map: 扩展名 -> 类型表
+        outputs_dir: 输出目录（Path），用于计算 relative_path
+        max_depth: 最大深度，0 只列根目录本身，None 不限
+        exclude: 排除模式列表（fnmatch通配符），与文件/目录名或相对于根目录的
+            路径匹配；匹配的目录整个跳过，例如 ["temp", "*.tmp", "cache/*"]
+        max_results: 最多生成多少个条目（达到后停止遍历）
+        workers: 线程数
+    """
+    root = os.path.abspath(str(root))
+    excluded = _compile_excludes(exclude)
+    count = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="catsee-walk")
+
+    def submit(path, relative, depth):
+        descend = max_depth is None or depth < max_depth
+        return pool.submit(_walk_one, path, relative, depth, descend, type_map, outputs_dir, excluded)
+
+    pending = {submit(root, "", 0)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    records, subdirs, depth = future.result()
+                except OSError as e:
+                    print(f"[CatSee] Cannot scan directory: {e}")
+                    continue
+                for path, relative in subdirs:
+                    pending.add(submit(path, relative, depth + 1))
+                for record in records:
+                    yield record
+                    count += 1
+                    if max_results is not None and count >= max_results:
+                        return
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+def _name_key(item):
+    # 与 (小写名, 原名) 顺序相同的单个字符串，比较元组要慢得多
+    name = item["name"]
+    return name.lower() + "\0" + name
+
+
+# 排序字段 -> 条目的排序键。文件名在同一目录内唯一，作为最后一级保证键唯一，
+# 游标可以精确定位到某个条目之后
+SORT_KEYS = {
+    "name": _name_key,
+    "mtime": lambda x: (x.get("modified_time") or 0, _name_key(x)),
+    "size": lambda x: (x.get("size") or 0, _name_key(x)),
+    "type": lambda x: (x.get("type", ""), x.get("extension", ""), _name_key(x))
+}
+# 旧前端使用的排序名
+SORT_ALIASES = {"date": "mtime", "modified": "mtime"}
+# 未指定方向时的默认方向（最新、最大的在前）
+DEFAULT_ORDER = {"name": "asc", "mtime": "desc", "size": "desc", "type": "asc"}
+CURSOR_VERSION = 1
+# 排序字段 -> 排序键的形状（游标解码时校验，被篡改的游标不能让二分查找比较不同类型）
+_NUMBER = (int, float)
+CURSOR_KEY_TYPES = {
+    "name": str,
+    "mtime": (_NUMBER, str),
+    "size": (_NUMBER, str),
+    "type": (str, str, str)
+}
+
+
+def normalize_sort(sort=None, order=None):
+    """校验排序参数，返回 (排序字段, 方向)
+
+    Raises:
+        ValueError: 未知的排序字段或方向
+    """
+    sort = SORT_ALIASES.get(sort or "name", sort or "name")
+    if sort not in SORT_KEYS:
+        raise ValueError(f"不支持的排序字段: {sort}")
+    order = order or DEFAULT_ORDER[sort]
+    if order not in ("asc", "desc"):
+        raise ValueError(f"不支持的排序方向: {order}")
+    return sort, order
+
+
+def encode_cursor(sort, order, file_type, item):
+    """生成指向 item 之后的游标（不透明字符串，编码了排序方式和 item 的排序键）"""
+    key = SORT_KEYS[sort](item)
+    payload = [CURSOR_VERSION, sort, order, file_type, int(not item["is_folder"]),
+               key if isinstance(key, str) else list(key)]
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 {"sort", "order", "file_type", "position"}
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, sort, order, file_type, group, key = json.loads(data)
+    except Exception:
+        raise ValueError("无效的游标")
+    if (version != CURSOR_VERSION or not isinstance(sort, str) or sort not in SORT_KEYS or
+            order not in ("asc", "desc") or group not in (0, 1)):
+        raise ValueError("无效的游标")
+    if file_type is not None and not isinstance(file_type, str):
+        raise ValueError("无效的游标")
+    shape = CURSOR_KEY_TYPES[sort]
+    if isinstance(shape, tuple):
+        if not (isinstance(key, list) and len(key) == len(shape) and
+                all(isinstance(value, types) for value, types in zip(key, shape))):
+            raise ValueError("无效的游标")
+        key = tuple(key)
+    elif not isinstance(key, shape):
+        raise ValueError("无效的游标")
+    return {"sort": sort, "order": order, "file_type": file_type or None, "position": (group, key)}
+
+
+class SortedView:
+    """目录列表按某种方式排序后的视图
+
+    文件夹和文件分别按排序键升序保存，降序时倒着读。display 为显示顺序
+    （文件夹在前）的完整列表，偏移分页直接切片；游标分页用二分查找定位
+    上一页最后一个条目的排序键，新文件插入到游标之前时不会使后面的页错位。
+    """
+
+    def __init__(self, items, sort, order):
+        key = SORT_KEYS[sort]
+        self.sort = sort
+        self.order = order
+        groups = ([], [])
+        for item in items:
+            groups[0 if item["is_folder"] else 1].append(item)
+        self._keys = []
+        display = []
+        for group in groups:
+            # 排序键只计算一次，按下标排序
+            keys = list(map(key, group))
+            indices = sorted(range(len(group)), key=keys.__getitem__)
+            self._keys.append([keys[i] for i in indices])
+            ordered = [group[i] for i in indices]
+            display.extend(ordered if order == "asc" else reversed(ordered))
+        self.items = display
+        self.folder_count = len(groups[0])
+
+    def _display_index(self, group, index):
+        """组内升序下标 -> display 中的下标"""
+        base = 0 if group == 0 else self.folder_count
+        if self.order == "asc":
+            return base + index
+        return base + len(self._keys[group]) - 1 - index
+
+    def with_changes(self, removed, added):
+        """删除/插入若干条目后的新视图（二分查找定位，不重新排序，原视图不变）"""
+        key = SORT_KEYS[self.sort]
+        view = copy.copy(self)
+        view._keys = [list(keys) for keys in self._keys]
+        view.items = list(self.items)
+        for item in removed:
+            group, k = 0 if item["is_folder"] else 1, key(item)
+            keys = view._keys[group]
+            i = bisect.bisect_left(keys, k)
+            if i < len(keys) and keys[i] == k:
+                del view.items[view._display_index(group, i)]
+                del keys[i]
+                if group == 0:
+                    view.folder_count -= 1
+        for item in added:
+            group, k = 0 if item["is_folder"] else 1, key(item)
+            keys = view._keys[group]
+            i = bisect.bisect_left(keys, k)
+            keys.insert(i, k)
+            view.items.insert(view._display_index(group, i), item)
+            if group == 0:
+                view.folder_count += 1
+        return view
+
+    def index_after(self, position):
+        """游标位置 (组, 排序键) 之后第一个条目在 display 中的下标"""
+        group, key = position
+        keys = self._keys[group]
+        base = 0 if group == 0 else self.folder_count
+        if self.order == "asc":
+            return base + bisect.bisect_right(keys, key)
+        # 降序：升序中排在 key 之前的条目在显示顺序中位于其后
+        return base + len(keys) - bisect.bisect_left(keys, key)
+
+
+def _in_view(item, file_type):
+    """条目是否属于按 file_type 过滤的视图（文件夹始终保留）"""
+    return not file_type or item["is_folder"] or item.get("type") == file_type
+
+
+class DirectoryListing:
+    """单个目录的条目列表（扫描顺序），以及按文件类型过滤、按排序方式排好的视图"""
+
+    # 每个条目在内存中的粗略占用（字典+字符串），用于内存预算
+    ITEM_BYTES = 800
+    # 排序视图中每个条目的排序键的粗略占用
+    KEY_BYTES = 120
+
+    def __init__(self, items, counts, mtime_ns, scanned_at):
+        self.items = items
+        self.counts = counts
+        self.mtime_ns = mtime_ns
+        self.scanned_at = scanned_at
+        self.size = (len(items) + 1) * self.ITEM_BYTES
+        self._views = {}
+        self._sorted = {}  # (排序字段, 方向, 类型) -> SortedView
+        # 由文件监视器的增量变化生成（见 with_changes）：之后的变化也会由监视器
+        # 报告，目录mtime一致即可信任
+        self.live = False
+        # 放入 ListingCache 后由缓存设置：视图增加的占用计入缓存总量
+        self._on_grow = None
+
+    def _grow(self, delta):
+        if self._on_grow is not None:
+            self._on_grow(self, delta)
+        else:
+            self.size += delta
+
+    def view(self, file_type=None):
+        """按类型过滤（只对文件，文件夹始终保留），结果会被缓存"""
+        if not file_type:
+            return self.items
+        items = self._views.get(file_type)
+        if items is None:
+            items = [item for item in self.items if _in_view(item, file_type)]
+            self._views[file_type] = items
+            self._grow(len(items) * 8)
+        return items
+
+    def sorted_view(self, sort="name", order="asc", file_type=None):
+        """按排序方式（见 SORT_KEYS）排好的视图，结果会被缓存"""
+        key = (sort, order, file_type)
+        view = self._sorted.get(key)
+        if view is None:
+            view = SortedView(self.view(file_type), sort, order)
+            self._sorted[key] = view
+            # 显示顺序列表 + 排序键
+            self._grow(len(view.items) * (8 + self.KEY_BYTES))
+        return view
+
+    def with_changes(self, upserts, removed, mtime_ns):
+        """应用一批增删改后的新列表（原列表不变，正在读取它的请求不受影响）
+
+        条目按路径替换；已生成的过滤视图和排序视图逐个二分插入/删除，
+        不重新扫描也不重新排序。
+
+        Args:
+            upserts: 新增或修改后的条目（make_item 生成）
+            removed: 被删除的路径
+            mtime_ns: 应用变化后目录的mtime
+        """
+        replaced = {item["path"] for item in upserts}
+        replaced.update(removed)
+        items = []
+        gone = []
+        for item in self.items:
+            (gone if item["path"] in replaced else items).append(item)
+        items.extend(upserts)
+        counts = dict(self.counts)
+        for item, sign in [(item, -1) for item in gone] + [(item, 1) for item in upserts]:
+            field = "folders" if item["is_folder"] else "files"
+            counts[field] = counts.get(field, 0) + sign
+
+        listing = DirectoryListing(items, counts, mtime_ns, self.scanned_at)
+        listing.live = True
+        for file_type, view in list(self._views.items()):
+            kept = [item for item in view if item["path"] not in replaced]
+            kept.extend(item for item in upserts if _in_view(item, file_type))
+            listing._views[file_type] = kept
+            listing.size += len(kept) * 8
+        for (sort, order, file_type), view in list(self._sorted.items()):
+            view = view.with_changes(
+                [item for item in gone if _in_view(item, file_type)],
+                [item for item in upserts if _in_view(item, file_type)]
+            )
+            listing._sorted[(sort, order, file_type)] = view
+            listing.size += len(view.items) * (8 + self.KEY_BYTES)
+        return listing
+
+
+class ListingCache:
+    """目录列表缓存
+
+    以目录路径为键，命中时只需一次 stat 比较目录的 mtime。新增、删除、
+    重命名文件都会更新目录mtime；原地修改已有文件不会，这类变化依赖条目
+    数据本身（缩略图/元数据按文件指纹缓存，不受影响）。被 fs_watcher
+    跟踪的目录由 apply_changes 把增删改直接应用到缓存的列表和排序视图。
+    超出内存预算时按LRU淘汰（按需生成的过滤/排序视图也计入预算）。返回的列表
+    为共享对象，调用方不可修改。
+    """
+
+    # 目录mtime距扫描时间太近时（mtime精度可能只有1-2秒，同一时刻之后的变化
+    # 不会改变mtime），缓存只在扫描后这段时间内使用，之后重新扫描确认一次
+    MTIME_GRACE = 2.0
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(config.get("listing_cache_max_mb", 64)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 目录路径 -> DirectoryListing
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.deltas = 0
+
+    def get(self, dir_path, loader):
+        """获取目录列表，缓存失效时调用 loader() 重新扫描
+
+        Args:
+            dir_path: 目录路径
+            loader: 返回 (items, counts) 的函数
+
+        Returns:
+            (DirectoryListing, 是否命中缓存)
+        """
+        key = str(dir_path)
+        st = os.stat(key)
+        listing = self._lookup(key, st)
+        if listing is not None:
+            return listing, True
+
+        scanned_at = time.time()
+        items, counts = loader()
+        listing = DirectoryListing(items, counts, st.st_mtime_ns, scanned_at)
+        self._store(key, listing)
+        return listing, False
+
+    def peek(self, dir_path):
+        """只查缓存：目录列表仍然有效时返回 DirectoryListing，否则返回None（不扫描）"""
+        key = str(dir_path)
+        return self._lookup(key, os.stat(key))
+
+    def _lookup(self, key, st):
+        with self._lock:
+            listing = self._entries.get(key)
+            if (listing is not None and listing.mtime_ns == st.st_mtime_ns and
+                    (listing.live or st.st_mtime < listing.scanned_at - self.MTIME_GRACE or
+                     time.time() < listing.scanned_at + self.MTIME_GRACE)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return listing
+            self.misses += 1
+            return None
+
+    def _store(self, key, listing):
+        with self._lock:
+            self._insert(key, listing)
+
+    def _insert(self, key, listing):
+        """调用方持有锁"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total_bytes -= old.size
+        if listing.size > self.max_bytes:
+            return
+        self._entries[key] = listing
+        self._total_bytes += listing.size
+        listing._on_grow = partial(self._charge, key)
+        self._evict()
+
+    def apply_changes(self, dir_path, upserts, removed):
+        """把文件监视器报告的变化应用到已缓存的目录列表，代替失效后重新扫描
+
+        Args:
+            upserts: 新增或修改后的条目（make_item 生成）
+            removed: 被删除的路径
+
+        Returns:
+            是否更新了缓存（目录不在缓存中时返回False）
+        """
+        key = str(dir_path)
+        with self._lock:
+            old = self._entries.get(key)
+        if old is None:
+            return False
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return False
+        listing = old.with_changes(upserts, removed, mtime_ns)
+        with self._lock:
+            # 期间被重新扫描或失效时不覆盖
+            if self._entries.get(key) is not old:
+                return False
+            self._insert(key, listing)
+            self.deltas += 1
+        return True
+
+    def _charge(self, key, listing, delta):
+        """缓存中的列表生成新视图时调用：占用计入总量并立即按预算淘汰"""
+        with self._lock:
+            listing.size += delta
+            # 已被淘汰或替换的列表不再计入
+            if self._entries.get(key) is listing:
+                self._total_bytes += delta
+                self._evict()
+
+    def _evict(self):
+        """调用方持有锁"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= evicted.size
+            self.evictions += 1
+
+    def invalidate(self, dir_path):
+        """使某个目录的缓存失效"""
+        with self._lock:
+            listing = self._entries.pop(str(dir_path), None)
+            if listing is not None:
+                self._total_bytes -= listing.size
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "deltas": self.deltas
+            }
+
+
+# 全局目录列表缓存实例
+listing_cache = ListingCache()
@@ -4,17 +4,40 @@
 """
 import os
 import json
+import time
 import shutil
 import platform
 from pathlib import Path
 from datetime import datetime
 from PIL import Image
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from .config import config
+    from .thumbnail_cache import thumbnail_cache, render_thumbnail
+    from .dir_listing import (list_directory, iter_directory, walk_directory, build_type_map, listing_cache,
+                              normalize_sort, encode_cursor, decode_cursor)
+    from .metadata_index import metadata_index
+    from .png_chunks import read_png_text, PNGFormatError
+    from .metadata_cache import metadata_cache
+    from .comfy_graph import graph_analyzer
+    from .json_codec import sanitize, loads_clean
+    from .content_hash import content_hasher
 except ImportError:
     from config import config
+    from thumbnail_cache import thumbnail_cache, render_thumbnail
+    from dir_listing import (list_directory, iter_directory, walk_directory, build_type_map, listing_cache,
+                             normalize_sort, encode_cursor, decode_cursor)
+    from metadata_index import metadata_index
+    from png_chunks import read_png_text, PNGFormatError
+    from metadata_cache import metadata_cache
+    from comfy_graph import graph_analyzer
+    from json_codec import sanitize, loads_clean
+    from content_hash import content_hasher
+
+# 用 loads_clean 解析得到的字段（已可序列化，体积大，sanitize 时跳过）
+PARSED_JSON_FIELDS = ("comfy_prompt", "comfy_workflow")
 
 class FileManager:
     """文件管理器"""
@@ -24,32 +47,60 @@ class FileManager:
         self.supported_videos = config.get("supported_formats", {}).get("videos", [])
         self.supported_workflows = config.get("supported_formats", {}).get("workflows", [])
         self.thumbnail_size = config.get("thumbnail_size", 256)
+        self.type_map = build_type_map(self.supported_images, self.supported_videos, self.supported_workflows)
+        thumbnail_cache.start_orphan_cleanup(lambda path: self._get_file_hash(path, fast=True))
     
-    def scan_directory(self, directory, recursive=True):
-        """扫描目录获取文件列表"""
+    def scan_directory(self, directory, recursive=True, max_depth=None, exclude=None, max_results=None,
+                       metadata=False, thumbnail=True):
+        """扫描目录获取文件列表（按修改时间降序）
+        
+        Args:
+            directory: 目录路径
+            recursive: 是否包含子目录（False 等同于 max_depth=0）
+            max_depth: 最大深度，None 不限
+            exclude: 排除模式列表（fnmatch通配符，见 walk_directory）
+            max_results: 最多返回多少个文件（达到后停止遍历，返回的是最先找到的文件）
+            metadata: 是否在遍历之后再提取详细元数据（_get_file_info，较慢）
+            thumbnail: 提取元数据时是否顺带生成缩略图
+        
+        默认只返回遍历得到的轻量条目（与目录列表的文件条目相同）；需要逐个生成
+        条目时直接使用 dir_listing.walk_directory。
+        """
         directory = Path(directory)
-        if not directory.exists():
+        if not directory.is_dir():
             return []
         
-        files = []
-        pattern = "**/*" if recursive else "*"
-        
-        for file_path in directory.glob(pattern):
-            if file_path.is_file():
-                file_info = self._get_file_info(file_path)
-                if file_info:
-                    files.append(file_info)
+        files = list(walk_directory(
+            directory, self.type_map, Path(config.get("outputs")),
+            max_depth=max_depth if recursive else 0, exclude=exclude, max_results=max_results
+        ))
+        if metadata:
+            files = self.enrich_files(files, thumbnail=thumbnail)
         
         # 按修改时间排序
         files.sort(key=lambda x: x['modified_time'], reverse=True)
         return files
     
-    def _get_file_info(self, file_path, include_metadata=True):
+    def enrich_files(self, files, thumbnail=True, workers=4):
+        """为轻量条目提取详细元数据（并行），无法读取的文件被丢弃
+        
+        Args:
+            files: walk_directory/scan_directory 返回的条目
+            thumbnail: 是否顺带生成缩略图
+        """
+        def enrich(item):
+            return self._get_file_info(Path(item["path"]), thumbnail=thumbnail)
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="catsee-enrich") as pool:
+            return [info for info in pool.map(enrich, files) if info]
+    
+    def _get_file_info(self, file_path, include_metadata=True, thumbnail=True):
         """获取文件信息
         
         Args:
             file_path: 文件路径
             include_metadata: 是否包含详细元数据(图片EXIF、缩略图等)
+            thumbnail: 包含元数据时是否顺带生成缩略图
         """
         try:
             stat = file_path.stat()
@@ -83,9 +134,13 @@ class FileManager:
             # 只在需要时添加详细元数据
             if include_metadata:
                 if file_type == "image":
-                    info.update(self._get_image_info(file_path))
+                    info.update(self._get_image_info(file_path, thumbnail=thumbnail))
                 elif file_type == "workflow":
                     info.update(self._get_workflow_info(file_path))
+                # 提取时统一转换成可JSON序列化的值，缓存和响应不再逐字段检查
+                parsed = {key: info.pop(key) for key in PARSED_JSON_FIELDS if key in info}
+                info = sanitize(info)
+                info.update(parsed)
             
             return info
         except Exception as e:
@@ -105,29 +160,56 @@ class FileManager:
         else:
             return "unknown"
     
-    def _get_file_hash(self, file_path, fast=True):
+    def _get_file_hash(self, file_path, fast=True, stat=None):
         """获取文件哈希值
         
         Args:
             file_path: 文件路径
-            fast: 是否使用快速哈希(只读取部分内容)
+            fast: 是否使用快速哈希(只用路径、大小和修改时间)
+            stat: 已有的stat结果（可选，避免重复stat）
         """
         try:
             if fast:
                 # 快速哈希：使用文件路径+大小+修改时间
-                stat = file_path.stat()
+                if stat is None:
+                    stat = file_path.stat()
                 hash_str = f"{file_path}_{stat.st_size}_{stat.st_mtime}"
                 return hashlib.md5(hash_str.encode()).hexdigest()
             else:
-                # 完整哈希：读取整个文件(慢)
-                with open(file_path, 'rb') as f:
-                    return hashlib.md5(f.read()).hexdigest()
+                # 内容哈希：分块读取，结果按快速哈希保存，文件未变化时不再读取
+                return content_hasher.file_hash(file_path)
         except:
             return ""
     
-    def _get_image_info(self, file_path):
-        """获取图片详细信息"""
+    def _get_image_info(self, file_path, thumbnail=True):
+        """获取图片详细信息
+        
+        Args:
+            file_path: 图片路径
+            thumbnail: 是否顺带生成缩略图（仅元数据模式下为False）
+        """
         try:
+            # PNG只读取文件头和文本块，不经过Pillow
+            if file_path.suffix.lower() == '.png':
+                try:
+                    png = read_png_text(file_path)
+                except PNGFormatError:
+                    png = None  # 扩展名是.png但内容不是，交给Pillow识别
+                if png is not None:
+                    info = {
+                        "width": png["width"],
+                        "height": png["height"],
+                        "format": png["format"],
+                        "mode": png["mode"],
+                        "aspect_ratio": round(png["width"] / png["height"], 2) if png["height"] > 0 else 0
+                    }
+                    self._parse_png_text(info, png["text"])
+                    if thumbnail:
+                        thumbnail_path = self._generate_thumbnail(file_path)
+                        if thumbnail_path:
+                            info["thumbnail"] = thumbnail_path
+                    return info
+            
             with Image.open(file_path) as img:
                 info = {
                     "width": img.width,
@@ -139,75 +221,7 @@ class FileManager:
                 
                 # 提取PNG metadata (ComfyUI/A1111等生成的图片)
                 if img.format == 'PNG':
-                    png_info = img.info
-                    print(f"[Catsee] PNG info keys: {list(png_info.keys())}")
-                    
-                    # ComfyUI prompt
-                    if 'prompt' in png_info:
-                        try:
-                            comfy_prompt = json.loads(png_info['prompt'])
-                            info["comfy_prompt"] = comfy_prompt
-                            # 提取ComfyUI中的模型信息
-                            model_info = self._extract_comfy_models(comfy_prompt)
-                            if model_info:
-                                info["comfy_models"] = model_info
-                            # 提取提示词信息
-                            prompt_info = self._extract_comfy_prompts(comfy_prompt)
-                            if prompt_info:
-                                info["comfy_prompts"] = prompt_info
-                            print(f"[Catsee] Found ComfyUI prompt with models: {list(model_info.keys()) if model_info else 'none'}")
-                            print(f"[Catsee] Found ComfyUI prompts: {list(prompt_info.keys()) if prompt_info else 'none'}")
-                        except:
-                            info["comfy_prompt"] = png_info['prompt']
-                            print(f"[Catsee] Found ComfyUI prompt (raw)")
-                    
-                    # ComfyUI workflow
-                    if 'workflow' in png_info:
-                        try:
-                            workflow = json.loads(png_info['workflow'])
-                            info["comfy_workflow"] = workflow
-                            # 提取工作流中的节点信息
-                            workflow_info = self._extract_workflow_info(workflow)
-                            if workflow_info:
-                                info["workflow_summary"] = workflow_info
-                            print(f"[Catsee] Found ComfyUI workflow with {len(workflow.get('nodes', []))} nodes")
-                        except:
-                            pass
-                    
-                    # A1111/Forge parameters
-                    if 'parameters' in png_info:
-                        info["parameters"] = png_info['parameters']
-                        # 解析parameters字符串
-                        params_text = png_info['parameters']
-                        parsed_params = self._parse_generation_params(params_text)
-                        info["parsed_params"] = parsed_params
-                        
-                        # 提取关键信息到顶层
-                        if 'model' in parsed_params:
-                            info["ai_model"] = parsed_params['model']
-                        if 'vae' in parsed_params:
-                            info["ai_vae"] = parsed_params['vae']
-                        if 'loras' in parsed_params:
-                            info["ai_loras"] = parsed_params['loras']
-                        if 'sampler' in parsed_params or 'Sampler' in parsed_params:
-                            info["ai_sampler"] = parsed_params.get('sampler', parsed_params.get('Sampler'))
-                        if 'steps' in parsed_params:
-                            info["ai_steps"] = parsed_params['steps']
-                        if 'cfg_scale' in parsed_params:
-                            info["ai_cfg"] = parsed_params['cfg_scale']
-                        if 'seed' in parsed_params:
-                            info["ai_seed"] = parsed_params['seed']
-                        
-                        print(f"[Catsee] Found A1111 parameters:")
-                        print(f"  - Model: {info.get('ai_model', 'none')}")
-                        print(f"  - VAE: {info.get('ai_vae', 'none')}")
-                        print(f"  - Loras: {len(info.get('ai_loras', []))} found")
-                        print(f"  - Parsed params keys: {list(parsed_params.keys())}")
-                    
-                    # 检查其他可能的元数据字段
-                    for key in png_info.keys():
-                        if key.lower() in ['software', 'generator', 'creation time', 'author']:
-                            info[f"meta_{key.lower().replace(' ', '_')}"] = png_info[key]
+                    self._parse_png_text(info, img.info)
                 
                 # 尝试提取JPEG的EXIF信息（仅基本信息，避免序列化问题）
                 elif img.format in ['JPEG', 'JPG']:
@@ -238,211 +252,65 @@ class FileManager:
                         print(f"[Catsee] Error reading EXIF: {e}")
                 
                 # 生成缩略图
-                thumbnail_path = self._generate_thumbnail(file_path, img)
-                if thumbnail_path:
-                    info["thumbnail"] = thumbnail_path
+                if thumbnail:
+                    thumbnail_path = self._generate_thumbnail(file_path, img)
+                    if thumbnail_path:
+                        info["thumbnail"] = thumbnail_path
                 
                 return info
         except Exception as e:
             print(f"[Catsee] Error getting image info: {e}")
             return {}
     
-    def _extract_comfy_models(self, comfy_prompt):
-        """从ComfyUI prompt中提取模型信息"""
-        try:
-            models = {}
-            
-            if isinstance(comfy_prompt, dict):
-                for node_id, node_data in comfy_prompt.items():
-                    if isinstance(node_data, dict) and 'inputs' in node_data:
-                        inputs = node_data['inputs']
-                        class_type = node_data.get('class_type', '')
-                        
-                        print(f"[Catsee] 检查节点 {node_id}: {class_type}")
-                        print(f"[Catsee] 输入参数: {list(inputs.keys())}")
-                        
-                        # 传统CheckpointLoader节点
-                        if 'ckpt_name' in inputs:
-                            models['checkpoint'] = inputs['ckpt_name']
-                            print(f"[Catsee] 发现Checkpoint: {inputs['ckpt_name']}")
-                        
-                        # 新式UNET加载器节点
-                        elif class_type == 'UNETLoader' and 'unet_name' in inputs:
-                            models['unet_model'] = inputs['unet_name']
-                            print(f"[Catsee] 发现UNET模型: {inputs['unet_name']}")
-                        
-                        # CLIP加载器节点
-                        elif class_type == 'CLIPLoader' and 'clip_name' in inputs:
-                            models['clip_model'] = inputs['clip_name']
-                            print(f"[Catsee] 发现CLIP模型: {inputs['clip_name']}")
-                        
-                        # 双CLIP加载器
-                        elif class_type == 'DualCLIPLoader':
-                            if 'clip_name1' in inputs:
-                                models['clip_model_1'] = inputs['clip_name1']
-                            if 'clip_name2' in inputs:
-                                models['clip_model_2'] = inputs['clip_name2']
-                            print(f"[Catsee] 发现双CLIP模型")
-                        
-                        # VAE加载器
-                        elif 'vae_name' in inputs:
-                            models['vae'] = inputs['vae_name']
-                            print(f"[Catsee] 发现VAE: {inputs['vae_name']}")
-                        
-                        # Lora加载器
-                        elif 'lora_name' in inputs:
-                            if 'loras' not in models:
-                                models['loras'] = []
-                            lora_info = {
-                                'name': inputs['lora_name'],
-                                'strength_model': inputs.get('strength_model', 1.0),
-                                'strength_clip': inputs.get('strength_clip', 1.0)
-                            }
-                            models['loras'].append(lora_info)
-                            print(f"[Catsee] 发现Lora: {inputs['lora_name']}")
-                        
-                        # ControlNet加载器
-                        elif 'control_net_name' in inputs:
-                            if 'controlnets' not in models:
-                                models['controlnets'] = []
-                            models['controlnets'].append(inputs['control_net_name'])
-                            print(f"[Catsee] 发现ControlNet: {inputs['control_net_name']}")
-                        
-                        # 其他可能的模型字段
-                        elif 'model_name' in inputs:
-                            models[f'{class_type.lower()}_model'] = inputs['model_name']
-                            print(f"[Catsee] 发现{class_type}模型: {inputs['model_name']}")
-                        
-                        # 检查是否有其他模型相关字段
-                        for key, value in inputs.items():
-                            if any(model_key in key.lower() for model_key in ['model', 'ckpt', 'checkpoint']) and isinstance(value, str) and value.endswith(('.safetensors', '.ckpt', '.pt', '.pth')):
-                                models[f'{class_type.lower()}_{key}'] = value
-                                print(f"[Catsee] 发现模型文件: {key} = {value}")
-            
-            print(f"[Catsee] 最终提取的模型信息: {models}")
-            return models
-        except Exception as e:
-            print(f"[Catsee] Error extracting ComfyUI models: {e}")
-            import traceback
-            traceback.print_exc()
-            return {}
-    
-    def _extract_comfy_prompts(self, comfy_prompt):
-        """从ComfyUI prompt中提取提示词信息"""
-        try:
-            prompts = {}
-            
-            if isinstance(comfy_prompt, dict):
-                for node_id, node_data in comfy_prompt.items():
-                    if isinstance(node_data, dict) and 'inputs' in node_data:
-                        inputs = node_data['inputs']
-                        class_type = node_data.get('class_type', '')
-                        
-                        print(f"[Catsee] 检查提示词节点 {node_id}: {class_type}")
-                        
-                        # 标准CLIP文本编码节点
-                        if class_type == 'CLIPTextEncode' and 'text' in inputs:
-                            text = inputs['text'].strip()
-                            if text:
-                                prompts[f'prompt_{node_id}'] = {
-                                    'text': text,
-                                    'type': 'CLIPTextEncode',
-                                    'node_id': node_id
-                                }
-                                print(f"[Catsee] 发现CLIPTextEncode提示词: {text[:50]}...")
-                        
-                        # 各种提示词和文本节点
-                        elif (
-                            '提示词列表' in class_type or 
-                            'prompt' in class_type.lower() or 
-                            '展示文本' in class_type or 
-                            '展示任何' in class_type or
-                            'Custom-Scripts' in class_type or
-                            'Easy-Use' in class_type or
-                            'text' in class_type.lower() or
-                            any(key.startswith('prompt_') for key in inputs.keys()) or
-                            any('text' in key.lower() for key in inputs.keys())
-                        ):
-                            print(f"[Catsee] 检查文本节点 {node_id}: {class_type}, 输入字段: {list(inputs.keys())}")
-                            for key, value in inputs.items():
-                                print(f"[Catsee] 检查字段 {key}: {type(value)} = {repr(value)[:100]}")
-                                
-                                if isinstance(value, str):
-                                    text_content = value.strip()
-                                    # 检查是否是文本字段（更宽松的条件）
-                                    is_text_field = (
-                                        key.startswith('prompt_') or
-                                        'text' in key.lower() or
-                                        key in ['输入任何', 'output', 'input', '列表'] or
-                                        (len(text_content) > 3 and key not in ['type', 'mode', 'seed', 'steps', 'cfg', 'sampler'])
-                                    )
-                                    
-                                    if is_text_field and text_content:
-                                        prompts[f'{class_type}_{key}_{node_id}'] = {
-                                            'text': text_content,
-                                            'type': class_type,
-                                            'field': key,
-                                            'node_id': node_id
-                                        }
-                                        print(f"[Catsee] ✅ 提取{class_type}文本 {key}: {text_content[:50]}...")
-                                    elif is_text_field:
-                                        print(f"[Catsee] ⚠️ 字段{key}是文本字段但内容为空")
-                                    else:
-                                        print(f"[Catsee] ❌ 跳过非文本字段 {key}")
-                                else:
-                                    print(f"[Catsee] ❌ 跳过非字符串字段 {key}: {type(value)}")
-                        
-                        # 其他可能包含文本的节点
-                        else:
-                            for key, value in inputs.items():
-                                if isinstance(value, str) and len(value.strip()) > 10:
-                                    # 检查是否可能是提示词（长度>10且包含常见提示词特征）
-                                    text = value.strip()
-                                    if any(word in text.lower() for word in ['beautiful', 'detailed', 'high quality', 'masterpiece', '美丽', '详细', '高质量']):
-                                        prompts[f'{class_type}_{key}'] = {
-                                            'text': text,
-                                            'type': class_type,
-                                            'field': key,
-                                            'node_id': node_id
-                                        }
-                                        print(f"[Catsee] 发现可能的提示词 {class_type}.{key}: {text[:50]}...")
-            
-            print(f"[Catsee] 最终提取的提示词: {len(prompts)} 个")
-            return prompts
-        except Exception as e:
-            print(f"[Catsee] Error extracting ComfyUI prompts: {e}")
-            import traceback
-            traceback.print_exc()
-            return {}
-    
-    def _extract_workflow_info(self, workflow):
-        """从工作流中提取关键信息"""
-        try:
-            info = {
-                'nodes_count': len(workflow.get('nodes', [])),
-                'node_types': {},
-                'has_controlnet': False,
-                'has_lora': False,
-                'has_upscaler': False
-            }
-            
-            nodes = workflow.get('nodes', [])
-            for node in nodes:
-                node_type = node.get('type', 'unknown')
-                info['node_types'][node_type] = info['node_types'].get(node_type, 0) + 1
-                
-                # 检查特殊节点类型
-                if 'controlnet' in node_type.lower():
-                    info['has_controlnet'] = True
-                elif 'lora' in node_type.lower():
-                    info['has_lora'] = True
-                elif any(upscale in node_type.lower() for upscale in ['upscale', 'esrgan', 'realesrgan']):
-                    info['has_upscaler'] = True
-            
-            return info
-        except Exception as e:
-            print(f"[Catsee] Error extracting workflow info: {e}")
-            return {}
+    def _parse_png_text(self, info, png_info):
+        """解析PNG文本块（ComfyUI prompt/workflow、A1111 parameters等），写入info"""
+        # ComfyUI prompt / workflow
+        comfy_prompt = workflow = None
+        if 'prompt' in png_info:
+            try:
+                comfy_prompt = loads_clean(png_info['prompt'])
+                info["comfy_prompt"] = comfy_prompt
+            except ValueError:
+                info["comfy_prompt"] = png_info['prompt']
+        if 'workflow' in png_info:
+            try:
+                workflow = loads_clean(png_info['workflow'])
+                info["comfy_workflow"] = workflow
+            except ValueError:
+                pass
+        if comfy_prompt is not None or workflow is not None:
+            # 单次遍历得到模型、提示词和工作流统计
+            summary = graph_analyzer.analyze(comfy_prompt, workflow)
+            info.update(summary)
+        
+        # A1111/Forge parameters
+        if 'parameters' in png_info:
+            info["parameters"] = png_info['parameters']
+            # 解析parameters字符串
+            params_text = png_info['parameters']
+            parsed_params = self._parse_generation_params(params_text)
+            info["parsed_params"] = parsed_params
+        
+            # 提取关键信息到顶层
+            if 'model' in parsed_params:
+                info["ai_model"] = parsed_params['model']
+            if 'vae' in parsed_params:
+                info["ai_vae"] = parsed_params['vae']
+            if 'loras' in parsed_params:
+                info["ai_loras"] = parsed_params['loras']
+            if 'sampler' in parsed_params or 'Sampler' in parsed_params:
+                info["ai_sampler"] = parsed_params.get('sampler', parsed_params.get('Sampler'))
+            if 'steps' in parsed_params:
+                info["ai_steps"] = parsed_params['steps']
+            if 'cfg_scale' in parsed_params:
+                info["ai_cfg"] = parsed_params['cfg_scale']
+            if 'seed' in parsed_params:
+                info["ai_seed"] = parsed_params['seed']
+        
+        # 检查其他可能的元数据字段
+        for key in png_info.keys():
+            if key.lower() in ['software', 'generator', 'creation time', 'author']:
+                info[f"meta_{key.lower().replace(' ', '_')}"] = png_info[key]
     
     def _parse_generation_params(self, params_text):
         """解析生成参数文本（A1111/Forge/SD格式）"""
@@ -608,48 +476,80 @@ class FileManager:
             return {}
     
     def _generate_thumbnail(self, file_path, img=None):
-        """生成缩略图"""
+        """生成缩略图（命中缓存时直接返回缓存路径）"""
         try:
-            # 缩略图保存路径
-            thumb_dir = config.get_temp_dir() / "thumbnails"
-            thumb_dir.mkdir(exist_ok=True)
-            
-            # 使用快速哈希作为缓存键
-            file_hash = self._get_file_hash(file_path, fast=True)
-            thumb_path = thumb_dir / f"{file_hash}.jpg"
-            
-            # 如果缩略图已存在，直接返回
-            if thumb_path.exists():
-                return str(thumb_path)
-            
-            # 生成缩略图
-            if img is None:
-                img = Image.open(file_path)
-            
-            # 创建缩略图
-            img.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
-            
-            # 转换为RGB模式（去除透明通道）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
+            file_hash, cached = self.lookup_thumbnail(file_path)
+            if cached:
+                return cached
+            if not file_hash:
+                return None
             
-            # 保存缩略图
-            img.save(thumb_path, "JPEG", quality=85, optimize=True)
-            return str(thumb_path)
+            thumb_path = render_thumbnail(file_path, thumbnail_cache.path_for(file_hash), self.thumbnail_size, img)
+            thumbnail_cache.add(file_hash, file_path)
+            return thumb_path
             
         except Exception as e:
             print(f"[Catsee] Error generating thumbnail: {e}")
             return None
     
-    def browse_directory(self, directory_path, page=1, per_page=10000, file_type=None):
-        """浏览指定目录"""
+    def get_file_fingerprint(self, file_path):
+        """文件的快速指纹（路径+大小+修改时间），文件不存在时返回空字符串"""
+        path = Path(file_path)
+        if not path.is_file():
+            return ""
+        return self._get_file_hash(path, fast=True)
+    
+    def lookup_thumbnail(self, file_path):
+        """查询缩略图缓存
+        
+        Returns:
+            (缓存键, 已缓存的缩略图路径或None)，文件不存在时缓存键为空字符串
+        """
+        path = Path(file_path)
+        if not path.is_file():
+            return "", None
+        # 使用快速哈希作为缓存键
+        file_hash = self._get_file_hash(path, fast=True)
+        cached = thumbnail_cache.get(file_hash)
+        return file_hash, (str(cached) if cached else None)
+    
+    def get_thumbnail_path(self, file_path):
+        """获取文件缩略图路径，必要时生成并写入缓存
+        
+        Args:
+            file_path: 文件路径（字符串或Path）
+            
+        Returns:
+            缩略图文件路径字符串，失败返回None
+        """
+        path = Path(file_path)
+        if not path.is_file():
+            return None
+        return self._generate_thumbnail(path)
+    
+    def browse_directory(self, directory_path, page=1, per_page=10000, file_type=None,
+                         sort="name", order=None, cursor=None):
+        """浏览指定目录
+        
+        Args:
+            page/per_page: 偏移分页（提供 cursor 时忽略 page）
+            file_type: 文件类型过滤（文件夹始终保留）
+            sort/order: 排序字段 name/mtime/size/type 和方向 asc/desc，文件夹始终在前
+            cursor: 上一页返回的 next_cursor；游标中已包含排序方式和类型过滤
+            
+        Raises:
+            ValueError: 排序参数或游标无效
+        """
+        if cursor:
+            position = decode_cursor(cursor)
+            sort, order, file_type = position["sort"], position["order"], position["file_type"]
+        else:
+            position = None
+            sort, order = normalize_sort(sort, order)
+        
         try:
             dir_path = Path(directory_path)
-            if not dir_path.exists() or not dir_path.is_dir():
+            if not dir_path.is_dir():
                 return {
                     "items": [], 
                     "total": 0, 
@@ -660,71 +560,10 @@ class FileManager:
                     "error": "目录不存在或无法访问"
                 }
             
-            # 获取文件夹和文件
-            items = []
-            
-            # 定义允许的文件扩展名
-            allowed_extensions = {
-                # 图片
-                '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif', '.ico', '.svg',
-                # 视频
-                '.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v', '.mpg', '.mpeg',
-                # JSON文件
-                '.json'
-            }
-            
             try:
-                print(f"[CatSee] Scanning directory: {dir_path}")
-                file_count = 0
-                folder_count = 0
-                skipped_count = 0
-                
-                for item in dir_path.iterdir():
-                    if item.is_dir():
-                        # 始终显示文件夹
-                        folder_info = {
-                            "name": item.name,
-                            "path": str(item),
-                            "type": "folder",
-                            "size": 0,
-                            "modified_time": item.stat().st_mtime,
-                            "created_time": item.stat().st_ctime,
-                            "is_folder": True
-                        }
-                        items.append(folder_info)
-                        folder_count += 1
-                    elif item.is_file():
-                        # 只显示允许的文件类型
-                        ext = item.suffix.lower()
-                        if ext in allowed_extensions:
-                            try:
-                                # 获取基本文件信息（不包含详细元数据，加快速度）
-                                file_info = self._get_file_info(item, include_metadata=False)
-                                if file_info:
-                                    file_info["is_folder"] = False
-                                    items.append(file_info)
-                                else:
-                                    # 如果获取详细信息失败，使用简化信息
-                                    stat = item.stat()
-                                    file_info = {
-                                        "name": item.name,
-                                        "path": str(item),
-                                        "type": "file",
-                                        "size": stat.st_size,
-                                        "extension": ext,
-                                        "modified_time": stat.st_mtime,
-                                        "created_time": stat.st_ctime,
-                                        "is_folder": False
-                                    }
-                                    items.append(file_info)
-                                file_count += 1
-                            except Exception as e:
-                                print(f"[CatSee] Error getting file info for {item.name}: {e}")
-                        else:
-                            skipped_count += 1
-                
-                print(f"[CatSee] Found: {folder_count} folders, {file_count} files, {skipped_count} skipped")
-                print(f"[CatSee] Total items returned: {len(items)}")
+                # 目录mtime未变化时直接使用内存中的列表和排序视图
+                # 命中情况见 listing_cache.stats()
+                listing, _ = listing_cache.get(dir_path, lambda: self._scan_listing(dir_path))
             except PermissionError:
                 return {
                     "items": [], 
@@ -736,24 +575,28 @@ class FileManager:
                     "error": "权限不足"
                 }
             
-            # 排序：文件夹在前，然后按名称排序
-            items.sort(key=lambda x: (not x["is_folder"], x["name"].lower()))
-            
-            # 按类型过滤（只对文件）
-            if file_type:
-                items = [item for item in items if item["is_folder"] or item.get("type") == file_type]
+            # 按类型过滤（只对文件）并排序，视图随目录列表缓存
+            view = listing.sorted_view(sort, order, file_type)
             
-            # 分页
-            total = len(items)
-            start = (page - 1) * per_page
+            # 分页：游标从上一页最后一个条目之后开始，否则按页码偏移
+            total = len(view.items)
+            if position is not None:
+                start = view.index_after(position["position"])
+            else:
+                start = (page - 1) * per_page
             end = start + per_page
-            items = items[start:end]
+            items = view.items[start:end]
+            next_cursor = encode_cursor(sort, order, file_type, items[-1]) if items and end < total else None
             
             return {
                 "items": items,
                 "total": total,
                 "page": page,
                 "per_page": per_page,
+                "offset": start,
+                "sort": sort,
+                "order": order,
+                "next_cursor": next_cursor,
                 "current_path": str(directory_path),
                 "parent_path": str(dir_path.parent) if dir_path.parent != dir_path else None
             }
@@ -768,44 +611,110 @@ class FileManager:
                 "error": f"浏览目录时出错: {str(e)}"
             }
 
+    def _scan_listing(self, dir_path):
+        """扫描目录（保持扫描顺序，排序视图由 DirectoryListing.sorted_view 按需生成）"""
+        # 输出目录每次调用只解析一次（不触发mkdir）
+        outputs_dir = Path(config.get("outputs"))
+        return list_directory(dir_path, self.type_map, outputs_dir)
+    
+    def stream_directory(self, directory_path, file_type=None):
+        """流式浏览目录，返回记录的生成器
+        
+        依次生成全部文件夹、按扫描顺序的文件，最后是 {"record": "summary", ...}
+        （总数、各类计数、排序方式）。目录列表缓存有效时从缓存读取，否则分两遍
+        扫描目录（第一遍只stat文件夹），边扫描边生成，不保留完整列表。
+        
+        Args:
+            file_type: 文件类型过滤（文件夹始终保留）
+            
+        Raises:
+            FileNotFoundError: 目录不存在
+        """
+        dir_path = Path(directory_path)
+        if not dir_path.is_dir():
+            raise FileNotFoundError("目录不存在或无法访问")
+        return self._directory_records(dir_path, file_type)
+    
+    def _directory_records(self, dir_path, file_type):
+        started = time.perf_counter()
+        total = 0
+        listing = listing_cache.peek(dir_path)
+        if listing is not None:
+            items = listing.view(file_type)
+            counts = listing.counts
+            for folder in (True, False):
+                for item in items:
+                    if item["is_folder"] is folder:
+                        total += 1
+                        yield item
+        else:
+            counts = {}
+            outputs_dir = Path(config.get("outputs"))
+            for item in iter_directory(dir_path, self.type_map, outputs_dir, counts=counts, files=False):
+                total += 1
+                yield item
+            for item in iter_directory(dir_path, self.type_map, outputs_dir, counts=counts, folders=False):
+                if file_type and item["type"] != file_type:
+                    continue
+                total += 1
+                yield item
+        
+        yield {
+            "record": "summary",
+            "total": total,
+            "folders": counts["folders"],
+            "files": counts["files"],
+            "skipped": counts["skipped"],
+            "file_type": file_type,
+            "order": "scan",
+            "folders_first": True,
+            "cached": listing is not None,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "current_path": str(dir_path),
+            "parent_path": str(dir_path.parent) if dir_path.parent != dir_path else None
+        }
+    
     def get_outputs(self, page=1, per_page=10000, file_type=None):
         """获取输出文件列表（保持向后兼容）"""
         outputs_dir = config.get_outputs_dir()
         return self.browse_directory(outputs_dir, page, per_page, file_type)
     
-    def search_files(self, query, file_type=None):
-        """搜索文件"""
-        outputs_dir = config.get_outputs_dir()
-        files = self.scan_directory(outputs_dir)
-        
-        # 按类型过滤
-        if file_type:
-            files = [f for f in files if f['type'] == file_type]
-        
-        # 按查询条件过滤
-        if query:
-            query = query.lower()
-            filtered_files = []
-            for file_info in files:
-                if (query in file_info['name'].lower() or 
-                    query in file_info.get('relative_path', '').lower()):
-                    filtered_files.append(file_info)
-            files = filtered_files
+    def search_files(self, query, file_type=None, limit=None, offset=0, **filters):
+        """搜索输出目录中的文件
         
-        return files
+        直接查询元数据索引（尚未建立或距上次更新超过 refresh_interval 时在后台
+        reindex，期间返回已索引的部分结果），不再打开图片或生成缩略图。
+        
+        Args:
+            query: 匹配文件名或相对路径的子串
+            file_type: 文件类型过滤
+            limit/offset: 分页
+            filters: checkpoint/loras/sampler/scheduler/prompts 子串匹配，seed/steps/cfg 精确匹配
+        """
+        metadata_index.ensure_fresh()
+        return metadata_index.search(query, file_type, limit=limit, offset=offset, **filters)
+    
+    def search_prompts(self, query, field="all", page=1, per_page=50):
+        """按提示词全文搜索输出目录（正向/负向提示词，支持短语、前缀和中文）"""
+        metadata_index.ensure_fresh()
+        return metadata_index.search_prompts(query, field, page, per_page)
     
     def delete_file(self, file_path):
         """删除文件"""
         try:
             file_path = Path(file_path)
             if file_path.exists():
+                # 删除前计算哈希（删除后无法再stat）
+                file_hash = self._get_file_hash(file_path, fast=True)
                 file_path.unlink()
                 
                 # 删除对应的缩略图
-                file_hash = self._get_file_hash(file_path, fast=True)
-                thumb_path = config.get_temp_dir() / "thumbnails" / f"{file_hash}.jpg"
-                if thumb_path.exists():
-                    thumb_path.unlink()
+                if file_hash:
+                    thumbnail_cache.remove(file_hash)
+                thumbnail_cache.remove_source(file_path)
+                metadata_cache.remove_source(file_path)
+                listing_cache.invalidate(file_path.parent)
+                metadata_index.remove(file_path)
                 
                 return True
         except Exception as e:
@@ -973,22 +882,36 @@ class FileManager:
         
         return quick_dirs
     
-    def get_file_metadata(self, file_path):
+    def get_file_metadata(self, file_path, metadata_only=False):
         """获取单个文件的详细元数据
         
         Args:
             file_path: 文件路径（字符串）
+            metadata_only: 只读取元数据，不生成缩略图（PNG只读到第一个IDAT块）
             
         Returns:
             包含详细元数据的字典，如果失败返回None
         """
         try:
             path = Path(file_path)
-            if not path.exists() or not path.is_file():
+            if not path.is_file():
                 return None
             
-            # 获取包含详细元数据的文件信息
-            return self._get_file_info(path, include_metadata=True)
+            # 按文件指纹缓存（重复预览、方向键切换时直接返回）
+            file_hash = self._get_file_hash(path, fast=True)
+            info = metadata_cache.get(file_hash)
+            if info is None:
+                info = self._get_file_info(path, include_metadata=True, thumbnail=False)
+                if info is None:
+                    return None
+                metadata_cache.put(file_hash, info)
+            
+            if not metadata_only and info["type"] == "image":
+                info = dict(info)  # 缓存中的字典是共享的
+                thumbnail_path = self._generate_thumbnail(path)
+                if thumbnail_path:
+                    info["thumbnail"] = thumbnail_path
+            return info
         except Exception as e:
             print(f"[Catsee] Error getting file metadata: {e}")
             return None
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+文件发送模块 - 流式/零拷贝文件响应，支持完整的HTTP Range语义
+"""
+import os
+import uuid
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+
+from aiohttp import web
+
+try:
+    from .file_manager import file_manager
+    from .task_executor import task_executor
+except ImportError:
+    from file_manager import file_manager
+    from task_executor import task_executor
+
+# 回退到分块读取时每块的大小
+CHUNK_SIZE = 256 * 1024
+# 单个请求最多接受的区间数（防止恶意的超多区间请求）
+MAX_RANGES = 16
+# 与aiohttp保持一致：设置 AIOHTTP_NOSENDFILE 时不使用sendfile
+NOSENDFILE = bool(os.environ.get("AIOHTTP_NOSENDFILE"))
+
+
+class RangeNotSatisfiable(Exception):
+    """Range请求的所有区间都超出文件范围"""
+
+
+def parse_range_header(header, size):
+    """解析Range请求头
+
+    Args:
+        header: Range请求头的值，如 "bytes=0-99,-500"
+        size: 文件大小
+
+    Returns:
+        按起点排序并合并重叠后的 [(start, end)] 闭区间列表；
+        语法无效时返回None（按RFC 9110应忽略Range，返回完整内容）
+
+    Raises:
+        RangeNotSatisfiable: 没有任何可满足的区间
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    parts = [p.strip() for p in spec.split(',') if p.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, sep, last = part.partition('-')
+        first, last = first.strip(), last.strip()
+        if not sep or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # 后缀区间 bytes=-N：最后N个字节
+            if not last:
+                return None
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            ranges.append((max(0, size - length), size - 1))
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            end = min(int(last), size - 1) if last else size - 1
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # 合并重叠或相邻的区间
+    ranges.sort()
+    merged = [list(ranges[0])]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def _parse_http_date(value):
+    """解析HTTP日期，失败返回None"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _if_range_matches(value, etag, mtime):
+    """If-Range 校验：强ETag完全相同，或日期与Last-Modified一致"""
+    value = value.strip()
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    date = _parse_http_date(value)
+    return date is not None and int(date) == int(mtime)
+
+
+def _etag_list_matches(value, etag):
+    """If-None-Match 校验（弱比较），支持逗号分隔的列表和 *"""
+    value = value.strip()
+    if value == '*':
+        return True
+    weak = etag[2:] if etag.startswith('W/') else etag
+    for candidate in value.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == weak:
+            return True
+    return False
+
+
+def _not_modified(request, etag, mtime):
+    """客户端缓存仍然有效时返回True（If-None-Match优先于If-Modified-Since）"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return _etag_list_matches(if_none_match, etag)
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if if_modified_since is not None:
+        date = _parse_http_date(if_modified_since)
+        return date is not None and int(mtime) <= int(date)
+    return False
+
+
+def _open_file(path):
+    """打开文件并返回 (文件对象, stat, ETag)，不是普通文件时返回None"""
+    try:
+        fobj = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError):
+        return None
+    try:
+        st = os.fstat(fobj.fileno())
+        if not os.path.isfile(path):
+            fobj.close()
+            return None
+        etag = f'"{file_manager._get_file_hash(path, fast=True, stat=st)}"'
+        return fobj, st, etag
+    except Exception:
+        fobj.close()
+        raise
+
+
+def _read_chunk(fobj, offset, length):
+    fobj.seek(offset)
+    return fobj.read(length)
+
+
+async def _send_range(request, response, fobj, offset, count, kind):
+    """把文件的一段发送给客户端，优先使用sendfile零拷贝"""
+    if count <= 0:
+        return
+    transport = request.transport
+    if transport is None:
+        raise ConnectionResetError("Connection lost")
+
+    if not NOSENDFILE and not response.compression:
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.sendfile(transport, fobj, offset, count)
+            return
+        except NotImplementedError:
+            pass
+
+    # 回退：按固定大小分块读取，内存占用与文件大小无关
+    while count > 0:
+        chunk = await task_executor.run(kind, _read_chunk, fobj, offset, min(CHUNK_SIZE, count))
+        if not chunk:
+            break
+        await response.write(chunk)
+        offset += len(chunk)
+        count -= len(chunk)
+
+
+async def send_file(request, path, content_type, headers=None, kind='io'):
+    """发送文件，支持条件请求(304)和Range/多区间/If-Range，返回已完成的响应
+
+    Args:
+        request: aiohttp请求
+        path: 文件路径
+        content_type: 响应的Content-Type
+        headers: 额外的响应头（如Cache-Control）
+        kind: 文件读取派发到的任务类型
+
+    Returns:
+        web.StreamResponse；文件不存在时返回404响应
+    """
+    opened = await task_executor.run(kind, _open_file, path)
+    if opened is None:
+        return web.Response(status=404, text='File not found')
+    fobj, st, etag = opened
+
+    try:
+        size = st.st_size
+        base_headers = dict(headers or {})
+        base_headers['Accept-Ranges'] = 'bytes'
+        base_headers['ETag'] = etag
+        base_headers['Last-Modified'] = formatdate(st.st_mtime, usegmt=True)
+
+        # 条件请求：缓存仍然有效时只返回304，不读取文件内容
+        if _not_modified(request, etag, st.st_mtime):
+            return web.Response(status=304, headers=base_headers)
+
+        ranges = None
+        range_header = request.headers.get('Range')
+        if range_header:
+            if_range = request.headers.get('If-Range')
+            if if_range is None or _if_range_matches(if_range, etag, st.st_mtime):
+                try:
+                    ranges = parse_range_header(range_header, size)
+                except RangeNotSatisfiable:
+                    base_headers['Content-Range'] = f'bytes */{size}'
+                    return web.Response(status=416, headers=base_headers)
+
+        send_body = request.method != 'HEAD'
+
+        if not ranges:
+            response = web.StreamResponse(status=200, headers=base_headers)
+            response.content_type = content_type
+            response.content_length = size
+            await response.prepare(request)
+            if send_body:
+                await _send_range(request, response, fobj, 0, size, kind)
+
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            base_headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response = web.StreamResponse(status=206, headers=base_headers)
+            response.content_type = content_type
+            response.content_length = end - start + 1
+            await response.prepare(request)
+            if send_body:
+                await _send_range(request, response, fobj, start, end - start + 1, kind)
+
+        else:
+            # 多区间：multipart/byteranges，预先算出准确的Content-Length
+            boundary = uuid.uuid4().hex
+            part_headers = [
+                (f'--{boundary}\r\n'
+                 f'Content-Type: {content_type}\r\n'
+                 f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('ascii')
+                for start, end in ranges
+            ]
+            closing = f'--{boundary}--\r\n'.encode('ascii')
+            length = sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(part_headers, ranges)) + len(closing)
+
+            response = web.StreamResponse(status=206, headers=base_headers)
+            response.content_type = f'multipart/byteranges; boundary={boundary}'
+            response.content_length = length
+            await response.prepare(request)
+            if send_body:
+                for head, (start, end) in zip(part_headers, ranges):
+                    await response.write(head)
+                    await _send_range(request, response, fobj, start, end - start + 1, kind)
+                    await response.write(b'\r\n')
+                await response.write(closing)
+
+        await response.write_eof()
+        return response
+    finally:
+        fobj.close()
@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+"""
+文件监视模块 - 跟踪输出目录的增删改和重命名，增量更新目录列表、元数据索引和缩略图缓存
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from collections import namedtuple, OrderedDict, defaultdict
+
+try:
+    from .config import config
+    from .dir_listing import ALLOWED_EXTENSIONS, listing_cache, make_item
+    from .file_manager import file_manager
+    from .thumbnail_cache import thumbnail_cache
+    from .metadata_cache import metadata_cache
+    from .metadata_index import metadata_index
+except ImportError:
+    from config import config
+    from dir_listing import ALLOWED_EXTENSIONS, listing_cache, make_item
+    from file_manager import file_manager
+    from thumbnail_cache import thumbnail_cache
+    from metadata_cache import metadata_cache
+    from metadata_index import metadata_index
+
+# 可选依赖：watchdog（Linux上使用inotify，macOS上FSEvents，Windows上ReadDirectoryChangesW）
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+ADDED = "added"
+MODIFIED = "modified"
+DELETED = "deleted"
+MOVED = "moved"
+
+# kind: 变化类型；path: 变化后的路径；src_path: 重命名前的路径（仅moved）
+FileEvent = namedtuple("FileEvent", "kind path is_dir src_path")
+
+# 单个目录一批变化超过此数量时直接使目录列表失效（下次浏览重新扫描），
+# 否则把变化逐个插入/删除到已缓存的列表和排序视图中
+MAX_LISTING_DELTA = 256
+
+
+def _tracked(path):
+    return os.path.splitext(path)[1].lower() in ALLOWED_EXTENSIONS
+
+
+class ChangeCoalescer:
+    """合并短时间内的大量变化
+
+    事件按路径合并（先增后删的文件直接消失、先删后增视为修改、新增后的
+    多次写入仍是新增），在 debounce 秒内没有新事件、或距第一条未处理事件
+    超过 max_delay 秒时一次性交给 flush 回调。ComfyUI批量出图时，整批
+    图片只触发一次更新。
+    """
+
+    def __init__(self, flush, debounce=0.5, max_delay=3.0):
+        self._flush = flush
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # 路径 -> FileEvent
+        self._first_at = 0
+        self._last_at = 0
+        self._stopped = False
+        self._thread = None
+        self.batches = 0
+        self.events = 0
+
+    def add(self, event):
+        with self._cond:
+            self.events += 1
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            self._last_at = now
+            self._merge(event)
+            self._cond.notify()
+
+    def _merge(self, event):
+        pending = self._pending
+        if event.kind == MOVED:
+            source = pending.pop(event.src_path, None)
+            if source is not None and source.kind == ADDED:
+                # 窗口内新建后又改名，等同于直接新建目标
+                pending[event.path] = FileEvent(ADDED, event.path, event.is_dir, None)
+            else:
+                pending[event.path] = event
+            return
+
+        previous = pending.get(event.path)
+        kind = event.kind
+        if previous is not None:
+            if previous.kind == ADDED and kind == DELETED:
+                del pending[event.path]
+                return
+            if previous.kind == ADDED and kind == MODIFIED:
+                return
+            if previous.kind == DELETED and kind == ADDED:
+                kind = MODIFIED
+            if previous.kind == MOVED and kind == MODIFIED:
+                return
+        pending[event.path] = FileEvent(kind, event.path, event.is_dir, None)
+
+    def start(self):
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="catsee-watch-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._pending:
+                        now = time.monotonic()
+                        due = min(self._last_at + self.debounce, self._first_at + self.max_delay)
+                        if now >= due:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                batch = list(self._pending.values())
+                self._pending.clear()
+            self.batches += 1
+            try:
+                self._flush(batch)
+            except Exception as e:
+                print(f"[Catsee] Error applying file changes: {e}")
+
+
+class PollingBackend:
+    """轮询后端：比较目录mtime，只重新列出发生变化的目录
+
+    新增、删除、重命名都会更新所在目录的mtime；原地修改文件不会，
+    因此每隔 full_scan_every 次轮询做一次完整比对。同一轮中删除和新增的
+    条目inode相同时识别为重命名。recursive=False 时只跟踪各目录本身的
+    条目（子目录作为条目出现，但不进入），目录可以用 watch/unwatch 动态增减。
+    """
+
+    name = "polling"
+
+    def __init__(self, roots, emit, interval=2.0, full_scan_every=30, recursive=True):
+        self.roots = list(roots)
+        self.emit = emit
+        self.interval = interval
+        self.full_scan_every = max(1, int(full_scan_every))
+        self.recursive = recursive
+        self._lock = threading.Lock()
+        self._dirs = {}  # 目录 -> mtime_ns
+        self._entries = {}  # 目录 -> {名称: (is_dir, size, mtime_ns, inode)}
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+
+    @staticmethod
+    def _list(path):
+        entries = {}
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        entries[entry.name] = (True, 0, st.st_mtime_ns, st.st_ino)
+                    elif entry.is_file() and _tracked(entry.name):
+                        st = entry.stat()
+                        entries[entry.name] = (False, st.st_size, st.st_mtime_ns, st.st_ino)
+                except OSError:
+                    continue
+        return entries
+
+    def _snapshot(self, path, events=None):
+        """记录目录树快照；events 不为None时把其中的文件作为新增事件"""
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            try:
+                mtime_ns = os.stat(current).st_mtime_ns
+                entries = self._list(current)
+            except OSError:
+                continue
+            self._dirs[current] = mtime_ns
+            self._entries[current] = entries
+            for name, (is_dir, size, _, inode) in entries.items():
+                child = os.path.join(current, name)
+                if is_dir and self.recursive:
+                    stack.append(child)
+                if events is not None:
+                    events.append((ADDED, child, is_dir, inode, size))
+
+    def _forget(self, path, events):
+        """目录被删除：其中所有已记录的条目作为删除事件"""
+        for directory in [d for d in self._dirs if d == path or d.startswith(path + os.sep)]:
+            for name, (is_dir, size, _, inode) in self._entries.pop(directory, {}).items():
+                events.append((DELETED, os.path.join(directory, name), is_dir, inode, size))
+            del self._dirs[directory]
+
+    def prime(self):
+        for root in self.roots:
+            self._snapshot(root)
+
+    def watch(self, path):
+        """开始跟踪一个目录（记录当前快照，之后的变化才产生事件）"""
+        with self._lock:
+            if path not in self._dirs:
+                self._snapshot(path)
+
+    def unwatch(self, path):
+        """停止跟踪一个目录（非递归模式下使用）"""
+        with self._lock:
+            self._dirs.pop(path, None)
+            self._entries.pop(path, None)
+
+    def poll(self, full=False):
+        """比对一次，返回 FileEvent 列表"""
+        with self._lock:
+            return self._poll(full)
+
+    def _poll(self, full):
+        events = []
+        for directory in list(self._dirs):
+            if directory not in self._dirs:
+                continue  # 已作为被删除目录的子目录处理
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._forget(directory, events)
+                if not self.recursive:
+                    # 非递归模式下没有父目录的快照来报告跟踪的目录本身消失
+                    events.append((DELETED, directory, True, 0, 0))
+                continue
+            if mtime_ns == self._dirs[directory] and not full:
+                continue
+            try:
+                current = self._list(directory)
+            except OSError:
+                continue
+            previous = self._entries.get(directory, {})
+            self._dirs[directory] = mtime_ns
+            self._entries[directory] = current
+
+            for name, old in previous.items():
+                if name not in current or current[name][0] != old[0]:
+                    path = os.path.join(directory, name)
+                    if old[0]:
+                        self._forget(path, events)
+                    events.append((DELETED, path, old[0], old[3], old[1]))
+            for name, new in current.items():
+                old = previous.get(name)
+                path = os.path.join(directory, name)
+                if old is None or old[0] != new[0]:
+                    events.append((ADDED, path, new[0], new[3], new[1]))
+                    if new[0] and self.recursive:
+                        self._snapshot(path, events)
+                elif not new[0] and (old[1] != new[1] or old[2] != new[2]):
+                    events.append((MODIFIED, path, False, new[3], new[1]))
+        return self._pair_renames(events)
+
+    @staticmethod
+    def _pair_renames(events):
+        """同一轮中 inode、类型和大小都相同的删除+新增视为重命名
+        （只比inode会把被删除文件的inode被新文件复用误判为重命名）"""
+        deleted = {}
+        for kind, path, is_dir, inode, size in events:
+            if kind == DELETED and inode:
+                deleted[(inode, is_dir, size)] = path
+        result = []
+        paired = set()
+        for kind, path, is_dir, inode, size in events:
+            key = (inode, is_dir, size)
+            if kind == ADDED and key in deleted and key not in paired:
+                paired.add(key)
+                result.append(FileEvent(MOVED, path, is_dir, deleted[key]))
+        for kind, path, is_dir, inode, size in events:
+            if (inode, is_dir, size) in paired and kind in (ADDED, DELETED):
+                continue
+            result.append(FileEvent(kind, path, is_dir, None))
+        return result
+
+    def start(self, name="catsee-watch-poll"):
+        self.prime()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.polls += 1
+            try:
+                for event in self.poll(full=self.polls % self.full_scan_every == 0):
+                    self.emit(event)
+            except Exception as e:
+                print(f"[Catsee] Polling watcher error: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, emit):
+        super().__init__()
+        self.emit = emit
+
+    def _send(self, kind, event, path=None, src_path=None):
+        path = os.fsdecode(path or event.src_path)
+        if not event.is_directory and not _tracked(path):
+            return
+        self.emit(FileEvent(kind, path, event.is_directory, os.fsdecode(src_path) if src_path else None))
+
+    def on_created(self, event):
+        self._send(ADDED, event)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._send(MODIFIED, event)
+
+    def on_deleted(self, event):
+        self._send(DELETED, event)
+
+    def on_moved(self, event):
+        dest = os.fsdecode(event.dest_path)
+        if event.is_directory or (_tracked(dest) and _tracked(os.fsdecode(event.src_path))):
+            self._send(MOVED, event, dest, event.src_path)
+        elif _tracked(dest):
+            # 临时文件改名为正式文件名
+            self._send(ADDED, event, dest)
+        else:
+            self._send(DELETED, event)
+
+
+class WatchdogBackend:
+    """事件后端：使用 watchdog（inotify/FSEvents/ReadDirectoryChangesW）"""
+
+    name = "watchdog"
+
+    def __init__(self, roots, emit):
+        self.roots = list(roots)
+        self.emit = emit
+        self._observer = None
+
+    def start(self):
+        self._observer = Observer()
+        handler = _WatchdogHandler(self.emit)
+        for root in self.roots:
+            self._observer.schedule(handler, root, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+
+def _update_listings(changes):
+    """把每个目录的增删改应用到目录列表缓存；变化太多或无法stat时使其失效"""
+    outputs_dir = Path(config.get("outputs"))
+    for directory, (upserts, removed) in changes.items():
+        if len(upserts) + len(removed) > MAX_LISTING_DELTA:
+            listing_cache.invalidate(directory)
+            continue
+        items = []
+        for path in upserts:
+            try:
+                item = make_item(path, file_manager.type_map, outputs_dir)
+            except OSError:
+                # 事件之后又被删除
+                removed.add(path)
+                continue
+            if item is not None:
+                items.append(item)
+        listing_cache.apply_changes(directory, items, removed)
+
+
+def apply_changes(batch):
+    """把一批文件变化应用到目录列表缓存、元数据索引、元数据缓存和缩略图缓存"""
+    # 目录 -> (新增或修改的路径, 删除的路径)
+    changes = defaultdict(lambda: (set(), set()))
+    updated = []
+    removed = []
+    for event in batch:
+        if event.kind == DELETED:
+            changes[os.path.dirname(event.path)][1].add(event.path)
+        else:
+            changes[os.path.dirname(event.path)][0].add(event.path)
+        if event.src_path:
+            changes[os.path.dirname(event.src_path)][1].add(event.src_path)
+        if event.is_dir:
+            # 目录自身的列表失效（改名/删除后旧键不再有效）
+            listing_cache.invalidate(event.path)
+            if event.src_path:
+                listing_cache.invalidate(event.src_path)
+            continue
+        if event.kind in (MODIFIED, DELETED):
+            # 内容变化后缓存键（路径+大小+mtime）随之变化，旧缩略图直接释放
+            thumbnail_cache.remove_source(event.path)
+            metadata_cache.remove_source(event.path)
+        if event.kind == MOVED:
+            thumbnail_cache.remove_source(event.src_path)
+            metadata_cache.remove_source(event.src_path)
+            removed.append(event.src_path)
+        if event.kind == DELETED:
+            removed.append(event.path)
+        else:
+            updated.append(event.path)
+
+    _update_listings(changes)
+    if updated or removed:
+        metadata_index.apply_changes(updated, removed)
+    return {"events": len(batch), "directories": len(changes), "updated": len(updated), "removed": len(removed)}
+
+
+class FileWatcher:
+    """输出目录变化跟踪
+
+    后端：安装了 watchdog 时使用系统通知，否则轮询目录mtime。事件经过
+    ChangeCoalescer 合并后由订阅者处理，默认订阅者 apply_changes 负责
+    更新各类缓存。启动时在后台做一次增量reindex，之后元数据索引只靠
+    事件更新。
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "backend": "auto",
+        "poll_interval": 2.0,
+        "full_scan_every": 30,
+        "debounce_ms": 500,
+        "max_delay_ms": 3000,
+        "paths": []
+    }
+
+    def __init__(self, options=None):
+        opts = config.section("watcher", self.DEFAULTS, options)
+        self.options = opts
+        self.enabled = bool(opts["enabled"])
+        self.backend = None
+        self.roots = []
+        self._subscribers = [apply_changes]
+        self._lock = threading.Lock()
+        self.last_batch = None
+        self.coalescer = ChangeCoalescer(
+            self._dispatch,
+            debounce=max(0, int(opts["debounce_ms"])) / 1000,
+            max_delay=max(0, int(opts["max_delay_ms"])) / 1000
+        )
+
+    def subscribe(self, callback):
+        """订阅合并后的变化批次，callback(batch) 在监视线程中调用"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _dispatch(self, batch):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                result = callback(batch)
+                if callback is apply_changes:
+                    self.last_batch = result
+            except Exception as e:
+                print(f"[Catsee] File change subscriber error: {e}")
+
+    def start(self):
+        """启动监视（重复调用无副作用）"""
+        if not self.enabled or self.backend is not None:
+            return
+        roots = [config.get("outputs")] + list(self.options.get("paths") or [])
+        self.roots = [os.path.abspath(str(root)) for root in roots if root and os.path.isdir(str(root))]
+        if not self.roots:
+            return
+
+        choice = self.options.get("backend", "auto")
+        if choice in ("auto", "watchdog") and WATCHDOG_AVAILABLE:
+            backend = WatchdogBackend(self.roots, self.coalescer.add)
+        else:
+            if choice == "watchdog":
+                print("[Catsee] watchdog not installed, falling back to polling")
+            backend = PollingBackend(
+                self.roots, self.coalescer.add,
+                interval=float(self.options["poll_interval"]),
+                full_scan_every=self.options["full_scan_every"]
+            )
+
+        self.coalescer.start()
+        self.backend = backend
+
+        def run():
+            try:
+                backend.start()
+                print(f"[Catsee] Watching {', '.join(self.roots)} ({backend.name})")
+                # 启动前的变化通过一次增量reindex补上，之后只靠事件
+                for root in self.roots:
+                    metadata_index.reindex(root)
+                    metadata_index.live_roots.add(root)
+            except Exception as e:
+                print(f"[Catsee] Failed to start file watcher: {e}")
+
+        threading.Thread(target=run, name="catsee-watch-start", daemon=True).start()
+
+    def stop(self):
+        if self.backend is not None:
+            self.backend.stop()
+            self.backend = None
+        self.coalescer.stop()
+        for root in self.roots:
+            metadata_index.live_roots.discard(root)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name if self.backend else None,
+            "roots": self.roots,
+            "events": self.coalescer.events,
+            "batches": self.coalescer.batches,
+            "last_batch": self.last_batch
+        }
+
+
+# 全局文件监视器实例
+file_watcher = FileWatcher()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图解码策略模块 - 按格式选择低分辨率解码路径，避免完整解码大图
+"""
+import io
+from PIL import Image
+
+# reduce() 之后至少保留最终尺寸的多少倍，再交给LANCZOS做最终重采样
+REDUCING_GAP = 2
+# EXIF内嵌缩略图与原图宽高比允许的相对误差（部分相机会给缩略图加黑边）
+EXIF_ASPECT_TOLERANCE = 0.02
+# reduce() 支持的模式
+REDUCIBLE_MODES = ('L', 'LA', 'La', 'RGB', 'RGBA', 'RGBa', 'RGBX', 'CMYK', 'I', 'F')
+
+
+def _exif_thumbnail(img, size):
+    """读取JPEG内嵌的EXIF缩略图，足够大且宽高比一致时返回，否则返回None"""
+    raw = img.info.get('exif')
+    if not raw or not raw.startswith(b'Exif\x00\x00'):
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(-1)  # ExifTags.IFD.IFD1
+        offset = ifd1.get(0x0201)  # JPEGInterchangeFormat
+        length = ifd1.get(0x0202)  # JPEGInterchangeFormatLength
+        if not offset or not length:
+            return None
+        # 偏移量相对于TIFF头（跳过 "Exif\0\0" 6个字节）
+        data = raw[6 + offset:6 + offset + length]
+        thumb = Image.open(io.BytesIO(data))
+        if max(thumb.size) < size:
+            return None
+        ratio = img.width / img.height
+        if abs(thumb.width / thumb.height - ratio) > ratio * EXIF_ASPECT_TOLERANCE:
+            return None
+        thumb.load()
+        return thumb
+    except Exception:
+        return None
+
+
+def decode_for_thumbnail(source_path, size, img=None, use_exif=True):
+    """以尽量低的分辨率解码图片，供生成 size x size 以内的缩略图
+
+    按格式选择策略：
+      - JPEG: 内嵌EXIF缩略图够大时直接使用；否则用 draft() 做DCT缩放解码
+        （1/2、1/4、1/8），只解码需要的分辨率
+      - 其他格式（PNG/WebP/...）：完整解码后先用 reduce() 做整数倍盒式缩小，
+        保留最终尺寸的 REDUCING_GAP 倍，再交给调用方做最终重采样
+
+    Args:
+        source_path: 源图片路径
+        size: 缩略图最大边长
+        img: 已打开但尚未加载像素的PIL图片（可选）
+        use_exif: 是否允许使用EXIF内嵌缩略图
+
+    Returns:
+        (图片, 策略名)，策略名为 exif/draft/reduce/full 之一；由本函数打开的
+        原图在返回另一张图片时会被关闭
+    """
+    opened = img is None
+    if opened:
+        img = Image.open(source_path)
+
+    if img.format == 'JPEG':
+        if use_exif:
+            thumb = _exif_thumbnail(img, size)
+            if thumb is not None:
+                if opened:
+                    img.close()
+                return thumb, "exif"
+        original = img.size
+        # draft按宽高分别计算缩放比例并取较小值，必须传入保持宽高比的目标尺寸
+        scale = size * REDUCING_GAP / max(original)
+        if scale < 1:
+            img.draft(None, (max(1, int(original[0] * scale)), max(1, int(original[1] * scale))))
+        return img, ("draft" if img.size != original else "full")
+
+    factor = max(img.size) // (size * REDUCING_GAP)
+    if factor >= 2 and img.mode in REDUCIBLE_MODES:
+        try:
+            reduced = img.reduce(factor)
+        except (ValueError, OSError):
+            pass
+        else:
+            if opened:
+                img.close()
+            return reduced, "reduce"
+    return img, "full"
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+JSON编解码模块 - API响应的序列化后端（安装了orjson时使用orjson，否则标准库json）
+"""
+import json
+import math
+import numbers
+from datetime import date, datetime
+from pathlib import PurePath
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+# orjson 为可选依赖
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULTS = {
+    "backend": "auto"  # auto / orjson / json
+}
+
+# 无法识别的值转成字符串时保留的最大长度
+MAX_REPR_LENGTH = 1000
+
+# orjson 支持的整数范围（超出时回退到标准库）
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 64) - 1
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj)
+
+
+# 后端名 -> (dumps(obj) -> UTF-8字节, loads(str|bytes) -> 对象)
+_BACKENDS = {"json": (_json_dumps, json.loads)}
+if orjson is not None:
+    _BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+
+
+def register_backend(name, dumps, loads):
+    """注册序列化后端
+
+    Args:
+        name: 后端名，可在配置 serializer.backend 中选择
+        dumps: obj -> UTF-8编码的JSON字节；遇到无法序列化的值时抛出TypeError
+        loads: str/bytes -> obj
+    """
+    _BACKENDS[name] = (dumps, loads)
+
+
+def sanitize(value):
+    """把值转换为任何后端都能序列化的形式
+
+    非字符串键转成字符串，NaN/Infinity 转成 None（浏览器的JSON.parse不接受），
+    bytes 按UTF-8解码，元组/集合转成列表，Pillow的 IFDRational 等数值类型转成
+    float，日期转ISO字符串，其余对象取 str() 的前 MAX_REPR_LENGTH 个字符。
+    容器里没有需要转换的值时原样返回，不复制。
+    """
+    kind = type(value)
+    if kind is str or kind is bool or value is None:
+        return value
+    if kind is dict:
+        return _sanitize_dict(value)
+    if kind is list:
+        return _sanitize_list(value)
+    if kind is int:
+        return value if _INT_MIN <= value <= _INT_MAX else str(value)
+    if kind is float:
+        return value if math.isfinite(value) else None
+    return _sanitize_other(value)
+
+
+def _sanitize_dict(value):
+    result = None
+    for key, item in value.items():
+        # 工作流里绝大多数值是字符串，跳过函数调用
+        clean = item if type(item) is str else sanitize(item)
+        clean_key = key if type(key) is str else str(key)
+        if result is None:
+            if clean is item and clean_key is key:
+                continue
+            # 第一个需要转换的值：复制此前的条目
+            result = {}
+            for done_key, done_item in value.items():
+                if done_key is key:
+                    break
+                result[done_key] = done_item
+        result[clean_key] = clean
+    return value if result is None else result
+
+
+def _sanitize_list(value):
+    result = None
+    for index, item in enumerate(value):
+        clean = item if type(item) is str else sanitize(item)
+        if result is None:
+            if clean is item:
+                continue
+            result = value[:index]
+        result.append(clean)
+    return value if result is None else result
+
+
+def _sanitize_other(value):
+    """str/dict/list/int/float 的子类以及其他类型"""
+    if isinstance(value, (str, bool)):
+        return str(value) if isinstance(value, str) else bool(value)
+    if isinstance(value, dict):
+        return _sanitize_dict(dict(value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [sanitize(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="ignore")[:MAX_REPR_LENGTH]
+    if isinstance(value, numbers.Integral):
+        return sanitize(int(value))
+    if isinstance(value, numbers.Real):
+        try:
+            return sanitize(float(value))
+        except (TypeError, ValueError, ZeroDivisionError):
+            return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, PurePath):
+        return str(value)
+    try:
+        return str(value)[:MAX_REPR_LENGTH]
+    except Exception:
+        return None
+
+
+def loads_clean(text):
+    """解析不可信的JSON文本（如PNG文本块），结果无需再 sanitize
+
+    标准库接受 NaN/Infinity，这里解析成 None。
+    """
+    return json.loads(text, parse_constant=lambda name: None)
+
+
+class JSONCodec:
+    """JSON序列化
+
+    数据应在提取时经过 sanitize（见 FileManager._get_file_info）；个别没有经过
+    sanitize 的值导致后端抛出TypeError时，整体 sanitize 一次后用标准库重新序列化，
+    而不是逐字段试探。
+    """
+
+    def __init__(self, backend=None):
+        if backend is None:
+            settings = config.section("serializer", DEFAULTS)
+            backend = settings["backend"]
+        if backend == "auto":
+            backend = "orjson" if "orjson" in _BACKENDS else "json"
+        elif backend not in _BACKENDS:
+            print(f"[Catsee] JSON backend {backend} not available, falling back to json")
+            backend = "json"
+        self.backend = backend
+        self._dumps, self._loads = _BACKENDS[backend]
+        self.fallbacks = 0
+
+    def dumps(self, obj):
+        """序列化为UTF-8编码的JSON字节"""
+        try:
+            return self._dumps(obj)
+        except (TypeError, ValueError, OverflowError) as e:
+            self.fallbacks += 1
+            print(f"[Catsee] JSON serialization fell back to sanitize: {e}")
+            return _json_dumps(sanitize(obj))
+
+    def dumps_text(self, obj):
+        """序列化为JSON字符串"""
+        return self.dumps(obj).decode("utf-8")
+
+    def loads(self, data):
+        return self._loads(data)
+
+    def stats(self):
+        return {"backend": self.backend, "available": sorted(_BACKENDS), "fallbacks": self.fallbacks}
+
+
+# 全局JSON编解码实例
+json_codec = JSONCodec()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+目录变化推送模块 - 浏览器通过WebSocket订阅正在查看的目录，服务端推送增删改增量
+"""
+import os
+import asyncio
+import threading
+from pathlib import Path
+
+from aiohttp import web, WSMsgType
+
+try:
+    from .config import config
+    from .dir_listing import make_item, listing_cache
+    from .fs_watcher import file_watcher, PollingBackend, ChangeCoalescer, ADDED, MODIFIED, DELETED, MOVED
+    from .file_manager import file_manager
+    from .task_executor import task_executor, QueueFullError
+    from .json_codec import json_codec
+except ImportError:
+    from config import config
+    from dir_listing import make_item, listing_cache
+    from fs_watcher import file_watcher, PollingBackend, ChangeCoalescer, ADDED, MODIFIED, DELETED, MOVED
+    from file_manager import file_manager
+    from task_executor import task_executor, QueueFullError
+    from json_codec import json_codec
+
+DEFAULTS = {
+    "enabled": True,
+    "poll_interval": 2.0,  # 不在 fs_watcher 监视范围内的目录的轮询间隔
+    "full_scan_every": 15,  # 轮询目录每隔多少次完整比对一次（发现原地修改）
+    "debounce_ms": 300,
+    "max_delay_ms": 1500,
+    "max_delta_items": 500,  # 单次变化超过此条目数时让客户端重新加载
+    "max_subscriptions": 8,  # 每个连接最多订阅的目录数
+    "heartbeat": 30
+}
+
+
+def _key(path):
+    """订阅键：规范化的绝对路径（Windows上不区分大小写）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class _Subscription:
+    def __init__(self, path, watched):
+        self.path = path
+        self.watched = watched  # True: 由 fs_watcher 的事件驱动；False: 由本模块轮询
+        self.sockets = {}  # WebSocketResponse -> 客户端订阅时使用的路径
+        self.seq = 0
+
+
+class LiveUpdates:
+    """目录变化推送
+
+    客户端连接 /browser/api/ws 后发送 {"type": "subscribe", "path": 目录}，之后
+    收到 {"type": "delta", "path", "seq", "added", "modified", "removed"}：
+    added/modified 为与 browse 接口相同的条目，removed 为路径列表。变化太多
+    （超过 max_delta_items）或订阅的目录本身被删除/改名时收到
+    {"type": "resync", "path"}，客户端应重新获取完整列表。
+
+    变化来源：位于 fs_watcher 监视范围内的目录直接使用其合并后的事件批次；
+    其他目录由一个非递归的 PollingBackend 轮询，只在有订阅时跟踪。两者都在
+    后台线程中回调，条目在该线程中stat，然后通过 loop.call_soon_threadsafe
+    交给事件循环发送。
+    """
+
+    def __init__(self, options=None):
+        opts = config.section("live_updates", DEFAULTS, options)
+        self.enabled = bool(opts["enabled"])
+        self.max_delta_items = max(1, int(opts["max_delta_items"]))
+        self.max_subscriptions = max(1, int(opts["max_subscriptions"]))
+        self.heartbeat = float(opts["heartbeat"])
+        self._lock = threading.Lock()
+        self._subs = {}  # 订阅键 -> _Subscription
+        self._loop = None
+        self._started = False
+        self.coalescer = ChangeCoalescer(
+            self._on_batch,
+            debounce=max(0, int(opts["debounce_ms"])) / 1000,
+            max_delay=max(0, int(opts["max_delay_ms"])) / 1000
+        )
+        self.poller = PollingBackend(
+            [], self.coalescer.add,
+            interval=float(opts["poll_interval"]),
+            full_scan_every=opts["full_scan_every"],
+            recursive=False
+        )
+        self.clients = 0
+        self.deltas = 0
+        self.resyncs = 0
+
+    def _start(self):
+        """第一个连接到来时接入 fs_watcher 并启动轮询线程"""
+        if self._started:
+            return
+        self._started = True
+        file_watcher.subscribe(self._on_batch)
+        self.coalescer.start()
+        self.poller.start(name="catsee-live-poll")
+
+    @staticmethod
+    def _is_watched(key):
+        if file_watcher.backend is None:
+            return False
+        for root in file_watcher.roots:
+            root = _key(root)
+            if key == root or key.startswith(root.rstrip(os.sep) + os.sep):
+                return True
+        return False
+
+    # ---- WebSocket ----
+
+    async def handle(self, request):
+        """WebSocket连接处理"""
+        if not self.enabled:
+            return web.json_response({'success': False, 'error': '目录推送未启用'}, status=404)
+        ws = web.WebSocketResponse(heartbeat=self.heartbeat or None)
+        await ws.prepare(request)
+        self._loop = asyncio.get_running_loop()
+        self._start()
+        self.clients += 1
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    message = json_codec.loads(msg.data)
+                    kind = message.get("type")
+                    path = message.get("path") or ""
+                except Exception:
+                    await self._send(ws, {"type": "error", "error": "消息不是有效的JSON"})
+                    continue
+                if kind == "subscribe":
+                    await self._subscribe(ws, path)
+                elif kind == "unsubscribe":
+                    await self._unsubscribe(ws, path)
+                elif kind == "ping":
+                    await self._send(ws, {"type": "pong"})
+                else:
+                    await self._send(ws, {"type": "error", "error": f"未知的消息类型: {kind}"})
+        finally:
+            self.clients -= 1
+            for key in self._socket_keys(ws):
+                await self._release(ws, key)
+        return ws
+
+    def _socket_keys(self, ws):
+        with self._lock:
+            return [key for key, sub in self._subs.items() if ws in sub.sockets]
+
+    async def _subscribe(self, ws, path):
+        if not path:
+            await self._send(ws, {"type": "error", "error": "缺少路径参数"})
+            return
+        key = _key(path)
+        with self._lock:
+            sub = self._subs.get(key)
+            count = sum(1 for s in self._subs.values() if ws in s.sockets)
+        if (sub is None or ws not in sub.sockets) and count >= self.max_subscriptions:
+            await self._send(ws, {"type": "error", "path": path, "error": "订阅的目录过多"})
+            return
+        if not os.path.isdir(path):
+            await self._send(ws, {"type": "error", "path": path, "error": "目录不存在或无法访问"})
+            return
+
+        watched = sub.watched if sub is not None else self._is_watched(key)
+        if not watched:
+            # 记录当前快照，之后的变化才推送（已跟踪时不做任何事；目录被删除后
+            # 轮询不再跟踪它，客户端收到resync后重新订阅时恢复）
+            try:
+                await task_executor.run('io', self.poller.watch, os.path.abspath(path))
+            except QueueFullError:
+                await self._send(ws, {"type": "error", "path": path, "error": "服务器繁忙，请稍后重试"})
+                return
+        if sub is None:
+            with self._lock:
+                sub = self._subs.setdefault(key, _Subscription(os.path.abspath(path), watched))
+        with self._lock:
+            sub.sockets[ws] = path
+        await self._send(ws, {"type": "subscribed", "path": path, "watched": sub.watched, "seq": sub.seq})
+
+    async def _unsubscribe(self, ws, path):
+        await self._release(ws, _key(path))
+        await self._send(ws, {"type": "unsubscribed", "path": path})
+
+    async def _release(self, ws, key):
+        with self._lock:
+            sub = self._subs.get(key)
+            if sub is None:
+                return
+            sub.sockets.pop(ws, None)
+            if sub.sockets:
+                return
+            del self._subs[key]
+        if not sub.watched:
+            try:
+                await task_executor.run('io', self.poller.unwatch, sub.path)
+            except QueueFullError:
+                self.poller.unwatch(sub.path)
+
+    @staticmethod
+    async def _send(ws, message):
+        if ws.closed:
+            return
+        try:
+            await ws.send_str(json_codec.dumps_text(message))
+        except (ConnectionResetError, RuntimeError):
+            pass
+
+    # ---- 变化检测（后台线程） ----
+
+    def _on_batch(self, batch):
+        """fs_watcher 或轮询线程回调：把一批变化整理成各订阅目录的增量"""
+        with self._lock:
+            if not self._subs or self._loop is None:
+                return
+            subscribed = set(self._subs)
+
+        changes = {}  # 订阅键 -> {"added": [], "modified": [], "removed": [], "resync": bool}
+
+        def change(key):
+            return changes.setdefault(key, {"added": [], "modified": [], "removed": [], "resync": False})
+
+        for event in batch:
+            key = _key(event.path)
+            parent = os.path.dirname(key)
+            if event.kind == MOVED:
+                src_key = _key(event.src_path)
+                if src_key in subscribed:
+                    change(src_key)["resync"] = True
+                if os.path.dirname(src_key) in subscribed:
+                    change(os.path.dirname(src_key))["removed"].append(event.src_path)
+                if parent in subscribed:
+                    change(parent)["added"].append(event.path)
+                continue
+            if event.kind == DELETED and key in subscribed:
+                change(key)["resync"] = True
+            if parent not in subscribed:
+                continue
+            if event.kind == DELETED:
+                change(parent)["removed"].append(event.path)
+            elif event.kind == ADDED:
+                change(parent)["added"].append(event.path)
+            elif event.kind == MODIFIED:
+                change(parent)["modified"].append(event.path)
+
+        for key, delta in changes.items():
+            with self._lock:
+                sub = self._subs.get(key)
+            if sub is None:
+                continue
+            if not sub.watched:
+                # 轮询的目录不在 fs_watcher 范围内，目录列表缓存由这里失效
+                with self._lock:
+                    paths = {sub.path, *sub.sockets.values()}
+                for path in paths:
+                    listing_cache.invalidate(path)
+            message = self._build_delta(delta)
+            if message is not None:
+                self._loop.call_soon_threadsafe(self._publish, key, message)
+
+    def _build_delta(self, delta):
+        if delta["resync"]:
+            return {"type": "resync"}
+        if len(delta["added"]) + len(delta["modified"]) + len(delta["removed"]) > self.max_delta_items:
+            return {"type": "resync"}
+        outputs_dir = config.get("outputs")
+        outputs_dir = Path(outputs_dir) if outputs_dir else None
+        message = {"type": "delta", "added": [], "modified": [], "removed": list(delta["removed"])}
+        for kind in ("added", "modified"):
+            for path in delta[kind]:
+                try:
+                    item = make_item(path, file_manager.type_map, outputs_dir)
+                except OSError:
+                    # 事件之后文件已经被删除
+                    message["removed"].append(path)
+                    continue
+                if item is not None:
+                    message[kind].append(item)
+        if not (message["added"] or message["modified"] or message["removed"]):
+            return None
+        return message
+
+    # ---- 发送（事件循环） ----
+
+    def _publish(self, key, message):
+        with self._lock:
+            sub = self._subs.get(key)
+            if sub is None:
+                return
+            sub.seq += 1
+            targets = list(sub.sockets.items())
+            seq = sub.seq
+        if message["type"] == "resync":
+            self.resyncs += 1
+        else:
+            self.deltas += 1
+        for ws, path in targets:
+            asyncio.ensure_future(self._send(ws, dict(message, path=path, seq=seq)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "clients": self.clients,
+                "subscriptions": len(self._subs),
+                "polled": sum(1 for sub in self._subs.values() if not sub.watched),
+                "deltas": self.deltas,
+                "resyncs": self.resyncs
+            }
+
+
+# 全局目录推送实例
+live_updates = LiveUpdates()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+元数据缓存模块 - get_file_metadata 结果的内存LRU缓存，淘汰的条目可溢出到磁盘
+"""
+import os
+import atexit
+import threading
+from collections import OrderedDict
+
+try:
+    from .config import config
+    from .thumbnail_cache import ThumbnailCache
+    from .json_codec import json_codec
+except ImportError:
+    from config import config
+    from thumbnail_cache import ThumbnailCache
+    from json_codec import json_codec
+
+DEFAULTS = {
+    "enabled": True,
+    "max_mb": 64,
+    "spill": True,
+    "spill_max_mb": 256
+}
+
+
+class MetadataCache:
+    """文件元数据缓存
+
+    缓存键为 FileManager._get_file_hash(fast=True)（路径+大小+修改时间），
+    文件修改后键随之变化，旧条目不会再被命中。条目大小按JSON编码后的字节数
+    计算，超出内存预算时按LRU淘汰；开启 spill 时被淘汰的条目写入
+    temp/metadata_v<版本>/<hash>.meta.json（磁盘部分复用 ThumbnailCache 的LRU），
+    之后命中时读回内存。返回的字典为共享对象，调用方不可修改。
+    """
+
+    # 元数据字段变化时递增，磁盘上旧格式的条目不再使用
+    FORMAT_VERSION = 2
+
+    def __init__(self, max_bytes=None, spill=None, spill_max_bytes=None):
+        settings = config.section("metadata_cache", DEFAULTS)
+        self.enabled = bool(settings["enabled"])
+        if max_bytes is None:
+            max_bytes = int(settings["max_mb"]) * 1024 * 1024
+        if spill is None:
+            spill = bool(settings["spill"])
+        if spill_max_bytes is None:
+            spill_max_bytes = int(settings["spill_max_mb"]) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.spill = ThumbnailCache(
+            max_bytes=spill_max_bytes, subdir=f"metadata_v{self.FORMAT_VERSION}", suffix=".meta.json"
+        ) if spill else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (size, metadata)
+        self._path_keys = {}  # 源文件路径 -> key
+        self._total_bytes = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """查找缓存，命中返回元数据字典，否则返回None"""
+        if not key or not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        metadata, data = self._load_spilled(key)
+        if metadata is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.spill_hits += 1
+        self._store(key, metadata, data)
+        return metadata
+
+    def put(self, key, metadata):
+        """写入缓存（metadata 需可JSON序列化，否则只是不缓存）"""
+        if not key or not self.enabled:
+            return
+        try:
+            encoded = json_codec.dumps(metadata)
+        except (TypeError, ValueError):
+            return
+        self._store(key, metadata, encoded)
+
+    def _store(self, key, metadata, encoded):
+        size = len(encoded)
+        source = metadata.get("path")
+        evicted = []
+        with self._lock:
+            self._drop(key)
+            if size > self.max_bytes:
+                evicted.append((key, metadata, encoded))
+            else:
+                # 同一源文件的旧条目（文件已修改）不会再被命中
+                old_key = self._path_keys.get(source)
+                if old_key and old_key != key:
+                    self._drop(old_key)
+                self._entries[key] = (size, metadata)
+                self._total_bytes += size
+                if source:
+                    self._path_keys[source] = key
+                while self._total_bytes > self.max_bytes and self._entries:
+                    old_key = next(iter(self._entries))
+                    evicted.append((old_key, self._drop(old_key), None))
+                    self.evictions += 1
+        # 磁盘写入在锁外进行
+        for old_key, old_metadata, data in evicted:
+            self._spill(old_key, old_metadata, data)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._total_bytes -= entry[0]
+        source = entry[1].get("path")
+        if source and self._path_keys.get(source) == key:
+            del self._path_keys[source]
+        return entry[1]
+
+    def _spill(self, key, metadata, data=None):
+        """把被淘汰的条目写入磁盘缓存"""
+        if self.spill is None or self.spill.contains(key):
+            return
+        path = self.spill.path_for(key)
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if data is None:
+                data = json_codec.dumps(metadata)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.spill.add(key, metadata.get("path", ""))
+        except Exception as e:
+            print(f"[Catsee] Error spilling metadata cache entry: {e}")
+
+    def _load_spilled(self, key):
+        """从磁盘读回条目，返回 (元数据, 编码后的字节)"""
+        if self.spill is None:
+            return None, None
+        path = self.spill.get(key)
+        if path is None:
+            return None, None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            return json_codec.loads(data), data
+        except Exception:
+            self.spill.remove(key)
+            return None, None
+
+    def remove_source(self, source_path):
+        """删除某个源文件的缓存（文件修改、删除或移动时）"""
+        source = str(source_path)
+        with self._lock:
+            key = self._path_keys.get(source)
+            if key:
+                self._drop(key)
+        if self.spill is not None:
+            self.spill.remove_source(source)
+
+    def clear(self):
+        """清空内存缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._path_keys.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+        if self.spill is not None:
+            stats["spill"] = self.spill.stats()
+        return stats
+
+
+# 全局元数据缓存实例
+metadata_cache = MetadataCache()
+if metadata_cache.spill is not None:
+    atexit.register(metadata_cache.spill.flush)
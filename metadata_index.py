@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""
+元数据索引模块 - 把输出目录的文件信息和生成参数保存到SQLite，供搜索直接查询
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+try:
+    from .config import config
+    from .prompt_index import PromptIndex
+    from .png_chunks import read_png_text
+    from .comfy_graph import graph_analyzer
+    from .sqlite_store import SQLiteStore
+    from .dir_listing import walk_directory, make_item
+except ImportError:
+    from config import config
+    from prompt_index import PromptIndex
+    from png_chunks import read_png_text
+    from comfy_graph import graph_analyzer
+    from sqlite_store import SQLiteStore
+    from dir_listing import walk_directory, make_item
+
+# 表结构或提取规则变化时递增，打开旧版本数据库会重建
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    relative_path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    type TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    modified_time REAL NOT NULL,
+    created_time REAL NOT NULL,
+    hash TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    checkpoint TEXT,
+    loras TEXT,
+    sampler TEXT,
+    scheduler TEXT,
+    seed INTEGER,
+    steps INTEGER,
+    cfg REAL,
+    positive_prompt TEXT,
+    negative_prompt TEXT,
+    prompts TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_directory ON files(directory);
+CREATE INDEX IF NOT EXISTS idx_files_mtime ON files(modified_time DESC);
+CREATE INDEX IF NOT EXISTS idx_files_checkpoint ON files(checkpoint);
+CREATE INDEX IF NOT EXISTS idx_files_seed ON files(seed);
+"""
+
+# 搜索时可以用的精确匹配/子串匹配字段
+EXACT_FILTERS = ("seed", "steps", "cfg")
+TEXT_FILTERS = ("checkpoint", "loras", "sampler", "scheduler", "prompts")
+
+# 写库的批大小
+BATCH_SIZE = 200
+
+
+def extract_comfy_fields(prompt):
+    """从ComfyUI prompt（API格式）中提取搜索字段
+
+    使用与预览面板相同的图分析（GraphAnalyzer.analyze_prompt）：正/负向提示词
+    沿采样器或guider的条件连线查找，找不到时用第一段CLIPTextEncode文本；
+    仍然没有时把收集到的全部文本当作正向提示词，保证全文索引能搜到。
+    """
+    models, prompts, params = graph_analyzer.analyze_prompt(prompt)
+    fields = {}
+    if isinstance(params.get("model"), str):
+        fields["checkpoint"] = params["model"]
+    loras = [str(lora["name"]) for lora in models.get("loras", [])]
+    if loras:
+        fields["loras"] = "\n".join(loras)
+    for field in ("sampler", "scheduler", "positive_prompt", "negative_prompt"):
+        if isinstance(params.get(field), str):
+            fields[field] = params[field]
+    for field in ("seed", "steps"):
+        if isinstance(params.get(field), int):
+            fields[field] = params[field]
+    if isinstance(params.get("cfg"), (int, float)):
+        fields["cfg"] = float(params["cfg"])
+
+    texts = list(dict.fromkeys(entry["text"] for entry in prompts.values()))
+    if texts:
+        fields["prompts"] = "\n".join(texts)
+        fields.setdefault("positive_prompt", fields["prompts"])
+    return fields
+
+
+def extract_a1111_fields(parameters):
+    """从A1111/Forge的parameters文本中提取搜索字段"""
+    try:
+        from .file_manager import file_manager
+    except ImportError:
+        from file_manager import file_manager
+
+    params = file_manager._parse_generation_params(parameters)
+    fields = {}
+    if params.get("model"):
+        fields["checkpoint"] = params["model"]
+    sampler = params.get("sampler", params.get("Sampler"))
+    if sampler:
+        fields["sampler"] = sampler
+    if params.get("Schedule type"):
+        fields["scheduler"] = params["Schedule type"]
+    for key, field in (("seed", "seed"), ("steps", "steps"), ("cfg_scale", "cfg")):
+        if key in params:
+            fields[field] = params[key]
+    if params.get("loras"):
+        fields["loras"] = "\n".join(lora["name"] for lora in params["loras"])
+    if params.get("prompt"):
+        fields["positive_prompt"] = params["prompt"]
+    if params.get("negative_prompt"):
+        fields["negative_prompt"] = params["negative_prompt"]
+    texts = [fields[key] for key in ("positive_prompt", "negative_prompt") if key in fields]
+    if texts:
+        fields["prompts"] = "\n".join(texts)
+    return fields
+
+
+def extract_index_fields(path, file_type):
+    """提取单个文件的索引字段（只读文件头和文本块，不解码像素、不生成缩略图）"""
+    fields = {}
+    try:
+        if file_type == "image":
+            if path.lower().endswith(".png"):
+                png = read_png_text(path)
+                fields["width"], fields["height"] = png["width"], png["height"]
+                info = png["text"]
+            else:
+                from PIL import Image
+                with Image.open(path) as img:
+                    fields["width"], fields["height"] = img.size
+                    info = dict(img.info)
+            prompt = info.get("prompt")
+            if isinstance(prompt, str):
+                try:
+                    prompt = json.loads(prompt)
+                except ValueError:
+                    prompt = None
+            if isinstance(prompt, dict):
+                fields.update(extract_comfy_fields(prompt))
+            elif isinstance(info.get("parameters"), str):
+                fields.update(extract_a1111_fields(info["parameters"]))
+        elif file_type == "workflow":
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # API格式的工作流与PNG里的prompt结构相同
+            if isinstance(data, dict) and "nodes" not in data:
+                fields.update(extract_comfy_fields(data))
+    except Exception as e:
+        print(f"[Catsee] Error indexing {path}: {e}")
+    return fields
+
+
+class MetadataIndex(SQLiteStore):
+    """输出目录的SQLite元数据索引
+
+    每个文件一行：基本信息（与 _get_file_info 相同的字段）加上生成参数
+    （checkpoint、LoRA、采样器、种子、步数、CFG、正负提示词）。reindex()
+    遍历目录树，只对新增或大小/修改时间变化的文件提取元数据，并删除已
+    不存在的文件。搜索直接查询数据库，不再打开图片。
+    """
+
+    DB_FILE = "metadata_index.sqlite3"
+
+    def __init__(self, db_path=None, refresh_interval=None):
+        super().__init__(db_path, SCHEMA)
+        if refresh_interval is None:
+            refresh_interval = config.get("metadata_index", {}).get("refresh_interval", 60)
+        self.refresh_interval = refresh_interval
+        self._reindex_lock = threading.RLock()
+        self._last_reindex = {}  # 根目录 -> 上次完成reindex的时间
+        self._refreshing = set()  # 已安排后台reindex的根目录
+        self._building = set()  # 正在reindex的根目录
+        self.live_roots = set()  # 由文件监视器持续更新的根目录，不需要定期reindex
+        self.prompt_index = PromptIndex()
+        self.last_stats = None
+
+    def _setup(self, conn):
+        """打开旧版本数据库时删表重建"""
+        conn.row_factory = sqlite3.Row
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS files")
+            self.prompt_index.drop(conn)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        super()._setup(conn)
+        self.prompt_index.setup(conn)
+
+    @staticmethod
+    def _row(item, fields):
+        """files 表的一行：文件条目（walk_directory/make_item，relative_path 相对于
+        根目录，不在根目录下时为绝对路径）加上提取的生成参数"""
+        row = {key: item[key] for key in ("path", "name", "relative_path", "type", "extension", "size",
+                                          "modified_time", "created_time", "hash")}
+        row["directory"] = os.path.dirname(item["path"])
+        row["indexed_at"] = time.time()
+        for column in ("width", "height", "checkpoint", "loras", "sampler", "scheduler", "seed",
+                       "steps", "cfg", "positive_prompt", "negative_prompt", "prompts"):
+            row[column] = fields.get(column)
+        return row
+
+    def _write(self, rows):
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        sql = (f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        conn = self._connect()
+        with self._lock:
+            # 全文索引按 files.id 关联，替换行之前先删掉旧的索引
+            self.prompt_index.delete_paths(conn, [row["path"] for row in rows])
+            conn.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+            self.prompt_index.insert_rows(conn, rows)
+            conn.commit()
+
+    def _delete(self, paths):
+        if not paths:
+            return
+        conn = self._connect()
+        with self._lock:
+            self.prompt_index.delete_paths(conn, paths)
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+            conn.commit()
+
+    def reindex(self, root=None, type_map=None, full=False):
+        """增量重建索引
+
+        Args:
+            root: 要索引的根目录，默认是输出目录
+            type_map: 扩展名 -> 文件类型，默认取 file_manager.type_map
+            full: True时忽略已有记录，重新提取所有文件的元数据
+
+        Returns:
+            统计信息 {root, scanned, added, updated, removed, unchanged, seconds}
+        """
+        if root is None:
+            root = config.get("outputs")
+        root = os.path.abspath(str(root))
+        if type_map is None:
+            try:
+                from .file_manager import file_manager
+            except ImportError:
+                from file_manager import file_manager
+            type_map = file_manager.type_map
+
+        with self._reindex_lock:
+            self._building.add(root)
+            try:
+                return self._reindex(root, type_map, full)
+            finally:
+                self._building.discard(root)
+
+    def _reindex(self, root, type_map, full):
+        start = time.perf_counter()
+        conn = self._connect()
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(
+                    "SELECT path, size, modified_time FROM files WHERE path LIKE ? ESCAPE '\\'",
+                    (self._like_prefix(prefix),)
+                )
+            }
+
+        stats = {"root": root, "scanned": 0, "added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        batch = []
+        for item in walk_directory(root, type_map, outputs_dir=Path(root)):
+            path = item["path"]
+            stats["scanned"] += 1
+            seen.add(path)
+            previous = known.get(path)
+            if previous is not None and not full and previous == (item["size"], item["modified_time"]):
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if previous is not None else "added"] += 1
+            batch.append(self._row(item, extract_index_fields(path, item["type"])))
+            if len(batch) >= BATCH_SIZE:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+        removed = [path for path in known if path not in seen]
+        self._delete(removed)
+        stats["removed"] = len(removed)
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        self._last_reindex[root] = time.time()
+        self.last_stats = stats
+        print(f"[Catsee] Metadata index: {stats}")
+        return stats
+
+    def ensure_fresh(self, root=None):
+        """需要时在后台更新索引，不阻塞查询
+
+        根目录从未reindex，或距上次reindex超过 refresh_interval 秒时，在后台
+        线程做（增量）reindex，查询直接使用当前的（可能是部分的）索引，不等待
+        遍历目录树。文件监视器正在跟踪的根目录只需要首次reindex，之后由监视器
+        增量更新。
+
+        Returns:
+            该根目录是否正在建立/更新索引
+        """
+        if root is None:
+            root = config.get("outputs")
+        root = os.path.abspath(str(root))
+        if root not in self.live_roots and self._is_stale(root):
+            self._refresh_in_background(root)
+        return self.is_indexing(root)
+
+    def is_indexing(self, root=None):
+        """根目录是否正在建立/更新索引（含已安排、等待中的后台reindex）"""
+        if root is None:
+            root = config.get("outputs")
+        root = os.path.abspath(str(root))
+        return root in self._refreshing or root in self._building
+
+    def _is_stale(self, root):
+        last = self._last_reindex.get(root)
+        return last is None or time.time() - last > self.refresh_interval
+
+    def _refresh_in_background(self, root):
+        """在后台线程做一次增量reindex，同一根目录同时只有一个"""
+        with self._lock:
+            if root in self._refreshing:
+                return
+            self._refreshing.add(root)
+
+        def run():
+            try:
+                with self._reindex_lock:
+                    if self._is_stale(root):
+                        self.reindex(root)
+            except Exception as e:
+                print(f"[Catsee] Metadata index refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(root)
+
+        threading.Thread(target=run, name="catsee-index-refresh", daemon=True).start()
+
+    def update_file(self, path, root=None, type_map=None):
+        """索引或刷新单个文件（文件不存在时删除记录）"""
+        self.apply_changes([path], [], root, type_map)
+
+    def apply_changes(self, updated, removed, root=None, type_map=None):
+        """批量应用文件变化（供文件监视器使用），一次事务写入
+
+        Args:
+            updated: 新增或修改的文件路径
+            removed: 删除的文件路径
+        """
+        if type_map is None:
+            try:
+                from .file_manager import file_manager
+            except ImportError:
+                from file_manager import file_manager
+            type_map = file_manager.type_map
+        root = os.path.abspath(str(root or config.get("outputs")))
+
+        rows = []
+        gone = [os.path.abspath(str(path)) for path in removed]
+        for path in updated:
+            path = os.path.abspath(str(path))
+            if os.path.splitext(path)[1].lower() not in type_map:
+                continue
+            try:
+                item = make_item(path, type_map, Path(root), allowed_extensions=type_map)
+            except OSError:
+                gone.append(path)
+                continue
+            if item is None or item["is_folder"]:
+                continue
+            rows.append(self._row(item, extract_index_fields(path, item["type"])))
+
+        self._write(rows)
+        self._delete(gone)
+
+    def remove(self, path):
+        """删除单个文件的记录"""
+        self._delete([os.path.abspath(str(path))])
+
+    @staticmethod
+    def _like_prefix(prefix):
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + "%"
+
+    @staticmethod
+    def _like_contains(text):
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def search(self, query=None, file_type=None, root=None, limit=None, offset=0, **filters):
+        """查询索引
+
+        Args:
+            query: 匹配文件名或相对路径的子串（不区分大小写）
+            file_type: 文件类型过滤（image/video/workflow）
+            root: 只返回该目录下的文件
+            limit/offset: 分页
+            filters: seed/steps/cfg 精确匹配；checkpoint/loras/sampler/scheduler/prompts 子串匹配
+
+        Returns:
+            按修改时间倒序排列的文件字典列表
+        """
+        clauses = []
+        params = []
+        if query:
+            clauses.append("(name LIKE ? ESCAPE '\\' OR relative_path LIKE ? ESCAPE '\\')")
+            like = self._like_contains(query)
+            params += [like, like]
+        if file_type:
+            clauses.append("type = ?")
+            params.append(file_type)
+        if root:
+            clauses.append("path LIKE ? ESCAPE '\\'")
+            params.append(self._like_prefix(os.path.abspath(str(root)).rstrip(os.sep) + os.sep))
+        for key in EXACT_FILTERS:
+            if filters.get(key) not in (None, ""):
+                clauses.append(f"{key} = ?")
+                params.append(float(filters[key]) if key == "cfg" else int(filters[key]))
+        for key in TEXT_FILTERS:
+            if filters.get(key):
+                clauses.append(f"{key} LIKE ? ESCAPE '\\'")
+                params.append(self._like_contains(str(filters[key])))
+
+        sql = "SELECT * FROM files"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY modified_time DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [int(limit), int(offset)]
+
+        conn = self._connect()
+        with self._lock:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._to_result(row) for row in rows]
+
+    def search_prompts(self, query, field="all", page=1, per_page=50):
+        """按提示词全文搜索（语法见 prompt_index.build_match_query）
+
+        Returns:
+            {items, total, page, per_page, took_ms}，items 按相关度排序并带 score（越大越相关）
+        """
+        start = time.perf_counter()
+        page = max(1, int(page))
+        per_page = max(1, int(per_page))
+        conn = self._connect()
+        with self._lock:
+            rows, total = self.prompt_index.search(conn, query, field, per_page, (page - 1) * per_page)
+        items = []
+        for row in rows:
+            item = self._to_result(row)
+            # bm25越小越相关，对外取反
+            item["score"] = round(-row["score"], 4) if row["score"] else 0
+            items.append(item)
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    @staticmethod
+    def _to_result(row):
+        result = {key: row[key] for key in row.keys() if row[key] is not None}
+        result.pop("id", None)
+        result.pop("directory", None)
+        result.pop("indexed_at", None)
+        if "loras" in result:
+            result["loras"] = result["loras"].split("\n")
+        result.pop("prompts", None)
+        return result
+
+    def stats(self):
+        """索引统计"""
+        conn = self._connect()
+        with self._lock:
+            total = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            by_type = dict(conn.execute("SELECT type, COUNT(*) FROM files GROUP BY type").fetchall())
+        return {
+            "db_path": str(self.db_path),
+            "files": total,
+            "by_type": by_type,
+            "last_reindex": self.last_stats
+        }
+
+
+# 全局元数据索引实例
+metadata_index = MetadataIndex()
@@ -0,0 +1,667 @@
+# -*- coding: utf-8 -*-
+"""
+感知哈希模块 - 用缩略图计算 dHash/pHash，按汉明距离查找相似图片和近似重复图片
+"""
+import os
+import math
+import time
+import asyncio
+
+try:
+    from .config import config
+    from .file_manager import file_manager
+    from .thumbnail_cache import thumbnail_cache, render_thumbnail
+    from .sqlite_store import SQLiteStore
+    from .task_executor import task_executor, QueueFullError
+    from .dir_listing import walk_directory
+    from .content_hash import content_hasher
+    from .fs_watcher import file_watcher, ADDED, DELETED, MOVED
+except ImportError:
+    from config import config
+    from file_manager import file_manager
+    from thumbnail_cache import thumbnail_cache, render_thumbnail
+    from sqlite_store import SQLiteStore
+    from task_executor import task_executor, QueueFullError
+    from dir_listing import walk_directory
+    from content_hash import content_hasher
+    from fs_watcher import file_watcher, ADDED, DELETED, MOVED
+
+DEFAULTS = {
+    "enabled": True,
+    "algorithm": "phash",  # phash / dhash，两者都会保存，这里决定索引使用哪一个
+    "similar_distance": 10,  # “相似图片”的默认最大汉明距离（64位）
+    "duplicate_distance": 4,  # “近似重复”分组的默认最大汉明距离
+    "max_distance": 16,
+    "max_results": 100,
+    "max_age": 600  # 后台扫描结果超过多少秒后，再次使用时重新扫描（只补算缺失的哈希）
+}
+
+# 每批派发到解码池的图片数
+HASH_BATCH = 32
+
+ALGORITHMS = ("dhash", "phash")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_hashes (
+    fingerprint TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    dhash INTEGER NOT NULL,
+    phash INTEGER NOT NULL,
+    hashed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_image_hashes_path ON image_hashes(path);
+CREATE INDEX IF NOT EXISTS idx_image_hashes_directory ON image_hashes(directory);
+"""
+
+# SQLite的INTEGER是有符号64位
+_SIGN_BIT = 1 << 63
+_HASH_RANGE = 1 << 64
+
+# pHash：32x32灰度图做DCT，取左上角8x8低频系数
+_DCT_SIZE = 32
+_DCT_KEEP = 8
+_DCT_COS = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)]
+    for u in range(_DCT_KEEP)
+]
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:
+    def _popcount(value):
+        return bin(value).count("1")
+
+
+def _to_signed(value):
+    return value - _HASH_RANGE if value >= _SIGN_BIT else value
+
+
+def _to_unsigned(value):
+    return value + _HASH_RANGE if value < 0 else value
+
+
+def _pack_bits(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+
+def dhash(img):
+    """差值哈希：9x8灰度图中每个像素是否比右边的像素亮（64位）"""
+    from PIL import Image
+    gray = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    return _pack_bits(
+        pixels[row + x] > pixels[row + x + 1]
+        for row in range(0, 72, 9) for x in range(8)
+    )
+
+
+def phash(img):
+    """DCT感知哈希：8x8低频系数是否大于其中位数（64位）
+
+    二维DCT按行、列分两次做，并且只计算需要的8个频率，不依赖numpy/scipy。
+    """
+    from PIL import Image
+    gray = img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    rows = [pixels[y * _DCT_SIZE:(y + 1) * _DCT_SIZE] for y in range(_DCT_SIZE)]
+    # 每行的前8个水平频率：32 x 8
+    row_coeffs = [[sum(c * p for c, p in zip(cos_u, row)) for cos_u in _DCT_COS] for row in rows]
+    # 每列再做一次：8 x 8
+    coeffs = [
+        sum(cos_v[y] * row_coeffs[y][u] for y in range(_DCT_SIZE))
+        for cos_v in _DCT_COS for u in range(_DCT_KEEP)
+    ]
+    ordered = sorted(coeffs)
+    median = (ordered[31] + ordered[32]) / 2
+    return _pack_bits(c > median for c in coeffs)
+
+
+def hamming(a, b):
+    return _popcount(a ^ b)
+
+
+class HammingIndex:
+    """64位哈希的多索引哈希（multi-index hashing）
+
+    哈希切成 chunks 段，每段一张 段值 -> 键集合 的表。两个哈希的距离不超过
+    r 时，至少有一段的距离不超过 r // chunks（抽屉原理），所以查询时只需在
+    每张表里枚举与查询段值相差不超过 r // chunks 位的段值，再逐个核对完整
+    距离，而不是与所有哈希比较。
+    """
+
+    BITS = 64
+
+    def __init__(self, chunks=4):
+        self.chunks = chunks
+        self.width = self.BITS // chunks
+        self._mask = (1 << self.width) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._hashes = {}  # 键 -> 哈希
+        self._flips = {}  # 段内翻转位数上限 -> 所有异或掩码
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, key):
+        return key in self._hashes
+
+    def get(self, key):
+        return self._hashes.get(key)
+
+    def _segments(self, value):
+        return [(value >> (i * self.width)) & self._mask for i in range(self.chunks)]
+
+    def add(self, key, value):
+        if key in self._hashes:
+            self.remove(key)
+        self._hashes[key] = value
+        for table, segment in zip(self._tables, self._segments(value)):
+            table.setdefault(segment, set()).add(key)
+
+    def remove(self, key):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for table, segment in zip(self._tables, self._segments(value)):
+            bucket = table.get(segment)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[segment]
+
+    def _flip_masks(self, bits):
+        masks = self._flips.get(bits)
+        if masks is None:
+            masks = [0]
+            frontier = [(0, -1)]
+            for _ in range(bits):
+                frontier = [(mask | (1 << b), b) for mask, last in frontier for b in range(last + 1, self.width)]
+                masks.extend(mask for mask, _ in frontier)
+            self._flips[bits] = masks
+        return masks
+
+    def search(self, value, radius):
+        """距离不超过 radius 的所有键，返回按距离排序的 [(距离, 键), ...]"""
+        masks = self._flip_masks(min(radius // self.chunks, self.width))
+        seen = set()
+        results = []
+        hashes = self._hashes
+        for table, segment in zip(self._tables, self._segments(value)):
+            for mask in masks:
+                bucket = table.get(segment ^ mask)
+                if not bucket:
+                    continue
+                for key in bucket:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    distance = _popcount(value ^ hashes[key])
+                    if distance <= radius:
+                        results.append((distance, key))
+        results.sort()
+        return results
+
+    def groups(self, radius):
+        """把距离不超过 radius 的键连成组（并查集），只返回两个以上成员的组"""
+        parent = {key: key for key in self._hashes}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key, value in self._hashes.items():
+            for _, other in self.search(value, radius):
+                if other != key:
+                    a, b = find(key), find(other)
+                    if a != b:
+                        parent[b] = a
+        members = {}
+        for key in self._hashes:
+            members.setdefault(find(key), []).append(key)
+        return [keys for keys in members.values() if len(keys) > 1]
+
+
+def hash_image(source_path, thumb_path, size, render):
+    """由缩略图计算 (dHash, pHash, 是否生成了缩略图)
+
+    render 为True或缩略图已被淘汰时先生成缩略图。模块级函数，在解码池中
+    执行（开启进程池时可以被pickle），缩略图缓存的登记由调用方完成。
+    """
+    from PIL import Image
+    rendered = render or not os.path.exists(thumb_path)
+    if rendered:
+        render_thumbnail(source_path, thumb_path, size)
+    with Image.open(thumb_path) as img:
+        img.load()
+        return dhash(img), phash(img), rendered
+
+
+class ImageSimilarity(SQLiteStore):
+    """感知哈希的保存与相似图片查询
+
+    每张图片的 dHash 和 pHash 由缩略图计算（缩略图不在缓存中时先按正常流程
+    生成并写入缓存），按快速指纹（路径+大小+修改时间）保存在SQLite中。
+    查询使用内存中的 HammingIndex（首次查询时从数据库载入，之后随新计算的
+    哈希增量更新）；文件修改后旧指纹的记录在重新计算时删除，已删除的文件在
+    出现在查询结果中时清理。
+
+    哈希计算（含生成缩略图）在解码池中以 phash 类型的任务执行，受
+    executor.limits.phash 限制；查找缺失的哈希、读写数据库和查询以 search
+    类型的任务执行，两个查询接口走相同的路径。
+
+    索引覆盖输出目录和收藏目录中的所有图片：schedule() 在后台遍历这两个
+    目录，补算缺失的哈希并清理已删除文件的记录，结果超过 max_age 秒后再次
+    调用时重新扫描（已保存的哈希不会重复计算）。之后 fs_watcher 报告的新增/
+    修改图片随即补算，删除的图片移出索引。stats() 给出已索引的数量和进度。
+    """
+
+    DB_FILE = "image_hashes.sqlite3"
+
+    def __init__(self, db_path=None, options=None):
+        super().__init__(db_path, SCHEMA)
+        opts = config.section("similarity", DEFAULTS, options)
+        self.enabled = bool(opts["enabled"])
+        self.algorithm = opts["algorithm"] if opts["algorithm"] in ALGORITHMS else "phash"
+        self.similar_distance = int(opts["similar_distance"])
+        self.duplicate_distance = int(opts["duplicate_distance"])
+        self.max_distance = int(opts["max_distance"])
+        self.max_results = max(1, int(opts["max_results"]))
+        self.max_age = max(0, float(opts["max_age"]))
+        self._index = None  # 路径 -> 哈希（self.algorithm）
+        self._fingerprints = {}  # 路径 -> 指纹
+        self._loop = None
+        self._task = None  # 后台扫描
+        self._progress = None
+        self._queued = set()  # fs_watcher 报告的待计算图片
+        self._queue_task = None
+        self.images = None  # 上次扫描时两个目录中的图片数
+        self.scanned_at = None
+        self.last_error = None
+        self.computed = 0
+        self.failed = 0
+
+    def close(self):
+        with self._lock:
+            super().close()
+            self._index = None
+            self._fingerprints = {}
+
+    def _get_index(self):
+        """内存索引，首次使用时从数据库载入"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    start = time.perf_counter()
+                    index = HammingIndex()
+                    rows = self._connect().execute(
+                        f"SELECT fingerprint, path, {self.algorithm} FROM image_hashes"
+                    )
+                    for fp, path, value in rows:
+                        index.add(path, _to_unsigned(value))
+                        self._fingerprints[path] = fp
+                    self._index = index
+                    print(f"[Catsee] Loaded {len(index)} perceptual hashes "
+                          f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return self._index
+
+    def _remove(self, paths):
+        """删除已不存在的文件的记录"""
+        if not paths:
+            return
+        index = self._get_index()
+        with self._lock:
+            for path in paths:
+                index.remove(path)
+                self._fingerprints.pop(path, None)
+            conn = self._connect()
+            conn.executemany("DELETE FROM image_hashes WHERE path = ?", [(path,) for path in paths])
+            conn.commit()
+
+    def _paths_under(self, directory):
+        self._get_index()
+        prefix = os.path.abspath(directory).rstrip(os.sep) + os.sep
+        with self._lock:
+            return [path for path in self._fingerprints if path.startswith(prefix)]
+
+    # ---- 计算 ----
+
+    def _plan(self, paths):
+        """找出没有当前版本哈希的图片（文件不存在的跳过，I/O线程中执行）
+
+        Returns:
+            [(路径, 指纹, 缩略图路径, 是否需要生成缩略图)]
+        """
+        index = self._get_index()
+        work = []
+        for path in paths:
+            fp, thumb_path = file_manager.lookup_thumbnail(path)
+            if not fp:
+                continue
+            with self._lock:
+                if self._fingerprints.get(path) == fp and path in index:
+                    continue
+            if thumb_path is None:
+                work.append((path, fp, str(thumbnail_cache.path_for(fp)), True))
+            else:
+                work.append((path, fp, thumb_path, False))
+        return work
+
+    async def _compute(self, work):
+        """在解码池中计算一批哈希并保存"""
+        size = file_manager.thumbnail_size
+
+        async def run(path, fp, thumb_path, render):
+            try:
+                return path, fp, await task_executor.run('phash', hash_image, path, thumb_path, size, render)
+            except QueueFullError:
+                raise
+            except Exception as e:
+                print(f"[Catsee] Perceptual hash failed for {path}: {e}")
+                return path, fp, None
+
+        results = await asyncio.gather(*(run(*item) for item in work))
+        self.failed += sum(1 for result in results if result[2] is None)
+        results = [result for result in results if result[2] is not None]
+        if results:
+            await task_executor.run('search', self._store, results)
+
+    def _store(self, results):
+        """保存计算结果并更新内存索引（I/O线程中执行）"""
+        index = self._get_index()
+        rows = []
+        now = time.time()
+        for path, fp, (dvalue, pvalue, rendered) in results:
+            if rendered:
+                thumbnail_cache.add(fp, path)
+            rows.append((fp, path, os.path.dirname(path), _to_signed(dvalue), _to_signed(pvalue), now))
+        with self._lock:
+            conn = self._connect()
+            # 文件修改后旧指纹的记录作废
+            conn.executemany("DELETE FROM image_hashes WHERE path = ?", [(row[1],) for row in rows])
+            conn.executemany(
+                "INSERT OR REPLACE INTO image_hashes (fingerprint, path, directory, dhash, phash, hashed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+            for fp, path, _, dvalue, pvalue, _ in rows:
+                index.add(path, _to_unsigned(dvalue if self.algorithm == "dhash" else pvalue))
+                self._fingerprints[path] = fp
+        self.computed += len(rows)
+
+    async def ensure_hashes(self, paths):
+        """确保这些图片都有当前版本的哈希（缺失或文件已变化时计算）
+
+        Returns:
+            路径 -> 哈希（self.algorithm），无法读取的图片不在其中
+
+        Raises:
+            QueueFullError: 任务队列已满
+        """
+        paths = [os.path.abspath(str(path)) for path in paths]
+        work = await task_executor.run('search', self._plan, paths)
+        for i in range(0, len(work), HASH_BATCH):
+            await self._compute(work[i:i + HASH_BATCH])
+        index = self._index
+        with self._lock:
+            return {path: index.get(path) for path in paths if path in index}
+
+    # ---- 后台扫描与增量更新 ----
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def is_stale(self):
+        return self.scanned_at is None or time.time() - self.scanned_at > self.max_age
+
+    def schedule(self, force=False):
+        """在后台扫描输出目录和收藏目录（已在运行或结果仍然新鲜时不做任何事）
+
+        第一次调用时同时订阅 fs_watcher 的变化批次。
+
+        Returns:
+            是否开始了新的扫描
+        """
+        if not self.enabled:
+            return False
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            file_watcher.subscribe(self._on_changes)
+        if self.running or not (force or self.is_stale()):
+            return False
+        self._task = asyncio.ensure_future(self._scan())
+        return True
+
+    def _walk_roots(self, roots):
+        """两个目录中的所有图片（按真实路径去重），并清理已不存在的图片的记录
+
+        在 search 类型的任务中执行，遍历只用当前线程（workers=1），不在
+        任务执行器之外另开遍历线程池。
+        """
+        image_types = {ext: kind for ext, kind in file_manager.type_map.items() if kind == "image"}
+        images = []
+        seen = set()
+        for root in roots:
+            for item in walk_directory(root, image_types, workers=1):
+                real = os.path.realpath(item["path"])
+                if real not in seen:
+                    seen.add(real)
+                    images.append(item["path"])
+        walked = set(images)
+        self._remove([path for root in roots for path in self._paths_under(root) if path not in walked])
+        return images
+
+    async def _scan(self):
+        start = time.perf_counter()
+        progress = self._progress = {"stage": "scan", "done": 0, "total": 0}
+        try:
+            images = await task_executor.run('search', self._walk_roots, content_hasher.default_roots())
+            work = await task_executor.run('search', self._plan, images)
+            progress.update(stage="hash", done=len(images) - len(work), total=len(images))
+            for i in range(0, len(work), HASH_BATCH):
+                batch = work[i:i + HASH_BATCH]
+                await self._compute(batch)
+                progress["done"] += len(batch)
+            self.images = len(images)
+            self.scanned_at = time.time()
+            self.last_error = None
+            print(f"[Catsee] Perceptual hash scan: {len(images)} images, {len(work)} hashed "
+                  f"({time.perf_counter() - start:.1f} s)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[Catsee] Perceptual hash scan failed: {e}")
+        finally:
+            self._progress = None
+
+    def _on_changes(self, batch):
+        """fs_watcher 的变化批次（监视线程中调用）：新增/修改的图片排队补算，删除的移出索引"""
+        queued = []
+        gone = []
+        for event in batch:
+            if event.is_dir:
+                if event.kind in (DELETED, MOVED):
+                    gone.extend(self._paths_under(event.src_path or event.path))
+                if event.kind in (ADDED, MOVED):
+                    # 移入的目录中的图片等下一次扫描
+                    self.scanned_at = None
+                continue
+            if event.kind == MOVED:
+                gone.append(event.src_path)
+            if event.kind == DELETED:
+                gone.append(event.path)
+            elif file_manager.type_map.get(os.path.splitext(event.path)[1].lower()) == "image":
+                queued.append(event.path)
+        self._remove(gone)
+        if queued and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._enqueue, queued)
+
+    def _enqueue(self, paths):
+        self._queued.update(paths)
+        if self._queue_task is None or self._queue_task.done():
+            self._queue_task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        while self._queued:
+            batch = [self._queued.pop() for _ in range(min(HASH_BATCH, len(self._queued)))]
+            try:
+                await self.ensure_hashes(batch)
+            except QueueFullError:
+                self._queued.update(batch)
+                await asyncio.sleep(1)
+            except Exception as e:
+                print(f"[Catsee] Perceptual hash update failed: {e}")
+
+    # ---- 查询 ----
+
+    @staticmethod
+    def _folder_images(directory):
+        directory = os.path.abspath(str(directory))
+        images = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                ext = os.path.splitext(entry.name)[1].lower()
+                if file_manager.type_map.get(ext) == "image" and entry.is_file():
+                    images.append(entry.path)
+        return images
+
+    def _clamp(self, distance, default):
+        distance = default if distance is None else int(distance)
+        if distance < 0:
+            raise ValueError("距离不能为负数")
+        return min(distance, self.max_distance)
+
+    async def similar(self, path, distance=None, limit=None, directory=None):
+        """与某张图片相似的图片
+
+        Args:
+            distance: 最大汉明距离，默认 similar_distance
+            limit: 最多返回多少张，默认 max_results
+            directory: 只在这个目录中查找（会先计算该目录中缺失的哈希）；
+                默认在整个索引（输出目录、收藏目录和计算过的其他图片）中查找，
+                结果中的 index 说明索引的覆盖情况
+
+        Raises:
+            FileNotFoundError: 图片不存在或无法读取
+            ValueError: 参数不合法
+            QueueFullError: 任务队列已满
+        """
+        distance = self._clamp(distance, self.similar_distance)
+        limit = self.max_results if limit is None else max(1, min(int(limit), self.max_results))
+        path = os.path.abspath(str(path))
+        start = time.perf_counter()
+        value = (await self.ensure_hashes([path])).get(path)
+        if value is None:
+            raise FileNotFoundError(path)
+        candidates = None
+        if directory is not None:
+            candidates = await self.ensure_hashes(
+                await task_executor.run('search', self._folder_images, directory)
+            )
+        result = await task_executor.run('search', self._search, path, value, distance, limit, candidates)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if directory is None:
+            result["index"] = self.stats()
+        return result
+
+    def _search(self, path, value, distance, limit, candidates):
+        if candidates is not None:
+            index = HammingIndex()
+            for other, other_value in candidates.items():
+                index.add(other, other_value)
+        else:
+            index = self._get_index()
+        with self._lock:
+            matches = [(d, other) for d, other in index.search(value, distance) if other != path]
+
+        items = []
+        gone = []
+        for d, other in matches:
+            if len(items) >= limit:
+                break
+            try:
+                st = os.stat(other)
+            except OSError:
+                gone.append(other)
+                continue
+            items.append({"path": other, "name": os.path.basename(other), "distance": d,
+                          "size": st.st_size, "modified_time": st.st_mtime})
+        self._remove(gone)
+        return {
+            "path": path,
+            "algorithm": self.algorithm,
+            "distance": distance,
+            "items": items,
+            "total": len(matches) - len(gone),
+            "searched": len(index)
+        }
+
+    async def near_duplicates(self, directory, distance=None):
+        """目录中的近似重复图片分组
+
+        Raises:
+            FileNotFoundError: 目录不存在
+            ValueError: 参数不合法
+            QueueFullError: 任务队列已满
+        """
+        distance = self._clamp(distance, self.duplicate_distance)
+        start = time.perf_counter()
+        hashes = await self.ensure_hashes(await task_executor.run('search', self._folder_images, directory))
+        result = await task_executor.run('search', self._group, directory, hashes, distance)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _group(self, directory, hashes, distance):
+        index = HammingIndex()
+        for path, value in hashes.items():
+            index.add(path, value)
+        groups = []
+        for keys in index.groups(distance):
+            first = min(keys)
+            files = []
+            for path in sorted(keys):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append({"path": path, "name": os.path.basename(path),
+                              "distance": hamming(index.get(first), index.get(path)),
+                              "size": st.st_size, "modified_time": st.st_mtime})
+            if len(files) > 1:
+                groups.append({"count": len(files), "files": files})
+        groups.sort(key=lambda group: group["count"], reverse=True)
+        return {
+            "directory": os.path.abspath(str(directory)),
+            "algorithm": self.algorithm,
+            "distance": distance,
+            "images": len(hashes),
+            "groups": groups
+        }
+
+    def stats(self):
+        """索引状态：indexed 为已保存哈希的图片数，images 为上次扫描时两个目录中的图片数"""
+        running = self.running
+        return {
+            "enabled": self.enabled,
+            "algorithm": self.algorithm,
+            "indexed": len(self._index) if self._index is not None else None,
+            "images": self.images,
+            "running": running,
+            "progress": dict(self._progress) if running and self._progress else None,
+            "queued": len(self._queued),
+            "scanned_at": self.scanned_at,
+            "error": self.last_error,
+            "computed": self.computed,
+            "failed": self.failed
+        }
+
+
+# 全局相似图片查询实例
+image_similarity = ImageSimilarity()
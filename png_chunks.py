@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+PNG文本块读取模块 - 只解析文件头和tEXt/zTXt/iTXt块，不解码像素
+"""
+import zlib
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+# 单个压缩文本块解压后的上限（防止压缩炸弹）
+MAX_TEXT_BYTES = 64 * 1024 * 1024
+
+# IHDR颜色类型 -> Pillow的模式名（与 Image.open 的 img.mode 一致）
+_MODES = {
+    (0, 1): "1", (0, 2): "L", (0, 4): "L", (0, 8): "L", (0, 16): "I;16",
+    (2, 8): "RGB", (2, 16): "RGB",
+    (3, 1): "P", (3, 2): "P", (3, 4): "P", (3, 8): "P",
+    (4, 8): "LA", (4, 16): "LA",
+    (6, 8): "RGBA", (6, 16): "RGBA",
+}
+
+
+class PNGFormatError(ValueError):
+    """不是PNG文件或文件头损坏"""
+
+
+def _decompress(data):
+    decompressor = zlib.decompressobj()
+    text = decompressor.decompress(data, MAX_TEXT_BYTES)
+    if decompressor.unconsumed_tail:
+        raise ValueError("compressed text chunk too large")
+    return text
+
+
+def _parse_text_chunk(chunk_type, data):
+    """解析文本块，返回 (关键字, 文本)"""
+    keyword, sep, rest = data.partition(b"\0")
+    if not sep:
+        raise ValueError("missing keyword terminator")
+    key = keyword.decode("latin-1")
+
+    if chunk_type == b"tEXt":
+        return key, rest.decode("latin-1")
+
+    if chunk_type == b"zTXt":
+        # 压缩方法(1字节，只有0=zlib) + 压缩数据
+        if not rest or rest[0] != 0:
+            raise ValueError("unknown zTXt compression method")
+        return key, _decompress(rest[1:]).decode("latin-1")
+
+    # iTXt: 压缩标志(1) 压缩方法(1) 语言\0 翻译后的关键字\0 UTF-8文本
+    if len(rest) < 2:
+        raise ValueError("truncated iTXt chunk")
+    compressed, method = rest[0], rest[1]
+    _, _, rest = rest[2:].partition(b"\0")  # 语言标签
+    _, _, text = rest.partition(b"\0")  # 翻译后的关键字
+    if compressed:
+        if method != 0:
+            raise ValueError("unknown iTXt compression method")
+        text = _decompress(text)
+    return key, text.decode("utf-8", errors="replace")
+
+
+def read_png_text(path, stop_at_idat=True):
+    """读取PNG的尺寸、模式和文本元数据
+
+    逐块读取：IHDR和文本块读入内存，其他块用seek跳过；默认读到第一个
+    IDAT为止（与 Image.open 填充 img.info 的范围一致，ComfyUI和A1111都把
+    文本块写在IDAT之前）。stop_at_idat=False 时跳过像素数据继续找IDAT之后的
+    文本块，仍然不读取像素。
+
+    Args:
+        path: PNG文件路径
+
+    Returns:
+        {"width", "height", "mode", "format": "PNG", "text": {关键字: 文本}, "bytes_read"}
+
+    Raises:
+        PNGFormatError: 不是PNG或IHDR损坏
+        OSError: 文件无法读取
+    """
+    text = {}
+    width = height = 0
+    mode = None
+    bytes_read = 0
+
+    with open(path, "rb") as f:
+        signature = f.read(8)
+        bytes_read += len(signature)
+        if signature != PNG_SIGNATURE:
+            raise PNGFormatError("not a PNG file")
+
+        while True:
+            header = f.read(8)
+            bytes_read += len(header)
+            if len(header) < 8:
+                break  # 文件被截断，返回已经读到的内容
+            length, chunk_type = struct.unpack(">I4s", header)
+
+            if chunk_type == b"IHDR":
+                data = f.read(length)
+                bytes_read += len(data)
+                if length < 13 or len(data) < 13:
+                    raise PNGFormatError("truncated IHDR chunk")
+                width, height, bit_depth, color_type = struct.unpack(">IIBB", data[:10])
+                mode = _MODES.get((color_type, bit_depth))
+                f.seek(4, 1)  # CRC
+                continue
+
+            if chunk_type == b"IEND":
+                break
+
+            if chunk_type == b"IDAT" and stop_at_idat:
+                break
+
+            if chunk_type in TEXT_CHUNKS:
+                data = f.read(length)
+                bytes_read += len(data)
+                if len(data) < length:
+                    break
+                try:
+                    key, value = _parse_text_chunk(chunk_type, data)
+                    # 与Pillow一致：同名关键字以后出现的为准
+                    text[key] = value
+                except (ValueError, zlib.error) as e:
+                    print(f"[Catsee] Skipping bad {chunk_type.decode()} chunk in {path}: {e}")
+                f.seek(4, 1)
+                continue
+
+            f.seek(length + 4, 1)
+
+    if not width:
+        raise PNGFormatError("missing IHDR chunk")
+    return {
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "format": "PNG",
+        "text": text,
+        "bytes_read": bytes_read
+    }
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+提示词全文索引模块 - 基于SQLite FTS5的倒排索引，支持中英文混合、短语和前缀查询
+"""
+import re
+import unicodedata
+
+# 中日韩文字：每个字单独成词（unigram），连续的字用短语查询匹配
+_CJK_RANGES = (
+    (0x3040, 0x30FF),    # 平假名、片假名
+    (0x3400, 0x4DBF),    # 扩展A
+    (0x4E00, 0x9FFF),    # 基本汉字
+    (0xAC00, 0xD7AF),    # 韩文音节
+    (0xF900, 0xFAFF),    # 兼容汉字
+    (0x20000, 0x2FFFF),  # 扩展B及以后
+)
+
+# 字母数字连续段，或单个中日韩字符（下划线视为分隔符，与FTS5 unicode61一致）
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# 查询语法：-排除  "短语"  前缀*  普通词
+_QUERY_RE = re.compile(r'(-?)"([^"]*)"(\*?)|(-?)([^\s"]+)')
+
+
+def _is_cjk(char):
+    code = ord(char)
+    for low, high in _CJK_RANGES:
+        if low <= code <= high:
+            return True
+    return False
+
+
+def tokenize(text):
+    """把提示词切成索引词：NFKC规范化、小写，英文按词、中日韩按字
+
+    例如 "(赛博朋克:1.2), Neon_Alley" -> ["赛", "博", "朋", "克", "1", "2", "neon", "alley"]
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        word = match.group(0)
+        start = 0
+        for i, char in enumerate(word):
+            if _is_cjk(char):
+                if i > start:
+                    tokens.append(word[start:i])
+                tokens.append(char)
+                start = i + 1
+        if start < len(word):
+            tokens.append(word[start:])
+    return tokens
+
+
+def index_text(text):
+    """写入FTS5表的文本（预先分好词，用空格连接）"""
+    return " ".join(tokenize(text))
+
+
+def _phrase(tokens, prefix=False):
+    # 每个词都已是纯字母数字，加引号防止被当作FTS5运算符
+    quoted = '"' + " ".join(tokens) + '"'
+    return quoted + " *" if prefix else quoted
+
+
+def build_match_query(query):
+    """把用户查询转换为FTS5 MATCH表达式
+
+    支持：
+      cyberpunk alley     两个词都出现（AND）
+      "cyberpunk alley"   短语（相邻且有序）
+      cyber*              前缀
+      赛博朋克            中文连续字按短语匹配
+      -blurry             排除
+
+    Returns:
+        MATCH表达式；没有任何正向条件时返回None
+    """
+    include = []
+    exclude = []
+    for match in _QUERY_RE.finditer(query or ""):
+        if match.group(2) is not None:
+            negate, body, star = match.group(1), match.group(2), match.group(3)
+        else:
+            negate, body, star = match.group(4), match.group(5), ""
+            if body.endswith("*"):
+                body, star = body.rstrip("*"), "*"
+        tokens = tokenize(body)
+        if not tokens:
+            continue
+        expr = _phrase(tokens, prefix=bool(star))
+        (exclude if negate else include).append(expr)
+
+    if not include:
+        return None
+    expression = " AND ".join(include)
+    for expr in exclude:
+        expression = f"({expression}) NOT {expr}"
+    return expression
+
+
+class PromptIndex:
+    """提示词倒排索引（FTS5虚拟表，与 files 表共用同一个数据库）
+
+    FTS表的rowid等于 files 表对应行的id，正向/负向提示词分两列索引。
+    写入 files 时由 MetadataIndex 同步增删，因此 reindex 和文件监视器的
+    增量更新都会自动反映到全文索引中。SQLite未编译FTS5时 available 为False，
+    搜索退回到对 files 表做LIKE匹配。
+    """
+
+    TABLE = "prompt_fts"
+    # bm25列权重：正向提示词 / 负向提示词
+    WEIGHTS = {"all": (1.0, 0.3), "positive": (1.0, 0.0), "negative": (0.0, 1.0)}
+
+    def __init__(self):
+        self.available = None
+
+    def setup(self, conn):
+        """建表（在 MetadataIndex 打开数据库时调用）"""
+        try:
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5("
+                "positive, negative, tokenize='unicode61 remove_diacritics 2')"
+            )
+            self.available = True
+        except Exception as e:
+            print(f"[Catsee] SQLite FTS5 unavailable, prompt search falls back to LIKE: {e}")
+            self.available = False
+
+    def drop(self, conn):
+        conn.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+
+    def delete_paths(self, conn, paths):
+        """删除这些文件的索引（必须在 files 表删除/替换对应行之前调用）"""
+        if not self.available or not paths:
+            return
+        conn.executemany(
+            f"DELETE FROM {self.TABLE} WHERE rowid IN (SELECT id FROM files WHERE path = ?)",
+            [(path,) for path in paths]
+        )
+
+    def insert_rows(self, conn, rows):
+        """为刚写入 files 表的行建立索引"""
+        if not self.available:
+            return
+        params = [
+            (index_text(row.get("positive_prompt")), index_text(row.get("negative_prompt")), row["path"])
+            for row in rows
+            if row.get("positive_prompt") or row.get("negative_prompt")
+        ]
+        if params:
+            conn.executemany(
+                f"INSERT INTO {self.TABLE}(rowid, positive, negative) "
+                f"SELECT id, ?, ? FROM files WHERE path = ?",
+                params
+            )
+
+    def search(self, conn, query, field="all", limit=50, offset=0):
+        """全文搜索
+
+        Args:
+            query: 查询字符串（语法见 build_match_query）
+            field: all/positive/negative
+            limit/offset: 分页
+
+        Returns:
+            (rows, total)，rows 按相关度（bm25）排序，相关度相同时后索引的文件在前
+        """
+        weights = self.WEIGHTS.get(field, self.WEIGHTS["all"])
+        if not self.available:
+            return self._search_like(conn, query, field, limit, offset)
+
+        expression = build_match_query(query)
+        if expression is None:
+            return [], 0
+        if field in ("positive", "negative"):
+            expression = f"{{{field}}} : ({expression})"
+
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM {self.TABLE} WHERE {self.TABLE} MATCH ?", (expression,)
+        ).fetchone()[0]
+        # 先在FTS表内排序取出一页，再与 files 关联，避免对全部命中行做关联
+        rows = conn.execute(
+            f"SELECT files.*, hits.score AS score FROM ("
+            f"SELECT rowid, bm25({self.TABLE}, ?, ?) AS score FROM {self.TABLE} "
+            f"WHERE {self.TABLE} MATCH ? ORDER BY score, rowid DESC LIMIT ? OFFSET ?"
+            f") AS hits JOIN files ON files.id = hits.rowid ORDER BY hits.score, hits.rowid DESC",
+            (weights[0], weights[1], expression, int(limit), int(offset))
+        ).fetchall()
+        return rows, total
+
+    @staticmethod
+    def _search_like(conn, query, field, limit, offset):
+        """没有FTS5时的退路：每个词做子串匹配，不排序相关度"""
+        columns = {"positive": ["positive_prompt"], "negative": ["negative_prompt"]}.get(
+            field, ["positive_prompt", "negative_prompt"]
+        )
+        clauses = []
+        params = []
+        has_include = False
+        for match in _QUERY_RE.finditer(query or ""):
+            negate = match.group(1) or match.group(4)
+            body = (match.group(2) if match.group(2) is not None else match.group(5)).rstrip("*")
+            if not body:
+                continue
+            like = "%" + body.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            condition = " OR ".join(f"IFNULL({column}, '') LIKE ? ESCAPE '\\'" for column in columns)
+            clauses.append(f"{'NOT ' if negate else ''}({condition})")
+            params += [like] * len(columns)
+            has_include = has_include or not negate
+        if not has_include:
+            return [], 0
+        where = " AND ".join(clauses)
+        total = conn.execute(f"SELECT COUNT(*) FROM files WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT files.*, 0 AS score FROM files WHERE {where} "
+            f"ORDER BY modified_time DESC LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)]
+        ).fetchall()
+        return rows, total
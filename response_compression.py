@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩模块 - 按Accept-Encoding协商gzip/brotli/zstd，压缩浏览器API的JSON响应
+"""
+import zlib
+import threading
+from collections import OrderedDict
+
+from aiohttp import web, hdrs
+
+try:
+    from .config import config
+    from .task_executor import task_executor
+    from .json_codec import json_codec
+except ImportError:
+    from config import config
+    from task_executor import task_executor
+    from json_codec import json_codec
+
+# brotli / zstd 为可选依赖
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULTS = {
+    "enabled": True,
+    "min_size": 1024,  # 小于此字节数的响应不压缩
+    "inline_max": 64 * 1024,  # 超过此字节数的压缩放到线程池
+    "stream_min_items": 2000,  # 目录条目数超过此值时流式输出
+    "stream_chunk_items": 500,  # 流式输出每块的条目数
+    "gzip_level": 6,
+    "brotli_quality": 5,
+    "zstd_level": 3,
+    "cache_max_mb": 64,  # 预压缩响应体缓存
+    "preference": ["br", "zstd", "gzip"]  # q值相同时的优先顺序
+}
+
+
+class EncodedResponse(web.Response):
+    """已经压缩好的响应
+
+    ComfyUI开启 --enable-compress-response-body 时，其中间件会对JSON响应调用
+    enable_compression()；已有 Content-Encoding 的响应忽略该调用，避免二次压缩。
+    """
+
+    def enable_compression(self, *args, **kwargs):
+        if hdrs.CONTENT_ENCODING in self.headers:
+            return
+        super().enable_compression(*args, **kwargs)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+        # brotli 用 process，brotlicffi 用 compress
+        self._process = getattr(self._obj, "process", None) or self._obj.compress
+
+    def compress(self, data):
+        return self._process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+def parse_accept_encoding(header):
+    """解析Accept-Encoding，返回 {编码: q值}"""
+    accepted = {}
+    for part in (header or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+class ResponseCompressor:
+    """API响应压缩
+
+    gzip始终可用，安装了 brotli/brotlicffi、zstandard 时分别支持 br、zstd。
+    只用于JSON等文本响应；图片、视频走 file_sender 的sendfile，从不经过这里。
+    不变的内容（如按文件指纹标识的工作流）可以带 cache_key，压缩结果按
+    (cache_key, 编码) 缓存并带上ETag，重复请求直接返回缓存或304。
+    """
+
+    def __init__(self, options=None):
+        opts = config.section("compression", DEFAULTS, options)
+        self.enabled = bool(opts["enabled"])
+        self.min_size = int(opts["min_size"])
+        self.inline_max = int(opts["inline_max"])
+        self.stream_min_items = int(opts["stream_min_items"])
+        self.stream_chunk_items = max(1, int(opts["stream_chunk_items"]))
+        self._factories = {"gzip": lambda: _GzipStream(int(opts["gzip_level"]))}
+        if brotli is not None:
+            self._factories["br"] = lambda: _BrotliStream(int(opts["brotli_quality"]))
+        if zstandard is not None:
+            self._factories["zstd"] = lambda: _ZstdStream(int(opts["zstd_level"]))
+        self.preference = [name for name in opts["preference"] if name in self._factories]
+        self.preference += [name for name in self._factories if name not in self.preference]
+
+        self.cache_max_bytes = int(opts["cache_max_mb"]) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (cache_key, 协商的编码) -> (响应体, 实际编码)
+        self._cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.not_modified = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def encodings(self):
+        """当前可用的编码"""
+        return list(self.preference)
+
+    def negotiate(self, accept_encoding):
+        """选择客户端接受且服务端支持的编码，都不接受时返回None"""
+        if not self.enabled:
+            return None
+        accepted = parse_accept_encoding(accept_encoding)
+        best = None
+        best_q = 0.0
+        wildcard = accepted.get("*", 0.0)
+        for name in self.preference:
+            q = accepted.get(name, wildcard)
+            if q > best_q:
+                best, best_q = name, q
+        return best
+
+    def compressobj(self, encoding):
+        """流式压缩对象：compress(bytes) / flush() / finish()"""
+        return self._factories[encoding]()
+
+    def compress(self, data, encoding):
+        stream = self.compressobj(encoding)
+        return stream.compress(data) + stream.finish()
+
+    async def _encode(self, data, encoding, kind):
+        if len(data) > self.inline_max:
+            body = await task_executor.run(kind, self.compress, data, encoding)
+        else:
+            body = self.compress(data, encoding)
+        with self._lock:
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+        return body
+
+    # ---- 预压缩缓存 ----
+
+    @staticmethod
+    def etag(cache_key):
+        # 不同编码的响应体不同，使用弱ETag
+        return f'W/"{cache_key}"'
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry
+
+    def _cache_put(self, key, body, encoding):
+        if len(body) > self.cache_max_bytes:
+            return
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_bytes -= len(old[0])
+            self._cache[key] = (body, encoding)
+            self._cache_bytes += len(body)
+            while self._cache_bytes > self.cache_max_bytes and self._cache:
+                _, (evicted, _) = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def cached_response(self, request, cache_key, content_type="application/json"):
+        """不变内容的缓存命中检查：返回304/缓存的响应，未命中返回None"""
+        etag = self.etag(cache_key)
+        if f'"{cache_key}"' in request.headers.get(hdrs.IF_NONE_MATCH, ""):
+            with self._lock:
+                self.not_modified += 1
+            return web.Response(status=304, headers={hdrs.ETAG: etag, hdrs.VARY: hdrs.ACCEPT_ENCODING})
+        entry = self._cache_get((cache_key, self.negotiate(request.headers.get(hdrs.ACCEPT_ENCODING))))
+        if entry is None:
+            return None
+        body, encoding = entry
+        return self._build(body, encoding, content_type, 200, {hdrs.ETAG: etag})
+
+    # ---- 响应 ----
+
+    @staticmethod
+    def _build(body, encoding, content_type, status, headers):
+        headers = dict(headers or {})
+        headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+        if encoding:
+            headers[hdrs.CONTENT_ENCODING] = encoding
+        return EncodedResponse(body=body, status=status, headers=headers,
+                               content_type=content_type, charset="utf-8")
+
+    async def respond(self, request, text, status=200, content_type="application/json",
+                      headers=None, cache_key=None, kind="io"):
+        """按Accept-Encoding压缩并返回响应
+
+        Args:
+            text: 响应正文（str或bytes）
+            cache_key: 内容不变时的缓存键（如文件指纹），同时作为ETag
+            kind: 大响应体压缩时使用的 task_executor 任务类型
+        """
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        headers = dict(headers or {})
+        if cache_key:
+            headers[hdrs.ETAG] = self.etag(cache_key)
+        negotiated = self.negotiate(request.headers.get(hdrs.ACCEPT_ENCODING))
+        if negotiated is None or len(data) < self.min_size:
+            body, encoding = data, None
+        else:
+            body, encoding = await self._encode(data, negotiated, kind), negotiated
+        if cache_key:
+            self._cache_put((cache_key, negotiated), body, encoding)
+        return self._build(body, encoding, content_type, status, headers)
+
+    async def respond_json(self, request, payload, status=200, kind="io", **kwargs):
+        """序列化（大对象在线程池中）并压缩JSON响应"""
+        data = await task_executor.run(kind, json_codec.dumps, payload)
+        return await self.respond(request, data, status=status, kind=kind, **kwargs)
+
+    async def start_stream(self, request, content_type="application/json", headers=None):
+        """开始分块发送的流式响应，返回 (StreamResponse, encode)
+
+        encode(data, last=False) 压缩一块数据并flush（last=True 时结束压缩流），
+        返回要写出的字节。可以在线程池中调用，但同一个流的调用必须依次进行。
+        """
+        encoding = self.negotiate(request.headers.get(hdrs.ACCEPT_ENCODING))
+        stream = self.compressobj(encoding) if encoding else None
+        response = web.StreamResponse(headers=headers)
+        response.headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+        response.content_type = content_type
+        response.charset = "utf-8"
+        if encoding:
+            response.headers[hdrs.CONTENT_ENCODING] = encoding
+        await response.prepare(request)
+
+        def encode(data, last=False):
+            if stream is None:
+                out = data
+            else:
+                out = stream.compress(data)
+                out += stream.finish() if last else stream.flush()
+            with self._lock:
+                self.bytes_in += len(data)
+                self.bytes_out += len(out)
+            return out
+
+        return response, encode
+
+    async def stream_listing(self, request, envelope, items, kind="io"):
+        """流式输出大列表：{"success": true, "data": {..., "items": [...]}}
+
+        每次在线程池中序列化并压缩 stream_chunk_items 个条目后立即写出，
+        不在内存中拼出完整的响应体，客户端也能更早收到数据。
+
+        Args:
+            envelope: data 中除 items 以外的字段
+            items: 条目列表
+        """
+        response, encode = await self.start_stream(request)
+
+        head = json_codec.dumps({"success": True, "data": envelope})
+        # 去掉结尾的 "}}"，接上 items 数组
+        prefix = head[:-2] + (b"," if envelope else b"") + b'"items":['
+        chunk_items = self.stream_chunk_items
+
+        def encode_chunk(start):
+            batch = items[start:start + chunk_items]
+            # 整块序列化成数组后去掉方括号
+            data = json_codec.dumps(batch)[1:-1]
+            if start == 0:
+                data = prefix + data
+            elif batch:
+                data = b"," + data
+            last = start + chunk_items >= len(items)
+            if last:
+                data += b"]}}"
+            return encode(data, last)
+
+        for start in range(0, max(1, len(items)), chunk_items):
+            await response.write(await task_executor.run(kind, encode_chunk, start))
+        await response.write_eof()
+        return response
+
+    def stats(self):
+        """压缩统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "encodings": self.encodings,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "cache_entries": len(self._cache),
+                "cache_bytes": self._cache_bytes,
+                "cache_max_bytes": self.cache_max_bytes,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "not_modified": self.not_modified
+            }
+
+
+# 全局响应压缩实例
+response_compressor = ResponseCompressor()
@@ -5,29 +5,109 @@
 from pathlib import Path
 from aiohttp import web
 import json
+import struct
+import asyncio
+import itertools
 
 try:
     from .file_manager import file_manager
+    from .thumbnail_cache import thumbnail_cache, render_thumbnail
+    from .task_executor import task_executor, QueueFullError
+    from .file_sender import send_file
+    from .thumbnail_atlas import atlas_builder
+    from .thumbnail_prewarm import thumbnail_prewarmer
+    from .metadata_index import metadata_index
+    from .fs_watcher import file_watcher
+    from .metadata_cache import metadata_cache
+    from .dir_listing import listing_cache
+    from .response_compression import response_compressor
+    from .json_codec import json_codec
+    from .live_updates import live_updates
+    from .content_hash import content_hasher
+    from .perceptual_hash import image_similarity
 except ImportError:
     from file_manager import file_manager
+    from thumbnail_cache import thumbnail_cache, render_thumbnail
+    from task_executor import task_executor, QueueFullError
+    from file_sender import send_file
+    from thumbnail_atlas import atlas_builder
+    from thumbnail_prewarm import thumbnail_prewarmer
+    from metadata_index import metadata_index
+    from fs_watcher import file_watcher
+    from metadata_cache import metadata_cache
+    from dir_listing import listing_cache
+    from response_compression import response_compressor
+    from json_codec import json_codec
+    from live_updates import live_updates
+    from content_hash import content_hasher
+    from perceptual_hash import image_similarity
+
+# 图片扩展名（缩略图/原图接口）
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif']
+# 批量缩略图接口单次最多处理的文件数
+MAX_THUMBNAIL_BATCH = 500
+# 批量缩略图接口单个请求内同时处理的文件数
+THUMBNAIL_BATCH_CONCURRENCY = 8
+# 搜索接口可用的元数据过滤参数
+SEARCH_FILTERS = ('checkpoint', 'loras', 'sampler', 'scheduler', 'prompts', 'seed', 'steps', 'cfg')
+# 搜索接口单页最多返回的条目数
+MAX_SEARCH_RESULTS = 1000
+# 流式浏览（NDJSON）第一块的条目数（尽快显示第一屏），以及之后每块的条目数
+BROWSE_STREAM_FIRST_BATCH = 100
+BROWSE_STREAM_BATCH = 1000
+# 元数据子资源 -> 元数据字段（体积大，摘要层级不包含，按需单独获取）
+METADATA_RESOURCES = {'prompt': 'comfy_prompt', 'workflow': 'comfy_workflow', 'exif': 'exif_info'}
 
 class BrowserServer:
     """浏览器服务器 - 只保留核心功能"""
     
     def __init__(self):
         self.routes = []
+        # 跟踪输出目录变化，增量更新目录列表、元数据索引和缩略图缓存
+        file_watcher.start()
+        # 监视器启动时会为它跟踪的目录建立索引；未启动时在后台建立输出目录的首次索引
+        if file_watcher.backend is None:
+            metadata_index.ensure_fresh()
+    
+    @staticmethod
+    def _busy_response(error, as_json=True):
+        """任务队列已满时返回503"""
+        print(f"[CatSee] 服务繁忙: {error}")
+        headers = {'Retry-After': '1'}
+        if as_json:
+            return web.json_response({
+                'success': False,
+                'error': '服务器繁忙，请稍后重试'
+            }, status=503, headers=headers)
+        return web.Response(status=503, text='Server busy', headers=headers)
     
     def setup_routes(self, app):
         """设置路由"""
         # 核心API路由
         app.router.add_get('/browser/api/browse', self.browse_directory)
+        app.router.add_get('/browser/api/browse/stream', self.browse_stream)
         app.router.add_get('/browser/api/drives', self.get_drives)
         app.router.add_get('/browser/api/quick-access', self.get_quick_access)
         app.router.add_get('/browser/api/desktop', self.get_desktop)
         app.router.add_get('/browser/api/thumbnail', self.get_thumbnail)
+        app.router.add_post('/browser/api/thumbnails', self.get_thumbnails_batch)
+        app.router.add_get('/browser/api/atlas', self.get_atlas)
+        app.router.add_get('/browser/api/atlas/image', self.get_atlas_image)
+        app.router.add_get('/browser/api/prewarm', self.get_prewarm_status)
+        app.router.add_post('/browser/api/prewarm/cancel', self.cancel_prewarm)
         app.router.add_get('/browser/api/image', self.get_image)
         app.router.add_get('/browser/api/video', self.get_video)
         app.router.add_get('/browser/api/metadata', self.get_metadata)
+        app.router.add_get('/browser/api/metadata/{resource}', self.get_metadata_resource)
+        app.router.add_get('/browser/api/search', self.search_files)
+        app.router.add_get('/browser/api/prompt-search', self.search_prompts)
+        app.router.add_post('/browser/api/reindex', self.reindex)
+        app.router.add_get('/browser/api/index', self.get_index_status)
+        app.router.add_get('/browser/api/cache-stats', self.get_cache_stats)
+        app.router.add_get('/browser/api/ws', self.live_updates_socket)
+        app.router.add_get('/browser/api/duplicates', self.get_duplicates)
+        app.router.add_get('/browser/api/similar', self.get_similar)
+        app.router.add_get('/browser/api/near-duplicates', self.get_near_duplicates)
         
         # 静态文件路由
         app.router.add_static('/browser/static/', path=str(Path(__file__).parent / 'web'), name='browser_static')
@@ -35,11 +115,19 @@ class BrowserServer:
         print("[CatSee浏览器] 路由注册成功")
     
     async def browse_directory(self, request):
-        """浏览目录"""
+        """浏览目录
+        
+        参数：path、page/per_page（偏移分页）、sort（name/mtime/size/type）、order（asc/desc）、
+        type（文件类型过滤）、cursor（上一页返回的 next_cursor，游标分页）
+        """
         try:
             path = request.query.get('path', '')
             page = int(request.query.get('page', 1))
             per_page = int(request.query.get('per_page', 10000))  # 增加到10000以显示所有文件
+            sort = request.query.get('sort') or None
+            order = request.query.get('order') or None
+            file_type = request.query.get('type') or None
+            cursor = request.query.get('cursor') or None
             
             if not path:
                 return web.json_response({
@@ -47,24 +135,110 @@ class BrowserServer:
                     'error': '缺少路径参数'
                 }, status=400)
             
-            result = file_manager.browse_directory(path, page, per_page)
+            result = await task_executor.run(
+                'browse', file_manager.browse_directory, path, page, per_page, file_type, sort, order, cursor
+            )
             
-            return web.json_response({
+            # 后台预热缩略图：当前页优先，然后是目录其余图片；浏览其他目录时自动取消
+            if not result.get('error') and request.query.get('prewarm', '1') != '0':
+                thumbnail_prewarmer.schedule(path, result.get('items', []))
+            
+            # 大目录边序列化边压缩边发送
+            items = result.get('items', [])
+            if len(items) >= response_compressor.stream_min_items:
+                envelope = {key: value for key, value in result.items() if key != 'items'}
+                return await response_compressor.stream_listing(request, envelope, items, kind='browse')
+            
+            # JSON序列化同样放到线程池
+            response_body = await task_executor.run('browse', json_codec.dumps, {
                 'success': True,
                 'data': result
             })
+            return await response_compressor.respond(request, response_body, kind='browse')
             
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except ValueError as e:
+            return web.json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         except Exception as e:
             return web.json_response({
                 'success': False,
                 'error': str(e)
             }, status=500)
     
+    @staticmethod
+    def _ndjson_batch(records, count):
+        """从记录生成器中取出最多 count 条，序列化为NDJSON，返回 (字节, 条目, 是否结束)"""
+        batch = list(itertools.islice(records, count))
+        data = b''.join(json_codec.dumps(record) + b'\n' for record in batch)
+        return data, batch, len(batch) < count
+    
+    async def browse_stream(self, request):
+        """流式浏览目录（NDJSON，每行一个JSON记录）
+        
+        先输出全部文件夹，然后按扫描顺序输出文件，最后一行为
+        {"record": "summary", ...}（总数、计数、排序方式）；扫描中途出错时最后一行为
+        {"record": "error", "error": ...}。第一块只含少量条目，客户端可以立即渲染第一屏；
+        之后每块在线程池中扫描、序列化、压缩后写出，服务端不保留完整列表。
+        
+        参数：path、type（文件类型过滤）、prewarm（0 时不预热缩略图）
+        """
+        path = request.query.get('path', '')
+        file_type = request.query.get('type') or None
+        if not path:
+            return web.json_response({'success': False, 'error': '缺少路径参数'}, status=400)
+        
+        try:
+            records = await task_executor.run('browse', file_manager.stream_directory, path, file_type)
+            # 第一块在发送响应头之前读取，目录不可读时还能返回错误状态码
+            data, first_items, done = await task_executor.run(
+                'browse', self._ndjson_batch, records, BROWSE_STREAM_FIRST_BATCH
+            )
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except FileNotFoundError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=404)
+        except PermissionError:
+            return web.json_response({'success': False, 'error': '权限不足'}, status=403)
+        except Exception as e:
+            print(f"[CatSee] Error streaming directory: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+        
+        response, encode = await response_compressor.start_stream(request, content_type='application/x-ndjson')
+        
+        def next_chunk():
+            chunk, _, finished = self._ndjson_batch(records, BROWSE_STREAM_BATCH)
+            return encode(chunk, finished), finished
+        
+        try:
+            await response.write(encode(data, done))
+            while not done:
+                try:
+                    chunk, done = await task_executor.run('browse', next_chunk)
+                except Exception as e:
+                    print(f"[CatSee] Directory stream aborted: {e}")
+                    chunk, done = encode(json_codec.dumps({'record': 'error', 'error': str(e)}) + b'\n', True), True
+                await response.write(chunk)
+            await response.write_eof()
+        finally:
+            try:
+                records.close()
+            except ValueError:
+                pass  # 客户端断开时线程池中的批次可能仍在执行，生成器结束后自行回收
+        
+        # 与普通浏览一样预热缩略图（第一屏优先）
+        if request.query.get('prewarm', '1') != '0':
+            thumbnail_prewarmer.schedule(path, first_items)
+        return response
+    
     async def get_drives(self, request):
         """获取系统驱动器"""
         try:
             print("[CatSee] Getting drives...")
-            drives = file_manager.get_drives()
+            drives = await task_executor.run('io', file_manager.get_drives)
             print(f"[CatSee] Found {len(drives) if drives else 0} drives: {drives}")
             
             if drives is None:
@@ -79,6 +253,8 @@ class BrowserServer:
             
             return web.json_response(response_data)
             
+        except QueueFullError as e:
+            return self._busy_response(e)
         except Exception as e:
             print(f"[CatSee] Error in get_drives: {e}")
             import traceback
@@ -91,13 +267,15 @@ class BrowserServer:
     async def get_quick_access(self, request):
         """获取快速访问目录"""
         try:
-            quick_dirs = file_manager.get_quick_access()
+            quick_dirs = await task_executor.run('io', file_manager.get_quick_access)
             
             return web.json_response({
                 'success': True,
                 'data': quick_dirs
             })
             
+        except QueueFullError as e:
+            return self._busy_response(e)
         except Exception as e:
             return web.json_response({
                 'success': False,
@@ -128,45 +306,373 @@ class BrowserServer:
             if not file_path:
                 return web.Response(status=400, text='Missing path parameter')
             
-            from pathlib import Path
-            from PIL import Image
-            import io
-            
             path = Path(file_path)
-            print(f"[CatSee] 缩略图请求: {path}")
-            
-            if not path.exists() or not path.is_file():
-                print(f"[CatSee] 文件不存在: {path}")
-                return web.Response(status=404, text='File not found')
             
             # 检查是否为图片
-            if path.suffix.lower() not in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif']:
+            if path.suffix.lower() not in IMAGE_EXTENSIONS:
                 print(f"[CatSee] 不是图片文件: {path.suffix}")
                 return web.Response(status=400, text='Not an image file')
             
-            # 生成缩略图（优化：更小尺寸，更低质量）
-            img = Image.open(path)
-            original_size = img.size
-            img.thumbnail((100, 100), Image.Resampling.BILINEAR)  # 改用BILINEAR更快
-            print(f"[CatSee] 缩略图生成成功: {original_size} -> {img.size}")
-            
-            # 转换为JPEG并返回（降低质量加快速度）
-            buffer = io.BytesIO()
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            img.save(buffer, format='JPEG', quality=60, optimize=False)  # 降低质量，关闭优化
-            buffer.seek(0)
-            
-            return web.Response(
-                body=buffer.read(), 
-                content_type='image/jpeg',
-                headers={'Cache-Control': 'public, max-age=86400'}  # 缓存24小时
+            thumb_path = await self._load_thumbnail(path)
+            if not thumb_path:
+                print(f"[CatSee] 文件不存在: {path}")
+                return web.Response(status=404, text='File not found')
+            
+            return web.FileResponse(
+                thumb_path,
+                headers={
+                    'Content-Type': 'image/jpeg',
+                    'Cache-Control': 'public, max-age=86400'  # 缓存24小时
+                }
             )
             
+        except QueueFullError as e:
+            return self._busy_response(e, as_json=False)
         except Exception as e:
             print(f"[CatSee] Error generating thumbnail: {e}")
             return web.Response(status=500, text=str(e))
     
+    async def _load_thumbnail(self, path):
+        """查询持久化缓存，未命中时在解码池中生成并写入缓存
+        
+        Returns:
+            缩略图路径，源文件不存在时返回None
+        """
+        file_hash, thumb_path = await task_executor.run('io', file_manager.lookup_thumbnail, path)
+        if not file_hash:
+            return None
+        if not thumb_path:
+            thumb_path = await task_executor.run(
+                'thumbnail', render_thumbnail,
+                str(path), str(thumbnail_cache.path_for(file_hash)), file_manager.thumbnail_size
+            )
+            await task_executor.run('io', thumbnail_cache.add, file_hash, path)
+        return thumb_path
+    
+    async def _thumbnail_frame(self, index, file_path):
+        """生成批量响应中的一帧：4字节头长度(大端) + JSON头 + JPEG数据"""
+        header = {'index': index, 'path': file_path, 'status': 200, 'size': 0, 'type': 'image/jpeg'}
+        data = b''
+        try:
+            path = Path(file_path)
+            if path.suffix.lower() not in IMAGE_EXTENSIONS:
+                header['status'] = 400
+            else:
+                thumb_path = await self._load_thumbnail(path)
+                if not thumb_path:
+                    header['status'] = 404
+                else:
+                    data = await task_executor.run('io', Path(thumb_path).read_bytes)
+        except QueueFullError:
+            header['status'] = 503
+        except Exception as e:
+            print(f"[CatSee] Error generating thumbnail: {file_path}: {e}")
+            header['status'] = 500
+        header['size'] = len(data)
+        header_bytes = json_codec.dumps(header)
+        return struct.pack('>I', len(header_bytes)) + header_bytes + data
+    
+    async def get_thumbnails_batch(self, request):
+        """批量获取缩略图（网格视图一次请求一批）
+        
+        请求体为JSON：{"paths": [...]}，或 {"directory": 目录, "page": 页码, "per_page": 每页数量}
+        （目录模式只取该页中的图片）。响应是按生成完成顺序流式写出的帧序列，
+        每帧为 4字节大端头长度 + JSON头{index, path, status, size, type} + size字节的JPEG。
+        """
+        try:
+            try:
+                body = await request.json()
+            except Exception:
+                return web.json_response({'success': False, 'error': '请求体不是有效的JSON'}, status=400)
+            
+            paths = body.get('paths')
+            if paths is None and body.get('directory'):
+                page = int(body.get('page', 1))
+                per_page = int(body.get('per_page', 100))
+                listing = await task_executor.run(
+                    'browse', file_manager.browse_directory, body['directory'], page, per_page, 'image'
+                )
+                paths = [item['path'] for item in listing.get('items', []) if not item.get('is_folder')]
+            if not isinstance(paths, list) or not paths:
+                return web.json_response({'success': False, 'error': '缺少paths或directory参数'}, status=400)
+            if len(paths) > MAX_THUMBNAIL_BATCH:
+                return web.json_response({
+                    'success': False,
+                    'error': f'单次最多请求{MAX_THUMBNAIL_BATCH}个缩略图'
+                }, status=400)
+            
+            response = web.StreamResponse(headers={'Cache-Control': 'no-store'})
+            response.content_type = 'application/x-catsee-thumbnails'
+            await response.prepare(request)
+            
+            semaphore = asyncio.Semaphore(THUMBNAIL_BATCH_CONCURRENCY)
+            
+            async def build(index, file_path):
+                async with semaphore:
+                    return await self._thumbnail_frame(index, str(file_path))
+            
+            tasks = [asyncio.ensure_future(build(i, p)) for i, p in enumerate(paths)]
+            try:
+                # 谁先生成好就先写出谁
+                for next_frame in asyncio.as_completed(tasks):
+                    await response.write(await next_frame)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            
+            await response.write_eof()
+            return response
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except (ConnectionResetError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            print(f"[CatSee] Error in thumbnail batch: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_atlas(self, request):
+        """获取目录某一页的缩略图图集坐标表"""
+        try:
+            path = request.query.get('path', '')
+            if not path:
+                return web.json_response({'success': False, 'error': '缺少路径参数'}, status=400)
+            
+            page = int(request.query.get('page', 1))
+            per_page = int(request.query.get('per_page', 100))
+            tile = int(request.query.get('tile', 128))
+            columns = int(request.query.get('columns', 10))
+            
+            atlas_map = await task_executor.run('atlas', atlas_builder.get_atlas, path, page, per_page, tile, columns)
+            if atlas_map.get('error'):
+                return web.json_response({'success': False, 'error': atlas_map['error']}, status=404)
+            
+            atlas_map['url'] = f"/browser/api/atlas/image?key={atlas_map['key']}"
+            return web.json_response({'success': True, 'data': atlas_map})
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"[CatSee] Error building atlas: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_atlas_image(self, request):
+        """获取图集图片（键由内容决定，可以永久缓存）"""
+        try:
+            key = request.query.get('key', '')
+            image_path = await task_executor.run('io', atlas_builder.image_path, key)
+            if not image_path:
+                return web.Response(status=404, text='Atlas not found')
+            
+            return web.FileResponse(
+                image_path,
+                headers={
+                    'Content-Type': 'image/jpeg',
+                    'Cache-Control': 'public, max-age=31536000, immutable'
+                }
+            )
+        except QueueFullError as e:
+            return self._busy_response(e, as_json=False)
+        except Exception as e:
+            print(f"[CatSee] Error loading atlas: {e}")
+            return web.Response(status=500, text=str(e))
+    
+    async def search_files(self, request):
+        """搜索输出目录（查询元数据索引）
+        
+        参数：q（文件名/相对路径子串）、type、limit、offset，
+        以及元数据过滤 checkpoint/loras/sampler/scheduler/prompts（子串）和 seed/steps/cfg（精确）。
+        索引正在后台建立/更新时返回当前已索引的结果，并带 indexing: true
+        """
+        try:
+            query = request.query.get('q', '')
+            file_type = request.query.get('type') or None
+            limit = min(MAX_SEARCH_RESULTS, int(request.query.get('limit', 200)))
+            offset = max(0, int(request.query.get('offset', 0)))
+            filters = {key: request.query[key] for key in SEARCH_FILTERS if request.query.get(key)}
+            
+            results = await task_executor.run(
+                'search', file_manager.search_files, query, file_type, limit=limit, offset=offset, **filters
+            )
+            return await response_compressor.respond_json(request, {
+                'success': True,
+                'data': {'items': results, 'limit': limit, 'offset': offset,
+                         'indexing': metadata_index.is_indexing()}
+            }, kind='search')
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"[CatSee] Error searching files: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def search_prompts(self, request):
+        """按提示词全文搜索
+        
+        参数：q（查询，支持 "短语"、前缀*、-排除，中英文混合）、
+        field（all/positive/negative）、page、per_page
+        """
+        try:
+            query = request.query.get('q', '').strip()
+            if not query:
+                return web.json_response({'success': False, 'error': '缺少查询参数'}, status=400)
+            field = request.query.get('field', 'all')
+            if field not in ('all', 'positive', 'negative'):
+                return web.json_response({'success': False, 'error': 'field参数无效'}, status=400)
+            page = int(request.query.get('page', 1))
+            per_page = min(MAX_SEARCH_RESULTS, int(request.query.get('per_page', 50)))
+            
+            result = await task_executor.run('search', file_manager.search_prompts, query, field, page, per_page)
+            result['indexing'] = metadata_index.is_indexing()
+            return await response_compressor.respond_json(request, {'success': True, 'data': result}, kind='search')
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"[CatSee] Error searching prompts: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def reindex(self, request):
+        """重建元数据索引
+        
+        请求体（可选）为JSON：{"path": 根目录, "full": 是否重新提取所有文件}
+        """
+        try:
+            body = {}
+            if request.can_read_body:
+                try:
+                    body = await request.json()
+                except Exception:
+                    return web.json_response({'success': False, 'error': '请求体不是有效的JSON'}, status=400)
+            
+            stats = await task_executor.run(
+                'index', metadata_index.reindex, body.get('path') or None, full=bool(body.get('full'))
+            )
+            return web.json_response({'success': True, 'data': stats})
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except Exception as e:
+            print(f"[CatSee] Error rebuilding index: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_index_status(self, request):
+        """获取元数据索引统计"""
+        try:
+            stats = await task_executor.run('io', metadata_index.stats)
+            stats['watcher'] = file_watcher.stats()
+            stats['live'] = live_updates.stats()
+            stats['similarity'] = image_similarity.stats()
+            return web.json_response({'success': True, 'data': stats})
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except Exception as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_cache_stats(self, request):
+        """获取各级缓存的命中统计"""
+        try:
+            return web.json_response({'success': True, 'data': {
+                'metadata': metadata_cache.stats(),
+                'thumbnails': thumbnail_cache.stats(),
+                'atlases': atlas_builder.cache.stats(),
+                'listings': listing_cache.stats(),
+                'compression': response_compressor.stats(),
+                'serializer': json_codec.stats()
+            }})
+        except Exception as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_duplicates(self, request):
+        """查找输出目录和收藏目录中内容相同的文件
+        
+        查重在后台进行：没有结果或结果已过期（refresh=1 时强制）时开始扫描，
+        立即返回当前状态（running/progress），客户端轮询直到 result 出现。
+        """
+        try:
+            started = content_hasher.schedule(force=request.query.get('refresh') == '1')
+            status = content_hasher.status()
+            status['started'] = started
+            return await response_compressor.respond_json(request, {'success': True, 'data': status})
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except Exception as e:
+            print(f"[CatSee] Error finding duplicates: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_similar(self, request):
+        """查找与某张图片相似的图片（感知哈希汉明距离）
+        
+        参数：path（图片）、distance（最大距离）、limit、dir（只在该目录中查找）。
+        不指定 dir 时在整个索引中查找；索引在后台建立，结果的 index 字段给出
+        已索引的图片数和扫描进度。
+        """
+        if not image_similarity.enabled:
+            return web.json_response({'success': False, 'error': '相似图片查询未启用'}, status=404)
+        try:
+            path = request.query.get('path', '')
+            if not path:
+                return web.json_response({'success': False, 'error': '缺少路径参数'}, status=400)
+            # 第一次使用时在后台为输出目录和收藏目录建立索引
+            image_similarity.schedule()
+            result = await image_similarity.similar(
+                path, request.query.get('distance'), request.query.get('limit'), request.query.get('dir') or None
+            )
+            return await response_compressor.respond_json(request, {'success': True, 'data': result})
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except FileNotFoundError:
+            return web.json_response({'success': False, 'error': '图片不存在或无法读取'}, status=404)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"[CatSee] Error finding similar images: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def get_near_duplicates(self, request):
+        """目录中的近似重复图片分组（参数：path（目录）、distance（最大距离））"""
+        if not image_similarity.enabled:
+            return web.json_response({'success': False, 'error': '相似图片查询未启用'}, status=404)
+        try:
+            path = request.query.get('path', '')
+            if not path:
+                return web.json_response({'success': False, 'error': '缺少路径参数'}, status=400)
+            image_similarity.schedule()
+            result = await image_similarity.near_duplicates(path, request.query.get('distance'))
+            return await response_compressor.respond_json(request, {'success': True, 'data': result})
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except FileNotFoundError:
+            return web.json_response({'success': False, 'error': '目录不存在或无法访问'}, status=404)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"[CatSee] Error grouping near-duplicates: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+    
+    async def live_updates_socket(self, request):
+        """WebSocket：推送已订阅目录的增删改（见 LiveUpdates）"""
+        return await live_updates.handle(request)
+    
+    async def get_prewarm_status(self, request):
+        """获取缩略图预热状态"""
+        return web.json_response({'success': True, 'data': thumbnail_prewarmer.stats()})
+    
+    async def cancel_prewarm(self, request):
+        """取消缩略图预热（离开目录或关闭浏览器时调用）
+        
+        可选参数 path：只有正在预热的正是该目录时才取消
+        """
+        path = request.query.get('path') or None
+        cancelled = thumbnail_prewarmer.cancel(path)
+        return web.json_response({'success': True, 'cancelled': cancelled})
+    
     async def get_image(self, request):
         """获取原始图片（用于预览）"""
         try:
@@ -180,18 +686,10 @@ class BrowserServer:
             path = Path(file_path)
             print(f"[CatSee] 图片请求: {path}")
             
-            if not path.exists() or not path.is_file():
-                print(f"[CatSee] 图片不存在: {path}")
-                return web.Response(status=404, text='File not found')
-            
             # 检查是否为图片
-            if path.suffix.lower() not in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif']:
+            if path.suffix.lower() not in IMAGE_EXTENSIONS:
                 return web.Response(status=400, text='Not an image file')
             
-            # 直接返回原图
-            with open(path, 'rb') as f:
-                image_data = f.read()
-            
             # 根据扩展名设置content-type
             content_types = {
                 '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
@@ -201,13 +699,18 @@ class BrowserServer:
             }
             content_type = content_types.get(path.suffix.lower(), 'image/jpeg')
             
-            print(f"[CatSee] 图片加载成功: {path.name}, 大小: {len(image_data)} bytes, 类型: {content_type}")
-            return web.Response(
-                body=image_data, 
-                content_type=content_type,
-                headers={'Cache-Control': 'public, max-age=3600'}
+            # 直接返回原图（sendfile零拷贝；ETag/Last-Modified命中时返回304）
+            response = await send_file(
+                request, path, content_type,
+                headers={'Cache-Control': 'public, max-age=3600'},
+                kind='image'
             )
+            if response.status == 404:
+                print(f"[CatSee] 图片不存在: {path}")
+            return response
             
+        except QueueFullError as e:
+            return self._busy_response(e, as_json=False)
         except Exception as e:
             print(f"[CatSee] Error loading image: {e}")
             return web.Response(status=500, text=str(e))
@@ -233,10 +736,6 @@ class BrowserServer:
             path = Path(file_path)
             print(f"[CatSee] 视频请求: {path}")
             
-            if not path.exists() or not path.is_file():
-                print(f"[CatSee] 视频不存在: {path}")
-                return web.Response(status=404, text='File not found')
-            
             # 检查是否为视频文件
             video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v', '.mpg', '.mpeg']
             if path.suffix.lower() not in video_extensions:
@@ -257,67 +756,49 @@ class BrowserServer:
             }
             content_type = content_types.get(path.suffix.lower(), 'video/mp4')
             
-            # 支持范围请求（Range requests）用于视频流式传输
-            range_header = request.headers.get('Range', '')
-            file_size = path.stat().st_size
-            
-            if range_header:
-                # 解析范围请求
-                import re
-                match = re.match(r'bytes=(\d+)-(\d*)', range_header)
-                if match:
-                    start = int(match.group(1))
-                    end = int(match.group(2)) if match.group(2) else file_size - 1
-                    
-                    # 读取指定范围的数据
-                    with open(path, 'rb') as f:
-                        f.seek(start)
-                        chunk_size = end - start + 1
-                        video_data = f.read(chunk_size)
-                    
-                    # 返回206 Partial Content响应
-                    return web.Response(
-                        body=video_data,
-                        status=206,
-                        content_type=content_type,
-                        headers={
-                            'Content-Range': f'bytes {start}-{end}/{file_size}',
-                            'Accept-Ranges': 'bytes',
-                            'Content-Length': str(len(video_data)),
-                            'Cache-Control': 'public, max-age=3600'
-                        }
-                    )
-            
-            # 如果没有范围请求，返回整个文件
-            with open(path, 'rb') as f:
-                video_data = f.read()
-            
-            print(f"[CatSee] 视频加载成功: {path.name}, 大小: {len(video_data)} bytes, 类型: {content_type}")
-            return web.Response(
-                body=video_data,
-                content_type=content_type,
-                headers={
-                    'Accept-Ranges': 'bytes',
-                    'Content-Length': str(len(video_data)),
-                    'Cache-Control': 'public, max-age=3600'
-                }
+            # 流式发送（sendfile零拷贝），支持单/多区间、后缀区间、If-Range和416
+            response = await send_file(
+                request, path, content_type,
+                headers={'Cache-Control': 'public, max-age=3600'},
+                kind='video'
             )
+            if response.status == 404:
+                print(f"[CatSee] 视频不存在: {path}")
+            return response
             
+        except QueueFullError as e:
+            return self._busy_response(e, as_json=False)
         except Exception as e:
             print(f"[CatSee] Error loading video: {e}")
             return web.Response(status=500, text=str(e))
     
     async def get_metadata(self, request):
-        """获取文件的详细元数据"""
+        """获取文件的详细元数据
+        
+        参数：
+            tier: summary（默认，不含完整prompt/workflow图和EXIF，resources 列出
+                  可单独获取的子资源）或 full（全部字段）
+            fields: 逗号分隔的字段名，只返回这些字段（可以包含大字段）
+            thumbnail: 1 时顺带生成缩略图
+        """
         try:
             file_path = request.query.get('path', '')
             if not file_path:
                 response_text = json.dumps({'success': False, 'error': '缺少路径参数'})
                 return web.Response(text=response_text, content_type='application/json', status=400)
             
+            tier = request.query.get('tier', 'summary')
+            if tier not in ('summary', 'full'):
+                return web.json_response({'success': False, 'error': f'不支持的tier: {tier}'}, status=400)
+            fields = [field.strip() for field in request.query.get('fields', '').split(',') if field.strip()]
+            
             print(f"[CatSee] 元数据请求: {file_path}")
             
-            metadata = file_manager.get_file_metadata(file_path)
+            # 默认只读元数据；thumbnail=1 时顺带生成缩略图（旧行为）
+            metadata_only = request.query.get('thumbnail', '0') != '1'
+            metadata = await task_executor.run(
+                'metadata', file_manager.get_file_metadata, file_path, metadata_only
+            )
             
             if metadata is None:
                 response_text = json.dumps({'success': False, 'error': '文件不存在或无法读取'})
@@ -326,34 +807,12 @@ class BrowserServer:
             print(f"[CatSee] 元数据获取成功: {metadata.get('name', 'unknown')}")
             print(f"[CatSee] 元数据字段: {list(metadata.keys())}")
             
-            # 尝试序列化
-            try:
-                response_data = {'success': True, 'data': metadata}
-                response_text = json.dumps(response_data, ensure_ascii=False)
-                print(f"[CatSee] JSON序列化成功，长度: {len(response_text)}")
-                return web.Response(text=response_text, content_type='application/json', charset='utf-8')
-            except (TypeError, ValueError) as e:
-                print(f"[CatSee] JSON序列化失败: {e}")
-                print(f"[CatSee] 问题字段检查...")
-                
-                # 逐字段检查
-                safe_metadata = {}
-                for key, value in metadata.items():
-                    try:
-                        json.dumps(value)
-                        safe_metadata[key] = value
-                        print(f"[CatSee]   ✓ {key}")
-                    except (TypeError, ValueError) as field_error:
-                        print(f"[CatSee]   ✗ {key}: {field_error}")
-                        try:
-                            safe_metadata[key] = str(value)[:1000]  # 限制长度
-                        except:
-                            pass
-                
-                response_data = {'success': True, 'data': safe_metadata}
-                response_text = json.dumps(response_data, ensure_ascii=False)
-                return web.Response(text=response_text, content_type='application/json', charset='utf-8')
+            metadata = self._select_metadata(metadata, tier, fields)
+            response_body = await task_executor.run('metadata', json_codec.dumps, {'success': True, 'data': metadata})
+            return await response_compressor.respond(request, response_body, kind='metadata')
             
+        except QueueFullError as e:
+            return self._busy_response(e)
         except Exception as e:
             print(f"[CatSee] Error getting metadata: {e}")
             import traceback
@@ -361,6 +820,57 @@ class BrowserServer:
             error_response = json.dumps({'success': False, 'error': str(e)})
             return web.Response(text=error_response, content_type='application/json', status=500)
 
+    @staticmethod
+    def _select_metadata(metadata, tier='summary', fields=None):
+        """按层级或字段列表裁剪元数据（返回新字典，不修改缓存中的对象）"""
+        if fields:
+            return {field: metadata[field] for field in fields if field in metadata}
+        if tier == 'full':
+            return metadata
+        heavy = METADATA_RESOURCES.values()
+        summary = {key: value for key, value in metadata.items() if key not in heavy}
+        summary['resources'] = [name for name, key in METADATA_RESOURCES.items() if key in metadata]
+        return summary
+    
+    async def get_metadata_resource(self, request):
+        """获取元数据子资源：/browser/api/metadata/{prompt|workflow|exif}?path=
+        
+        prompt 为API格式的生成图，workflow 为可导入ComfyUI的工作流，exif 为EXIF字段
+        """
+        try:
+            resource = request.match_info.get('resource', '')
+            key = METADATA_RESOURCES.get(resource)
+            if key is None:
+                return web.json_response({'success': False, 'error': f'未知的元数据资源: {resource}'}, status=404)
+            file_path = request.query.get('path', '')
+            if not file_path:
+                return web.json_response({'success': False, 'error': '缺少路径参数'}, status=400)
+            
+            # 内容由文件指纹决定，压缩好的响应体按指纹缓存
+            fingerprint = await task_executor.run('io', file_manager.get_file_fingerprint, file_path)
+            cache_key = f"{fingerprint}-{resource}" if fingerprint else None
+            if cache_key:
+                cached = response_compressor.cached_response(request, cache_key)
+                if cached is not None:
+                    return cached
+            
+            metadata = await task_executor.run('metadata', file_manager.get_file_metadata, file_path, True)
+            if metadata is None:
+                return web.json_response({'success': False, 'error': '文件不存在或无法读取'}, status=404)
+            if key not in metadata:
+                return web.json_response({'success': False, 'error': f'该文件没有{resource}元数据'}, status=404)
+            
+            response_body = await task_executor.run('metadata', json_codec.dumps, {'success': True, 'data': metadata[key]})
+            # 以实际读取到的版本为准（文件可能在两次stat之间被修改）
+            cache_key = f"{metadata['hash']}-{resource}" if metadata.get('hash') else None
+            return await response_compressor.respond(request, response_body, cache_key=cache_key, kind='metadata')
+            
+        except QueueFullError as e:
+            return self._busy_response(e)
+        except Exception as e:
+            print(f"[CatSee] Error getting metadata resource: {e}")
+            return web.json_response({'success': False, 'error': str(e)}, status=500)
+
 # 全局服务器实例
 browser_server = BrowserServer()
 
@@ -372,6 +882,10 @@ def add_routes(routes):
         async def browse_directory(request):
             return await browser_server.browse_directory(request)
         
+        @routes.get('/browser/api/browse/stream')
+        async def browse_stream(request):
+            return await browser_server.browse_stream(request)
+        
         @routes.get('/browser/api/drives')
         async def get_drives(request):
             return await browser_server.get_drives(request)
@@ -384,6 +898,26 @@ def add_routes(routes):
         async def get_thumbnail(request):
             return await browser_server.get_thumbnail(request)
         
+        @routes.post('/browser/api/thumbnails')
+        async def get_thumbnails_batch(request):
+            return await browser_server.get_thumbnails_batch(request)
+        
+        @routes.get('/browser/api/atlas')
+        async def get_atlas(request):
+            return await browser_server.get_atlas(request)
+        
+        @routes.get('/browser/api/atlas/image')
+        async def get_atlas_image(request):
+            return await browser_server.get_atlas_image(request)
+        
+        @routes.get('/browser/api/prewarm')
+        async def get_prewarm_status(request):
+            return await browser_server.get_prewarm_status(request)
+        
+        @routes.post('/browser/api/prewarm/cancel')
+        async def cancel_prewarm(request):
+            return await browser_server.cancel_prewarm(request)
+        
         @routes.get('/browser/api/image')
         async def get_image(request):
             return await browser_server.get_image(request)
@@ -396,6 +930,46 @@ def add_routes(routes):
         async def get_metadata(request):
             return await browser_server.get_metadata(request)
         
+        @routes.get('/browser/api/metadata/{resource}')
+        async def get_metadata_resource(request):
+            return await browser_server.get_metadata_resource(request)
+        
+        @routes.get('/browser/api/search')
+        async def search_files(request):
+            return await browser_server.search_files(request)
+        
+        @routes.get('/browser/api/prompt-search')
+        async def search_prompts(request):
+            return await browser_server.search_prompts(request)
+        
+        @routes.post('/browser/api/reindex')
+        async def reindex(request):
+            return await browser_server.reindex(request)
+        
+        @routes.get('/browser/api/index')
+        async def get_index_status(request):
+            return await browser_server.get_index_status(request)
+        
+        @routes.get('/browser/api/cache-stats')
+        async def get_cache_stats(request):
+            return await browser_server.get_cache_stats(request)
+        
+        @routes.get('/browser/api/duplicates')
+        async def get_duplicates(request):
+            return await browser_server.get_duplicates(request)
+        
+        @routes.get('/browser/api/similar')
+        async def get_similar(request):
+            return await browser_server.get_similar(request)
+        
+        @routes.get('/browser/api/near-duplicates')
+        async def get_near_duplicates(request):
+            return await browser_server.get_near_duplicates(request)
+        
+        @routes.get('/browser/api/ws')
+        async def live_updates_ws(request):
+            return await browser_server.live_updates_socket(request)
+        
         print("[CatSee浏览器] API路由注册成功")
         
     except Exception as e:
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite存储基类 - 元数据索引、内容哈希、图片感知哈希共用的数据库连接管理
+"""
+import sqlite3
+import threading
+from pathlib import Path
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+
+class SQLiteStore:
+    """保存在临时目录中的SQLite数据库
+
+    首次使用时打开（WAL模式，synchronous=NORMAL），一个连接跨线程共享，
+    子类访问连接时用 self._lock 串行化。子类设置 DB_FILE（db_path 未指定时
+    使用的文件名），需要迁移等额外步骤时覆盖 _setup。
+    """
+
+    DB_FILE = None
+
+    def __init__(self, db_path=None, schema=""):
+        self._db_path = Path(db_path) if db_path else None
+        self._schema = schema
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def db_path(self):
+        if self._db_path is None:
+            self._db_path = config.get_temp_dir() / self.DB_FILE
+        return self._db_path
+
+    def _connect(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    self._setup(conn)
+                    conn.commit()
+                    self._conn = conn
+        return self._conn
+
+    def _setup(self, conn):
+        """建表（新打开的连接，提交前调用）"""
+        conn.executescript(self._schema)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
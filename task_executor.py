@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+任务执行模块 - 把阻塞的文件I/O和图片解码移出aiohttp事件循环
+"""
+import pickle
+import asyncio
+import atexit
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+
+def _pickles(obj):
+    """obj 能否pickle（不能时 pickle 可能抛出 PicklingError、TypeError 或 AttributeError）"""
+    try:
+        pickle.dumps(obj)
+        return True
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return False
+
+
+class QueueFullError(Exception):
+    """某类任务排队数超过上限"""
+
+    def __init__(self, kind):
+        super().__init__(f"Too many pending '{kind}' tasks")
+        self.kind = kind
+
+
+class TaskExecutor:
+    """分类型的有界任务执行器
+
+    每个请求处理函数只在事件循环上解析参数和写响应，实际工作通过
+    run(kind, func, ...) 派发到线程池（I/O）或解码池（图片解码/缩放）。
+    每种任务有独立的并发上限，排队（含执行中）数量超过 max_queue 时
+    抛出 QueueFullError，由调用方返回503。
+
+    解码池默认也是线程池（Pillow在解码/缩放时会释放GIL）。开启
+    use_process_pool 后改用进程池，此时派发到 decode 类任务的函数应是
+    可pickle的模块级函数：派发前检查函数（每个函数只检查一次）和参数能否
+    pickle，不能时这次调用在解码线程池中执行；进程池不可用或损坏时整体
+    退回线程池。
+    """
+
+    DEFAULTS = {
+        "io_workers": 8,
+        "decode_workers": 2,
+        "use_process_pool": False,
+        "max_queue": 256,
+        "limits": {
+            "browse": 2,
+            "metadata": 4,
+            "thumbnail": 4,
+            "image": 8,
+            "video": 8,
+            "atlas": 2,
+            "prewarm": 1,
+            "search": 4,
+            "index": 1,
+            "hash": 1,
+            "phash": 1,
+            "io": 8
+        }
+    }
+
+    # 这些类型的任务进入解码池，其余进入I/O线程池
+    DECODE_KINDS = {"thumbnail", "prewarm", "phash"}
+
+    def __init__(self, options=None):
+        opts = config.section("executor", self.DEFAULTS, options)
+        limits = dict(self.DEFAULTS["limits"])
+        limits.update(opts.get("limits") or {})
+
+        self.io_workers = max(1, int(opts["io_workers"]))
+        self.decode_workers = max(1, int(opts["decode_workers"]))
+        self.use_process_pool = bool(opts["use_process_pool"])
+        self.max_queue = max(1, int(opts["max_queue"]))
+        self.limits = {kind: max(1, int(n)) for kind, n in limits.items()}
+
+        self._lock = threading.Lock()
+        self._io_pool = None
+        self._decode_pool = None
+        self._decode_threads = None
+        self._picklable = {}  # 函数 -> 能否pickle
+        self._semaphores = {}
+        self._pending = {}
+        self.rejected = 0
+
+    def _get_io_pool(self):
+        if self._io_pool is None:
+            with self._lock:
+                if self._io_pool is None:
+                    self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="catsee-io")
+        return self._io_pool
+
+    def _get_decode_threads(self):
+        if self._decode_threads is None:
+            with self._lock:
+                if self._decode_threads is None:
+                    self._decode_threads = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="catsee-decode")
+        return self._decode_threads
+
+    def _get_decode_pool(self):
+        if self.use_process_pool and self._decode_pool is None:
+            with self._lock:
+                if self.use_process_pool and self._decode_pool is None:
+                    try:
+                        self._decode_pool = ProcessPoolExecutor(max_workers=self.decode_workers)
+                    except Exception as e:
+                        print(f"[Catsee] Process pool unavailable, using threads: {e}")
+                        self.use_process_pool = False
+        pool = self._decode_pool
+        return pool if pool is not None else self._get_decode_threads()
+
+    def _can_pickle(self, func, args, kwargs):
+        """这次调用能否发送到进程池：函数的检查结果按函数缓存，参数每次检查"""
+        picklable = self._picklable.get(func)
+        if picklable is None:
+            picklable = self._picklable[func] = _pickles(func)
+            if not picklable:
+                name = getattr(func, "__qualname__", repr(func))
+                print(f"[Catsee] {name} cannot be pickled, running it in the decode threads")
+        return picklable and _pickles((args, kwargs))
+
+    def _fallback_to_threads(self, error):
+        """进程池损坏时整体退回线程池"""
+        print(f"[Catsee] Process pool failed, falling back to threads: {error}")
+        with self._lock:
+            pool = self._decode_pool
+            self._decode_pool = None
+            self.use_process_pool = False
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _get_semaphore(self, kind):
+        semaphore = self._semaphores.get(kind)
+        if semaphore is None:
+            limit = self.limits.get(kind, self.limits.get("io", self.io_workers))
+            semaphore = self._semaphores[kind] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def run(self, kind, func, *args, **kwargs):
+        """在对应的池中执行 func(*args, **kwargs) 并等待结果
+
+        Args:
+            kind: 任务类型（browse/metadata/thumbnail/image/video/io...）
+
+        Raises:
+            QueueFullError: 该类型排队任务已达上限
+        """
+        pending = self._pending.get(kind, 0)
+        if pending >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(kind)
+        self._pending[kind] = pending + 1
+        try:
+            async with self._get_semaphore(kind):
+                loop = asyncio.get_running_loop()
+                call = functools.partial(func, *args, **kwargs)
+                if kind not in self.DECODE_KINDS:
+                    return await loop.run_in_executor(self._get_io_pool(), call)
+                if self.use_process_pool and self._can_pickle(func, args, kwargs):
+                    try:
+                        return await loop.run_in_executor(self._get_decode_pool(), call)
+                    except (BrokenProcessPool, pickle.PicklingError) as e:
+                        self._fallback_to_threads(e)
+                return await loop.run_in_executor(self._get_decode_threads(), call)
+        finally:
+            self._pending[kind] -= 1
+
+    def pending(self, kind):
+        """某类型排队（含执行中）的任务数"""
+        return self._pending.get(kind, 0)
+
+    def stats(self):
+        """各类型排队/执行中的任务数"""
+        return {
+            "pending": {kind: n for kind, n in self._pending.items() if n},
+            "limits": dict(self.limits),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "process_pool": self.use_process_pool
+        }
+
+    def shutdown(self):
+        """关闭所有池"""
+        for pool in (self._io_pool, self._decode_pool, self._decode_threads):
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+
+# 全局执行器实例
+task_executor = TaskExecutor()
+atexit.register(task_executor.shutdown)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+测试环境：插件目录加入 sys.path，配置文件指向临时目录
+
+仓库根目录本身是ComfyUI插件包，pytest 收集测试时会导入根 __init__.py
+（注册路由、启动文件监视器、建立元数据索引）。这里在任何插件模块导入之前
+通过 CATSEE_CONFIG 换成只包含临时目录的配置并关闭文件监视器，测试不会
+读写工作区或配置文件中的输出目录。
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PLUGIN_DIR))
+
+_session_dir = Path(tempfile.mkdtemp(prefix="catsee-test-"))
+_session_config = _session_dir / "config.json"
+_session_config.write_text(json.dumps({
+    "outputs": str(_session_dir / "outputs"),
+    "collections": str(_session_dir / "collections"),
+    "temp": str(_session_dir / "temp"),
+    "watcher": {"enabled": False}
+}), encoding="utf-8")
+os.environ["CATSEE_CONFIG"] = str(_session_config)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_session_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def catsee_dirs(tmp_path, monkeypatch):
+    """把 config 的输出目录和临时目录指向本测试的 tmp_path"""
+    from config import config
+    dirs = {"outputs": tmp_path / "outputs", "temp": tmp_path / "temp"}
+    for key, path in dirs.items():
+        path.mkdir()
+        monkeypatch.setitem(config.config, key, str(path))
+    return dirs
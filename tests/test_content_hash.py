@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+查重流程：按大小分组 -> 头尾部分哈希 -> 完整哈希，只报告内容完全相同的文件
+"""
+import os
+
+import pytest
+
+import content_hash
+from content_hash import ContentHasher
+
+PARTIAL = 1024
+TYPE_MAP = {".png": "image"}
+
+
+def block(seed, size):
+    return bytes((seed + i * 7) % 256 for i in range(size))
+
+
+def with_middle(head_tail, middle_seed, size=8192):
+    """头尾各 PARTIAL 字节相同、中间不同的内容"""
+    data = bytearray(block(head_tail, size))
+    data[PARTIAL:size - PARTIAL] = block(middle_seed, size - 2 * PARTIAL)
+    return bytes(data)
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "outputs"
+    (root / "batch").mkdir(parents=True)
+    files = {
+        # 大小唯一：不读取
+        "unique.png": block(1, 5000),
+        # 大小相同、头尾不同：部分哈希就能区分
+        "size_a.png": block(2, 3000),
+        "size_b.png": block(3, 3000),
+        # 头尾相同、中间不同：需要完整哈希
+        "middle_a.png": with_middle(4, 5),
+        "middle_b.png": with_middle(4, 6),
+        # 真正的重复（其中一个在子目录）
+        "dup_a.png": block(7, 10000),
+        "dup_b.png": block(7, 10000),
+        "batch/dup_c.png": block(7, 10000),
+        # 不超过两倍部分大小：部分哈希就是完整哈希
+        "small_a.png": block(8, 100),
+        "small_b.png": block(8, 100),
+        # 遍历时相同，部分哈希之后被修改
+        "changed_a.png": block(9, 9000),
+        "changed_b.png": block(9, 9000),
+        # 扩展名不在查重范围内
+        "dup_a.txt": block(7, 10000),
+    }
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+    return root
+
+
+@pytest.fixture
+def hasher(tmp_path):
+    instance = ContentHasher(db_path=tmp_path / "hashes.sqlite3",
+                             options={"partial_kb": PARTIAL // 1024, "chunk_kb": 4, "workers": 2})
+    yield instance
+    instance.close()
+
+
+def modify_after_partial(monkeypatch, name):
+    """部分哈希阶段算完 name 之后修改它的中间部分（大小不变）"""
+    real = content_hash.partial_hash
+
+    def partial_then_modify(path, size, *args):
+        result = real(path, size, *args)
+        if os.path.basename(path) == name:
+            with open(path, "r+b") as f:
+                f.seek(size // 2)
+                f.write(b"edited")
+        return result
+
+    monkeypatch.setattr(content_hash, "partial_hash", partial_then_modify)
+
+
+def groups_of(result):
+    return sorted(sorted(f["name"] for f in group["files"]) for group in result["groups"])
+
+
+def test_only_true_duplicates_are_reported(library, hasher, monkeypatch):
+    modify_after_partial(monkeypatch, "changed_b.png")
+    result = hasher.find_duplicates([library], TYPE_MAP)
+
+    assert groups_of(result) == [["dup_a.png", "dup_b.png", "dup_c.png"], ["small_a.png", "small_b.png"]]
+    stats = result["stats"]
+    assert stats["files"] == 12
+    # unique.png 大小唯一，不参与后两步
+    assert stats["candidates"] == 11
+    assert stats["partial_hashed"] == 11
+    # 部分哈希相同且不完整的才读完整文件：middle、dup、changed
+    assert stats["full_hashed"] == 7
+    # 部分哈希读头尾（small 读整个文件），完整哈希读整个文件；unique.png 一个字节都不读
+    assert stats["bytes_read"] == 9 * 2 * PARTIAL + 2 * 100 + 2 * 8192 + 3 * 10000 + 2 * 9000
+
+    big = next(group for group in result["groups"] if group["count"] == 3)
+    assert big["size"] == 10000 and big["wasted"] == 20000
+    assert result["groups"][0] is big
+
+
+def test_rescan_reuses_saved_hashes(library, hasher):
+    first = hasher.find_duplicates([library], TYPE_MAP)
+    second = hasher.find_duplicates([library], TYPE_MAP)
+    assert groups_of(second) == groups_of(first)
+    assert second["stats"]["cached"] == second["stats"]["candidates"]
+    assert second["stats"]["bytes_read"] == 0
+
+    # 修改后指纹变化：旧记录被清理，只有这一个文件重新计算部分哈希
+    (library / "dup_b.png").write_bytes(block(70, 10000))
+    third = hasher.find_duplicates([library], TYPE_MAP)
+    assert groups_of(third) == [["changed_a.png", "changed_b.png"], ["dup_a.png", "dup_c.png"], ["small_a.png", "small_b.png"]]
+    assert third["stats"]["pruned"] == 1
+    assert third["stats"]["partial_hashed"] == 1
+    assert third["stats"]["full_hashed"] == 0
+
+
+def test_deleted_between_stages_is_skipped(library, hasher, monkeypatch):
+    real = content_hash.partial_hash
+
+    def partial_then_delete(path, size, *args):
+        result = real(path, size, *args)
+        if os.path.basename(path) == "dup_b.png":
+            os.remove(path)
+        return result
+
+    monkeypatch.setattr(content_hash, "partial_hash", partial_then_delete)
+    result = hasher.find_duplicates([library], TYPE_MAP)
+    assert ["dup_a.png", "dup_c.png"] in groups_of(result)
+    assert all("dup_b.png" not in names for names in groups_of(result))
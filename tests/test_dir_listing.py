@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+目录列表的游标分页：各排序字段的升降序（含相同排序值）、翻页中途插入文件、无效游标
+"""
+import os
+import json
+import base64
+import asyncio
+
+import pytest
+
+from dir_listing import SORT_KEYS, encode_cursor, decode_cursor
+from file_manager import file_manager
+
+# (文件名, 字节数, mtime)：名称只差大小写、mtime/大小/类型都有相同值
+FILES = [
+    ("b.png", 10, 1000), ("B.png", 10, 1000), ("a.png", 0, 2000), ("A.mp4", 20, 1000),
+    ("c.json", 10, 3000), ("d.png", 20, 2000), ("e.mp4", 0, 3000), ("f.png", 10, 1000),
+    ("g.json", 0, 2000), ("h.png", 20, 3000), ("i.png", 10, 2000), ("j.mp4", 10, 1000)
+]
+FOLDERS = ["zeta", "Alpha"]
+TYPES = {".png": "image", ".mp4": "video", ".json": "workflow"}
+
+
+def write(directory, name, size, mtime):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def gallery(catsee_dirs):
+    directory = catsee_dirs["outputs"] / "gallery"
+    directory.mkdir()
+    for name, size, mtime in FILES:
+        write(directory, name, size, mtime)
+    for name in FOLDERS:
+        (directory / name).mkdir()
+    return directory
+
+
+def expected(directory, sort, order):
+    """独立计算的显示顺序：文件夹在前，同值按 (小写名, 原名) 区分"""
+    def key(entry):
+        st = entry.stat()
+        name = (entry.name.lower(), entry.name)
+        ext = os.path.splitext(entry.name)[1]
+        if entry.is_dir():
+            return {"name": name, "mtime": (st.st_mtime, *name), "size": (0, *name),
+                    "type": ("folder", "", *name)}[sort]
+        return {"name": name, "mtime": (st.st_mtime, *name), "size": (st.st_size, *name),
+                "type": (TYPES[ext], ext, *name)}[sort]
+
+    entries = list(os.scandir(directory))
+    result = []
+    for folder in (True, False):
+        group = sorted((e for e in entries if e.is_dir() == folder), key=key, reverse=order == "desc")
+        result.extend(e.name for e in group)
+    return result
+
+
+def page_through(directory, sort, order, per_page=3, cursor=None):
+    names = []
+    while True:
+        result = file_manager.browse_directory(directory, per_page=per_page, sort=sort, order=order, cursor=cursor)
+        assert "error" not in result
+        names.extend(item["name"] for item in result["items"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", sorted(SORT_KEYS))
+def test_cursor_pages_cover_listing_once(gallery, sort, order):
+    names = page_through(gallery, sort, order)
+    assert names == expected(gallery, sort, order)
+    # 每页大小不同也得到相同顺序
+    assert page_through(gallery, sort, order, per_page=5) == names
+
+
+def test_next_page_is_stable_after_insert(gallery):
+    first = file_manager.browse_directory(gallery, per_page=6, sort="mtime", order="desc")
+    seen = [item["name"] for item in first["items"]]
+    last = seen[-1]
+
+    # 一个排在游标之前（更新），一个排在之后（更旧），一个与游标条目mtime相同
+    write(gallery, "new.png", 1, 5000)
+    write(gallery, "old.png", 1, 10)
+    tie = first["items"][-1]["modified_time"]
+    write(gallery, "0_tie.png", 1, tie)
+
+    rest = page_through(gallery, "mtime", "desc", cursor=first["next_cursor"])
+    full = expected(gallery, "mtime", "desc")
+    assert rest == full[full.index(last) + 1:]
+    assert not set(rest) & set(seen)
+    assert "new.png" not in rest and "old.png" in rest
+
+
+def test_cursor_after_removed_item(gallery):
+    first = file_manager.browse_directory(gallery, per_page=4, sort="name", order="asc")
+    # 删除游标指向的条目，下一页仍从它原来的位置之后开始
+    (gallery / first["items"][-1]["name"]).unlink()
+    rest = page_through(gallery, "name", "asc", cursor=first["next_cursor"])
+    assert rest == expected(gallery, "name", "asc")[3:]
+
+
+def raw_cursor(payload):
+    data = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+INVALID_CURSORS = [
+    "!!!",
+    "not-a-cursor",
+    raw_cursor({"sort": "name"}),
+    raw_cursor([1, "name", "asc", None, 1]),
+    raw_cursor([2, "name", "asc", None, 1, "a.png"]),
+    raw_cursor([1, "random", "asc", None, 1, "a.png"]),
+    raw_cursor([1, ["name"], "asc", None, 1, "a.png"]),
+    raw_cursor([1, "name", "sideways", None, 1, "a.png"]),
+    raw_cursor([1, "name", "asc", None, 5, "a.png"]),
+    raw_cursor([1, "name", "asc", ["image"], 1, "a.png"]),
+    # 排序键与排序字段不匹配（二分查找时会比较不同类型）
+    raw_cursor([1, "name", "asc", None, 1, [1000, "a.png"]]),
+    raw_cursor([1, "mtime", "desc", None, 1, "a.png"]),
+    raw_cursor([1, "mtime", "desc", None, 1, ["1000", "a.png"]]),
+    raw_cursor([1, "size", "desc", None, 1, [10]]),
+    raw_cursor([1, "type", "asc", None, 1, ["image", ".png", 3]]),
+]
+
+
+@pytest.mark.parametrize("cursor", INVALID_CURSORS)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_round_trip():
+    item = {"name": "a.png", "is_folder": False, "modified_time": 1000.5, "size": 3, "type": "image", "extension": ".png"}
+    for sort in SORT_KEYS:
+        position = decode_cursor(encode_cursor(sort, "desc", "image", item))
+        assert position == {"sort": sort, "order": "desc", "file_type": "image", "position": (1, SORT_KEYS[sort](item))}
+
+
+def test_invalid_cursor_returns_400(gallery):
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+    from server import browser_server
+
+    async def run():
+        app = web.Application()
+        browser_server.setup_routes(app)
+        async with TestClient(TestServer(app)) as client:
+            statuses = []
+            for cursor in INVALID_CURSORS:
+                resp = await client.get("/browser/api/browse", params={"path": str(gallery), "cursor": cursor, "prewarm": "0"})
+                body = await resp.json()
+                statuses.append((resp.status, body["success"]))
+            return statuses
+
+    assert asyncio.run(run()) == [(400, False)] * len(INVALID_CURSORS)
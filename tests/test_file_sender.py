@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+文件发送：Range请求头解析、单区间/多区间响应、416、If-Range、304条件请求
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from file_sender import MAX_RANGES, RangeNotSatisfiable, parse_range_header, send_file
+
+SIZE = 1000
+DATA = bytes(i % 251 for i in range(SIZE))
+
+
+def test_suffix_range():
+    assert parse_range_header("bytes=-500", SIZE) == [(500, 999)]
+    # 后缀长于文件时返回整个文件
+    assert parse_range_header("bytes=-5000", SIZE) == [(0, 999)]
+
+
+def test_open_ended_range():
+    assert parse_range_header("bytes=500-", SIZE) == [(500, 999)]
+    # 终点超出文件时截断到最后一个字节
+    assert parse_range_header("bytes=900-5000", SIZE) == [(900, 999)]
+
+
+def test_overlapping_and_adjacent_ranges_are_merged():
+    assert parse_range_header("bytes=0-99,50-149", SIZE) == [(0, 149)]
+    assert parse_range_header("bytes=200-299,0-99,100-149", SIZE) == [(0, 149), (200, 299)]
+    assert parse_range_header("bytes=0-9,-10,990-", SIZE) == [(0, 9), (990, 999)]
+
+
+def test_invalid_syntax_is_ignored():
+    for header in ("items=0-1", "bytes=", "bytes=a-b", "bytes=5-1", "bytes=-", "bytes=1"):
+        assert parse_range_header(header, SIZE) is None
+
+
+def test_too_many_ranges_are_ignored():
+    spec = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES))
+    assert len(parse_range_header(f"bytes={spec}", SIZE)) == MAX_RANGES
+    assert parse_range_header(f"bytes={spec},900-901", SIZE) is None
+
+
+def test_unsatisfiable_range():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=1000-", SIZE)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=-0", SIZE)
+    # 只要有一个区间可满足就不是416
+    assert parse_range_header("bytes=2000-,10-19", SIZE) == [(10, 19)]
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    return path
+
+
+def fetch(path, headers=None, method="GET"):
+    """用send_file发送文件，返回 (状态码, 响应头, 响应体)"""
+    async def handler(request):
+        return await send_file(request, str(path), "video/mp4")
+
+    async def run():
+        app = web.Application()
+        app.router.add_route("*", "/file", handler)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.request(method, "/file", headers=headers or {})
+            return resp.status, resp.headers, await resp.read()
+
+    return asyncio.run(run())
+
+
+def test_full_response(sample):
+    status, headers, body = fetch(sample)
+    assert status == 200
+    assert body == DATA
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["ETag"]
+
+
+def test_single_range_response(sample):
+    status, headers, body = fetch(sample, {"Range": "bytes=-500"})
+    assert status == 206
+    assert headers["Content-Range"] == "bytes 500-999/1000"
+    assert body == DATA[500:]
+
+
+def test_unsatisfiable_range_returns_416(sample):
+    status, headers, body = fetch(sample, {"Range": "bytes=5000-6000"})
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */1000"
+    assert body == b""
+
+
+def test_if_range_mismatch_returns_full_file(sample):
+    status, headers, body = fetch(sample, {"Range": "bytes=0-9", "If-Range": '"stale-etag"'})
+    assert status == 200
+    assert body == DATA
+
+    etag = fetch(sample)[1]["ETag"]
+    status, _, body = fetch(sample, {"Range": "bytes=0-9", "If-Range": etag})
+    assert status == 206
+    assert body == DATA[:10]
+
+
+def test_multipart_byteranges(sample):
+    status, headers, body = fetch(sample, {"Range": "bytes=0-9,100-109,-5"})
+    assert status == 206
+    content_type, _, boundary = headers["Content-Type"].partition("; boundary=")
+    assert content_type == "multipart/byteranges"
+    assert int(headers["Content-Length"]) == len(body)
+
+    parts = body.split(f"--{boundary}".encode())
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    expected = [(0, 9), (100, 109), (995, 999)]
+    assert len(parts[1:-1]) == len(expected)
+    for part, (start, end) in zip(parts[1:-1], expected):
+        head, _, payload = part.partition(b"\r\n\r\n")
+        assert f"Content-Range: bytes {start}-{end}/1000".encode() in head
+        assert b"Content-Type: video/mp4" in head
+        assert payload == DATA[start:end + 1] + b"\r\n"
+
+
+def test_if_none_match_returns_304(sample):
+    etag = fetch(sample)[1]["ETag"]
+    status, headers, body = fetch(sample, {"If-None-Match": f'"other", W/{etag}'})
+    assert status == 304
+    assert headers["ETag"] == etag
+    assert body == b""
+    assert fetch(sample, {"If-None-Match": '"other"'})[0] == 200
+
+
+def test_if_modified_since_returns_304(sample):
+    last_modified = fetch(sample)[1]["Last-Modified"]
+    status, _, body = fetch(sample, {"If-Modified-Since": last_modified})
+    assert status == 304
+    assert body == b""
+    assert fetch(sample, {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"})[0] == 200
+    # If-None-Match 存在时忽略 If-Modified-Since
+    assert fetch(sample, {"If-None-Match": '"other"', "If-Modified-Since": last_modified})[0] == 200
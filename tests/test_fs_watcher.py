@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+文件监视：事件合并的批次时机、轮询后端按inode识别重命名、删除后重建的合并、
+变化直接应用到目录列表缓存
+"""
+import os
+import time
+import threading
+
+from fs_watcher import (ChangeCoalescer, PollingBackend, FileEvent, apply_changes,
+                        ADDED, MODIFIED, DELETED, MOVED)
+
+
+class Recorder:
+    """记录 flush 回调收到的批次和时间"""
+
+    def __init__(self):
+        self.batches = []
+        self.times = []
+        self.event = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.times.append(time.monotonic())
+        self.event.set()
+
+
+def event(kind, path, src_path=None):
+    return FileEvent(kind, path, False, src_path)
+
+
+def test_burst_is_flushed_as_one_batch():
+    recorder = Recorder()
+    coalescer = ChangeCoalescer(recorder, debounce=0.2, max_delay=2.0)
+    coalescer.start()
+    try:
+        started = time.monotonic()
+        for i in range(500):
+            coalescer.add(event(ADDED, f"/out/ComfyUI_{i:05d}_.png"))
+        assert recorder.event.wait(5)
+        time.sleep(0.5)
+    finally:
+        coalescer.stop()
+
+    assert len(recorder.batches) == 1
+    assert len(recorder.batches[0]) == 500
+    assert coalescer.events == 500 and coalescer.batches == 1
+    elapsed = recorder.times[0] - started
+    assert 0.2 <= elapsed < 2.0
+
+
+def test_max_delay_bounds_a_steady_stream():
+    recorder = Recorder()
+    coalescer = ChangeCoalescer(recorder, debounce=0.3, max_delay=0.5)
+    coalescer.start()
+    try:
+        started = time.monotonic()
+        # 事件间隔小于 debounce，只有 max_delay 能触发
+        i = 0
+        while not recorder.event.is_set() and time.monotonic() - started < 3:
+            coalescer.add(event(ADDED, f"/out/{i}.png"))
+            i += 1
+            time.sleep(0.05)
+    finally:
+        coalescer.stop()
+
+    assert recorder.batches
+    assert 0.5 <= recorder.times[0] - started < 1.5
+
+
+def merged(*events):
+    """同一窗口内的事件合并后的结果"""
+    batches = []
+    coalescer = ChangeCoalescer(batches.append)
+    for e in events:
+        coalescer.add(e)
+    return list(coalescer._pending.values())
+
+
+def test_delete_then_readd_is_a_modification():
+    assert merged(event(DELETED, "/out/a.png"), event(ADDED, "/out/a.png")) == [event(MODIFIED, "/out/a.png")]
+
+
+def test_add_then_delete_cancels_out():
+    assert merged(event(ADDED, "/out/a.png"), event(MODIFIED, "/out/a.png"), event(DELETED, "/out/a.png")) == []
+
+
+def test_add_then_writes_stays_an_add():
+    assert merged(event(ADDED, "/out/a.png"), event(MODIFIED, "/out/a.png")) == [event(ADDED, "/out/a.png")]
+
+
+def test_add_then_rename_is_an_add_of_the_target():
+    assert merged(event(ADDED, "/out/tmp.png"), event(MOVED, "/out/a.png", "/out/tmp.png")) == [event(ADDED, "/out/a.png")]
+
+
+def polling(root):
+    backend = PollingBackend([str(root)], emit=None)
+    backend.prime()
+    return backend
+
+
+def test_rename_is_paired_by_inode(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"png")
+    (tmp_path / "keep.png").write_bytes(b"png")
+    backend = polling(tmp_path)
+
+    os.rename(tmp_path / "a.png", tmp_path / "b.png")
+    assert backend.poll() == [FileEvent(MOVED, str(tmp_path / "b.png"), False, str(tmp_path / "a.png"))]
+    assert backend.poll() == []
+
+
+def test_directory_rename_is_paired(tmp_path):
+    (tmp_path / "run1").mkdir()
+    (tmp_path / "run1" / "a.png").write_bytes(b"png")
+    backend = polling(tmp_path)
+
+    os.rename(tmp_path / "run1", tmp_path / "run2")
+    events = backend.poll()
+    assert FileEvent(MOVED, str(tmp_path / "run2"), True, str(tmp_path / "run1")) in events
+    # 新目录的内容也被跟踪
+    (tmp_path / "run2" / "b.png").write_bytes(b"png")
+    assert backend.poll() == [FileEvent(ADDED, str(tmp_path / "run2" / "b.png"), False, None)]
+
+
+def test_delete_and_different_file_are_not_a_rename(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"png")
+    backend = polling(tmp_path)
+
+    (tmp_path / "a.png").unlink()
+    (tmp_path / "b.png").write_bytes(b"a different size")
+    assert sorted(backend.poll()) == sorted([
+        FileEvent(DELETED, str(tmp_path / "a.png"), False, None),
+        FileEvent(ADDED, str(tmp_path / "b.png"), False, None)
+    ])
+
+
+def test_delete_then_readd_between_polls_is_a_modification(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"png")
+    backend = polling(tmp_path)
+
+    (tmp_path / "a.png").unlink()
+    (tmp_path / "a.png").write_bytes(b"regenerated")
+    assert backend.poll() == [FileEvent(MODIFIED, str(tmp_path / "a.png"), False, None)]
+
+
+def test_changes_are_applied_to_cached_listing(catsee_dirs):
+    from dir_listing import listing_cache
+    from file_manager import file_manager
+
+    directory = catsee_dirs["outputs"] / "batch"
+    directory.mkdir()
+    for name in ("a.png", "b.png", "c.png"):
+        (directory / name).write_bytes(b"png")
+    # 先生成两个排序视图，变化要逐个插入/删除到这两个视图中
+    file_manager.browse_directory(directory, sort="name")
+    file_manager.browse_directory(directory, sort="size", order="desc")
+
+    (directory / "d.png").write_bytes(b"png")
+    (directory / "a.png").unlink()
+    os.rename(directory / "b.png", directory / "e.png")
+    deltas = listing_cache.stats()["deltas"]
+    apply_changes([
+        FileEvent(ADDED, str(directory / "d.png"), False, None),
+        FileEvent(DELETED, str(directory / "a.png"), False, None),
+        FileEvent(MOVED, str(directory / "e.png"), False, str(directory / "b.png")),
+    ])
+    assert listing_cache.stats()["deltas"] == deltas + 1
+
+    stats = listing_cache.stats()
+    by_name = file_manager.browse_directory(directory, sort="name")
+    by_size = file_manager.browse_directory(directory, sort="size", order="desc")
+    after = listing_cache.stats()
+    # 不重新扫描：变化已应用到缓存的列表，之后的浏览直接命中
+    assert after["hits"] == stats["hits"] + 2
+    assert after["misses"] == stats["misses"]
+    assert [item["name"] for item in by_name["items"]] == ["c.png", "d.png", "e.png"]
+    assert [item["name"] for item in by_size["items"]] == ["e.png", "d.png", "c.png"]
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+元数据索引的字段提取：拆分采样节点（guider）的图、普通KSampler图、没有连线的文本；
+首次索引在后台建立
+"""
+import json
+import time
+import threading
+
+import pytest
+
+import metadata_index
+from metadata_index import MetadataIndex, extract_comfy_fields
+
+
+# Flux默认工作流：SamplerCustomAdvanced + KSamplerSelect + BasicGuider + RandomNoise + BasicScheduler
+FLUX_PROMPT = {
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "cyberpunk alley at night", "clip": ["11", 0]}},
+    "8": {"class_type": "VAEDecode", "inputs": {"samples": ["13", 0], "vae": ["10", 0]}},
+    "10": {"class_type": "VAELoader", "inputs": {"vae_name": "ae.safetensors"}},
+    "11": {"class_type": "DualCLIPLoader", "inputs": {"clip_name1": "t5xxl_fp16.safetensors", "clip_name2": "clip_l.safetensors", "type": "flux"}},
+    "12": {"class_type": "UNETLoader", "inputs": {"unet_name": "flux1-dev.safetensors", "weight_dtype": "default"}},
+    "13": {"class_type": "SamplerCustomAdvanced", "inputs": {"noise": ["25", 0], "guider": ["22", 0], "sampler": ["16", 0], "sigmas": ["17", 0], "latent_image": ["27", 0]}},
+    "16": {"class_type": "KSamplerSelect", "inputs": {"sampler_name": "euler"}},
+    "17": {"class_type": "BasicScheduler", "inputs": {"scheduler": "simple", "steps": 20, "denoise": 1.0, "model": ["12", 0]}},
+    "22": {"class_type": "BasicGuider", "inputs": {"model": ["12", 0], "conditioning": ["26", 0]}},
+    "25": {"class_type": "RandomNoise", "inputs": {"noise_seed": 219670278747233}},
+    "26": {"class_type": "FluxGuidance", "inputs": {"guidance": 3.5, "conditioning": ["6", 0]}},
+    "27": {"class_type": "EmptySD3LatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 1}},
+}
+
+SDXL_PROMPT = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 42, "steps": 30, "cfg": 7, "sampler_name": "dpmpp_2m", "scheduler": "karras", "denoise": 1, "model": ["4", 0], "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0]}},
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sd_xl_base_1.0.safetensors"}},
+    "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 1}},
+    # 负向提示词节点排在正向之前，确认按连线而不是按顺序区分
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "blurry, lowres", "clip": ["4", 1]}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a lighthouse in a storm", "clip": ["4", 1]}},
+}
+
+
+def test_guider_graph():
+    fields = extract_comfy_fields(FLUX_PROMPT)
+    assert fields["positive_prompt"] == "cyberpunk alley at night"
+    assert "negative_prompt" not in fields
+    assert fields["checkpoint"] == "flux1-dev.safetensors"
+    assert fields["sampler"] == "euler"
+    assert fields["scheduler"] == "simple"
+    assert fields["steps"] == 20
+    assert fields["seed"] == 219670278747233
+
+
+def test_cfg_guider_graph():
+    prompt = dict(FLUX_PROMPT)
+    prompt["22"] = {"class_type": "CFGGuider", "inputs": {"model": ["12", 0], "positive": ["26", 0], "negative": ["30", 0], "cfg": 4.5}}
+    prompt["30"] = {"class_type": "CLIPTextEncode", "inputs": {"text": "watermark", "clip": ["11", 0]}}
+    fields = extract_comfy_fields(prompt)
+    assert fields["positive_prompt"] == "cyberpunk alley at night"
+    assert fields["negative_prompt"] == "watermark"
+    assert fields["cfg"] == 4.5
+
+
+def test_ksampler_graph():
+    fields = extract_comfy_fields(SDXL_PROMPT)
+    assert fields["positive_prompt"] == "a lighthouse in a storm"
+    assert fields["negative_prompt"] == "blurry, lowres"
+    assert fields["checkpoint"] == "sd_xl_base_1.0.safetensors"
+    assert (fields["seed"], fields["steps"], fields["cfg"]) == (42, 30, 7.0)
+    assert fields["sampler"] == "dpmpp_2m" and fields["scheduler"] == "karras"
+
+
+def test_unlinked_text_is_indexed_as_positive():
+    prompt = {
+        "1": {"class_type": "PrimitiveString", "inputs": {"value": "misty forest, volumetric light"}},
+        "2": {"class_type": "ShowText", "inputs": {"text": "misty forest, volumetric light"}},
+    }
+    fields = extract_comfy_fields(prompt)
+    assert fields["prompts"] == "misty forest, volumetric light"
+    assert fields["positive_prompt"] == fields["prompts"]
+
+
+def test_prompt_search_finds_guider_graph(catsee_dirs):
+    Image = pytest.importorskip("PIL.Image")
+    from PIL.PngImagePlugin import PngInfo
+
+    root = catsee_dirs["outputs"]
+    info = PngInfo()
+    info.add_text("prompt", json.dumps(FLUX_PROMPT))
+    Image.new("RGB", (8, 8)).save(root / "ComfyUI_00001_.png", pnginfo=info)
+
+    # 独立的索引实例，数据库在本测试的临时目录中
+    index = MetadataIndex()
+    try:
+        index.reindex(root, {".png": "image"})
+        assert index.db_path.parent == catsee_dirs["temp"]
+        result = index.search_prompts('"cyberpunk alley"')
+        assert [item["name"] for item in result["items"]] == ["ComfyUI_00001_.png"]
+        assert result["items"][0]["seed"] == 219670278747233
+    finally:
+        index.close()
+
+
+def test_first_build_runs_in_background(catsee_dirs, monkeypatch):
+    root = catsee_dirs["outputs"]
+    for i in range(3):
+        (root / f"workflow_{i}.json").write_text("{}")
+
+    # 遍历在放行之前阻塞，模拟很大的输出目录
+    release = threading.Event()
+    walk = metadata_index.walk_directory
+
+    def slow_walk(*args, **kwargs):
+        assert release.wait(5)
+        yield from walk(*args, **kwargs)
+
+    monkeypatch.setattr(metadata_index, "walk_directory", slow_walk)
+    index = MetadataIndex()
+    try:
+        # 首次查询不等待建立索引：立即返回（空的）部分结果并报告正在索引
+        assert index.ensure_fresh(root) is True
+        assert index.is_indexing(root)
+        assert index.search(root=root) == []
+
+        release.set()
+        for _ in range(100):
+            if not index.is_indexing(root):
+                break
+            time.sleep(0.05)
+        assert index.ensure_fresh(root) is False
+        assert sorted(item["name"] for item in index.search(root=root)) == [
+            "workflow_0.json", "workflow_1.json", "workflow_2.json"]
+    finally:
+        index.close()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+HammingIndex：多索引查询与逐个比较的线性扫描结果一致（含删除和更新），分组
+"""
+import random
+
+import pytest
+
+from perceptual_hash import HammingIndex, hamming
+
+CHUNKS = 4
+# 每段最多枚举的翻转位数为 radius // CHUNKS，这里覆盖 0 到 3 位
+RADII = list(range(0, 4 * CHUNKS))
+
+
+def linear_scan(hashes, value, radius):
+    results = [(hamming(value, other), key) for key, other in hashes.items()]
+    return sorted(r for r in results if r[0] <= radius)
+
+
+def flip(value, rng, bits):
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture
+def hashes():
+    """随机 64 位哈希，另加一些只差几位的近似哈希，保证各距离都有结果"""
+    rng = random.Random(20240601)
+    result = {f"r{i}": rng.getrandbits(64) for i in range(1500)}
+    bases = list(result.values())[:100]
+    for i, base in enumerate(bases):
+        for j in range(5):
+            result[f"n{i}_{j}"] = flip(base, rng, rng.randint(0, 14))
+    return result
+
+
+def build(hashes):
+    index = HammingIndex(chunks=CHUNKS)
+    for key, value in hashes.items():
+        index.add(key, value)
+    return index
+
+
+def queries(hashes, count=60):
+    rng = random.Random(7)
+    values = list(hashes.values())
+    # 已有的哈希、它们的近似值，以及完全随机的值
+    return (rng.sample(values, count // 3)
+            + [flip(v, rng, rng.randint(1, 10)) for v in rng.sample(values, count // 3)]
+            + [rng.getrandbits(64) for _ in range(count // 3)])
+
+
+@pytest.mark.parametrize("radius", RADII)
+def test_search_matches_linear_scan(hashes, radius):
+    index = build(hashes)
+    for value in queries(hashes):
+        assert index.search(value, radius) == linear_scan(hashes, value, radius)
+
+
+def test_remove_and_update(hashes):
+    index = build(hashes)
+    rng = random.Random(3)
+    keys = list(hashes)
+    for key in rng.sample(keys, 300):
+        index.remove(key)
+        del hashes[key]
+    # 同一个键重新加入新值：旧值不应再被查到
+    for key in rng.sample(list(hashes), 300):
+        hashes[key] = flip(hashes[key], rng, rng.randint(1, 20))
+        index.add(key, hashes[key])
+    index.remove("missing")
+
+    assert len(index) == len(hashes)
+    assert all(index.get(key) == value for key, value in hashes.items())
+    assert sum(len(bucket) for table in index._tables for bucket in table.values()) == CHUNKS * len(hashes)
+    for radius in (0, 5, 10, 15):
+        for value in queries(hashes, 30):
+            assert index.search(value, radius) == linear_scan(hashes, value, radius)
+
+
+def test_groups_are_connected_components(hashes):
+    index = build(hashes)
+    radius = 6
+    groups = sorted(sorted(keys) for keys in index.groups(radius))
+
+    # 逐对比较得到的连通分量
+    keys = list(hashes)
+    component = {key: {key} for key in keys}
+    for i, a in enumerate(keys):
+        for b in keys[i + 1:]:
+            if hamming(hashes[a], hashes[b]) <= radius and component[a] is not component[b]:
+                merged = component[a] | component[b]
+                for key in merged:
+                    component[key] = merged
+    expected = sorted({tuple(sorted(c)) for c in component.values() if len(c) > 1})
+    assert groups == [list(keys) for keys in expected]
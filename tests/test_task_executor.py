@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+开启进程池时，无法pickle的函数或参数在解码线程池中执行，不影响进程池
+"""
+import os
+import asyncio
+import threading
+
+import pytest
+
+from task_executor import TaskExecutor
+
+
+def worker_pid():
+    return os.getpid()
+
+
+class Holder:
+    """实例带锁，绑定方法无法pickle（TypeError）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def pid(self):
+        return os.getpid()
+
+
+def pid_with(arg):
+    return os.getpid()
+
+
+@pytest.fixture
+def executor():
+    instance = TaskExecutor({"use_process_pool": True, "decode_workers": 1})
+    yield instance
+    instance.shutdown()
+
+
+def run(executor, func, *args):
+    return asyncio.run(executor.run("thumbnail", func, *args))
+
+
+def test_unpicklable_calls_run_in_threads(executor):
+    # 局部lambda无法pickle（PicklingError/AttributeError）
+    local = lambda: os.getpid()  # noqa: E731
+    assert run(executor, local) == os.getpid()
+    assert run(executor, Holder().pid) == os.getpid()
+    assert run(executor, pid_with, threading.Lock()) == os.getpid()
+    assert executor.use_process_pool
+
+    # 可pickle的模块级函数仍进入进程池
+    assert run(executor, worker_pid) != os.getpid()
+    assert executor._picklable[worker_pid] is True
+    assert executor._picklable[local] is False
+
+
+def test_errors_from_the_function_are_not_swallowed(executor):
+    with pytest.raises(TypeError):
+        run(executor, int, object())
+    assert executor.use_process_pool
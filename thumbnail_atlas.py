@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图图集模块 - 把目录一页的缩略图拼成一张雪碧图，附带JSON坐标表
+"""
+import os
+import json
+import math
+import hashlib
+import threading
+from pathlib import Path
+from PIL import Image
+
+try:
+    from .config import config
+    from .file_manager import file_manager
+    from .thumbnail_cache import ThumbnailCache
+except ImportError:
+    from config import config
+    from file_manager import file_manager
+    from thumbnail_cache import ThumbnailCache
+
+# 图块边长范围和单页图片数上限
+MIN_TILE = 32
+MAX_TILE = 512
+MAX_PER_PAGE = 400
+DEFAULT_COLUMNS = 10
+
+
+class AtlasBuilder:
+    """按目录分页构建并缓存缩略图图集
+
+    图集键由目录、分页参数、图块大小以及该页所有文件的名称/大小/修改时间
+    计算得到，任一文件变化都会生成新键；同一页的旧图集在新图集写入时
+    作为孤儿删除。图集复用 _generate_thumbnail 的缩略图缓存，不重复解码原图。
+    """
+
+    def __init__(self):
+        max_bytes = int(config.get("atlas_cache_max_mb", 256)) * 1024 * 1024
+        self.cache = ThumbnailCache(max_bytes=max_bytes, sidecar_suffixes=(".json",), subdir="atlases")
+        self._lock = threading.Lock()
+        self._building = {}  # key -> threading.Event，避免同一图集并发重复构建
+
+    @staticmethod
+    def _atlas_key(directory, page, per_page, tile, columns, items):
+        parts = [str(directory), str(page), str(per_page), str(tile), str(columns)]
+        for item in items:
+            parts.append(f"{item['name']}|{item['size']}|{item['modified_time']}")
+        return hashlib.md5("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def image_path(self, key):
+        """图集图片路径（key无效或不存在时返回None）"""
+        if not key or len(key) != 32 or any(c not in "0123456789abcdef" for c in key):
+            return None
+        path = self.cache.get(key)
+        return str(path) if path else None
+
+    def get_atlas(self, directory, page=1, per_page=100, tile=128, columns=DEFAULT_COLUMNS):
+        """获取（必要时构建）目录某一页的图集
+
+        Returns:
+            坐标表字典：{key, tile, columns, rows, width, height, total, tiles: [{index, path, name, x, y, w, h}]}，
+            目录无法访问时返回 {"error": ...}
+        """
+        tile = max(MIN_TILE, min(MAX_TILE, int(tile)))
+        per_page = max(1, min(MAX_PER_PAGE, int(per_page)))
+        columns = max(1, int(columns))
+
+        listing = file_manager.browse_directory(directory, page, per_page, "image")
+        if listing.get("error"):
+            return {"error": listing["error"]}
+        items = [item for item in listing["items"] if not item.get("is_folder")]
+
+        key = self._atlas_key(directory, page, per_page, tile, columns, items)
+        source = f"{directory}#page={page}&per_page={per_page}&tile={tile}&columns={columns}"
+
+        while True:
+            atlas_map = self._load_map(key)
+            if atlas_map is not None:
+                atlas_map["total"] = listing["total"]
+                return atlas_map
+            with self._lock:
+                event = self._building.get(key)
+                if event is None:
+                    event = self._building[key] = threading.Event()
+                    break
+            # 其他线程正在构建同一个图集，等待完成后重新读取
+            event.wait()
+
+        try:
+            atlas_map = self._build(key, items, tile, columns)
+            self.cache.add(key, source)
+            atlas_map["total"] = listing["total"]
+            return atlas_map
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            event.set()
+
+    def _load_map(self, key):
+        if not self.cache.get(key):
+            return None
+        try:
+            with open(self.cache.cache_dir / f"{key}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _build(self, key, items, tile, columns):
+        columns = min(columns, max(1, len(items)))
+        rows = max(1, math.ceil(len(items) / columns))
+        atlas = Image.new("RGB", (columns * tile, rows * tile), (26, 26, 26))
+        tiles = []
+
+        for index, item in enumerate(items):
+            x = (index % columns) * tile
+            y = (index // columns) * tile
+            entry = {"index": index, "path": item["path"], "name": item["name"], "x": x, "y": y, "w": 0, "h": 0}
+            thumb_path = file_manager._generate_thumbnail(Path(item["path"]))
+            if thumb_path:
+                try:
+                    with Image.open(thumb_path) as thumb:
+                        thumb.thumbnail((tile, tile), Image.Resampling.LANCZOS)
+                        # 在图块内居中
+                        offset_x = x + (tile - thumb.width) // 2
+                        offset_y = y + (tile - thumb.height) // 2
+                        atlas.paste(thumb.convert("RGB"), (offset_x, offset_y))
+                        entry.update({"x": offset_x, "y": offset_y, "w": thumb.width, "h": thumb.height})
+                except Exception as e:
+                    print(f"[Catsee] Error adding {item['name']} to atlas: {e}")
+            tiles.append(entry)
+
+        atlas_map = {
+            "key": key,
+            "tile": tile,
+            "columns": columns,
+            "rows": rows,
+            "width": atlas.width,
+            "height": atlas.height,
+            "tiles": tiles
+        }
+
+        # 先写坐标表再写图片，cache.get 只看图片是否存在
+        cache_dir = self.cache.cache_dir
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        map_path = cache_dir / f"{key}.json"
+        tmp_map = cache_dir / f"{key}.json{suffix}"
+        with open(tmp_map, "w", encoding="utf-8") as f:
+            json.dump(atlas_map, f, ensure_ascii=False)
+        os.replace(tmp_map, map_path)
+
+        image_path = self.cache.path_for(key)
+        tmp_image = cache_dir / f"{key}{suffix}"
+        atlas.save(tmp_image, "JPEG", quality=85)
+        os.replace(tmp_image, image_path)
+
+        print(f"[Catsee] Built atlas {key}: {len(tiles)} tiles, {atlas.width}x{atlas.height}")
+        return atlas_map
+
+
+# 全局图集构建器实例
+atlas_builder = AtlasBuilder()
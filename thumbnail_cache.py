@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图缓存模块 - 持久化磁盘缓存，按字节预算LRU淘汰
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+try:
+    from .config import config
+    from .image_decode import decode_for_thumbnail
+except ImportError:
+    from config import config
+    from image_decode import decode_for_thumbnail
+
+
+def render_thumbnail(source_path, dest_path, size, img=None):
+    """解码源图片并写出JPEG缩略图
+
+    模块级函数，可以被派发到进程池执行。先写临时文件再原子替换，
+    避免并发请求读到半成品。
+
+    Args:
+        source_path: 源图片路径
+        dest_path: 缩略图保存路径
+        size: 缩略图最大边长
+        img: 已打开的PIL图片（可选，避免重复打开）
+    """
+    from PIL import Image
+
+    # 按格式选择低分辨率解码路径（EXIF缩略图/DCT缩放/reduce）
+    opened = img is None
+    img, _ = decode_for_thumbnail(source_path, size, img)
+    decoded = img
+    try:
+        # 创建缩略图（剩余的整数倍缩小交给reduce，最后一步LANCZOS重采样）
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        # 转换为RGB模式（去除透明通道）
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            img = background
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        dest_path = Path(dest_path)
+        tmp_path = dest_path.with_name(f"{dest_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(tmp_path, "JPEG", quality=85, optimize=True)
+        os.replace(tmp_path, dest_path)
+    finally:
+        # 由本函数打开的图片及时关闭文件句柄，不等GC
+        if opened:
+            decoded.close()
+    return str(dest_path)
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存
+
+    缓存键为 FileManager._get_file_hash(fast=True)（路径+大小+修改时间），
+    文件保存为 temp/thumbnails/<hash>.jpg。index.json 记录每个键对应的源文件，
+    用于源文件变化或删除后清理孤儿缩略图。
+    """
+
+    INDEX_FILE = "index.json"
+    TOUCH_INTERVAL = 60  # 命中时最多每60秒刷新一次mtime，避免频繁写盘
+    FLUSH_EVERY = 100  # 新增多少条后写一次索引
+    FLUSH_INTERVAL = 30  # 或距离上次写索引超过多少秒
+
+    def __init__(self, cache_dir=None, max_bytes=None, sidecar_suffixes=(), subdir="thumbnails", suffix=".jpg"):
+        self._cache_dir = Path(cache_dir) if cache_dir else None
+        self._subdir = subdir
+        self.suffix = suffix  # 缓存文件扩展名
+        self.sidecar_suffixes = tuple(sidecar_suffixes)  # 随缓存项一起删除的附属文件后缀
+        if max_bytes is None:
+            max_bytes = int(config.get("thumbnail_cache_max_mb", 512)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> [size, last_used]，按最近使用排序
+        self._sources = {}  # key -> 源文件路径
+        self._path_keys = {}  # 源文件路径 -> key
+        self._total_bytes = 0
+        self._loaded = False
+        self._pending_writes = 0
+        self._last_flush = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cache_dir(self):
+        """缓存目录（首次访问时创建）"""
+        if self._cache_dir is None:
+            self._cache_dir = config.get_temp_dir() / self._subdir
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        return self._cache_dir
+
+    def path_for(self, key):
+        """缓存键对应的缩略图路径"""
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _ensure_loaded(self):
+        """从磁盘恢复缓存状态（按mtime还原LRU顺序）"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            found = []
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    for entry in it:
+                        name = entry.name
+                        if name.endswith(".tmp"):
+                            # 上次异常退出留下的半成品
+                            try:
+                                os.unlink(entry.path)
+                            except OSError:
+                                pass
+                            continue
+                        if not name.endswith(self.suffix):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        found.append((st.st_mtime, name[:-len(self.suffix)], st.st_size))
+            except OSError as e:
+                print(f"[Catsee] Error loading thumbnail cache: {e}")
+
+            found.sort()
+            for mtime, key, size in found:
+                self._entries[key] = [size, mtime]
+                self._total_bytes += size
+
+            try:
+                with open(self.cache_dir / self.INDEX_FILE, 'r', encoding='utf-8') as f:
+                    sources = json.load(f)
+                for key, source in sources.items():
+                    if key in self._entries:
+                        self._sources[key] = source
+                        self._path_keys[source] = key
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[Catsee] Error reading thumbnail index: {e}")
+
+            self._loaded = True
+            self._evict()
+            print(f"[Catsee] Thumbnail cache: {len(self._entries)} entries, {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    def get(self, key):
+        """查找缓存，命中返回路径并刷新LRU位置，否则返回None"""
+        if not key:
+            return None
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            path = self.path_for(key)
+            now = time.time()
+            if now - entry[1] > self.TOUCH_INTERVAL:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    # 文件被外部删除
+                    self._drop(key)
+                    self.misses += 1
+                    return None
+                except OSError:
+                    pass
+                entry[1] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def contains(self, key):
+        """是否已缓存（不影响LRU顺序和命中统计）"""
+        if not key:
+            return False
+        self._ensure_loaded()
+        with self._lock:
+            return key in self._entries
+
+    def add(self, key, source_path):
+        """登记一个刚写入 path_for(key) 的缩略图"""
+        self._ensure_loaded()
+        source = str(source_path)
+        try:
+            size = self.path_for(key).stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[0]
+            self._entries[key] = [size, time.time()]
+            self._total_bytes += size
+
+            # 同一源文件的旧缩略图（源文件已修改）即为孤儿
+            old_key = self._path_keys.get(source)
+            if old_key and old_key != key:
+                self._remove(old_key)
+            self._sources[key] = source
+            self._path_keys[source] = key
+
+            self._evict()
+            self._pending_writes += 1
+            if (self._pending_writes >= self.FLUSH_EVERY or
+                    time.time() - self._last_flush > self.FLUSH_INTERVAL):
+                self.flush()
+
+    def remove(self, key):
+        """删除指定缓存项"""
+        self._ensure_loaded()
+        with self._lock:
+            self._remove(key)
+
+    def remove_source(self, source_path):
+        """删除某个源文件的缩略图（如 delete_file 时）"""
+        self._ensure_loaded()
+        with self._lock:
+            key = self._path_keys.get(str(source_path))
+            if key:
+                self._remove(key)
+
+    def _remove(self, key):
+        self._drop(key)
+        paths = [self.path_for(key)] + [self.cache_dir / f"{key}{suffix}" for suffix in self.sidecar_suffixes]
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._pending_writes += 1
+
+    def _drop(self, key):
+        """只从内存状态中移除（不删文件）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[0]
+        source = self._sources.pop(key, None)
+        if source is not None and self._path_keys.get(source) == key:
+            del self._path_keys[source]
+
+    def _evict(self):
+        """超出字节预算时淘汰最久未使用的缩略图"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def cleanup_orphans(self, fingerprint):
+        """清理源文件已删除或已变化的缩略图
+
+        Args:
+            fingerprint: 计算源文件快速哈希的函数，签名为 fingerprint(Path) -> str
+        """
+        self._ensure_loaded()
+        with self._lock:
+            sources = list(self._sources.items())
+        removed = 0
+        for key, source in sources:
+            path = Path(source)
+            if not path.exists() or fingerprint(path) != key:
+                self.remove(key)
+                removed += 1
+        if removed:
+            print(f"[Catsee] Removed {removed} orphaned thumbnails")
+            self.flush()
+        return removed
+
+    def start_orphan_cleanup(self, fingerprint):
+        """在后台线程中加载缓存并清理孤儿"""
+        def run():
+            try:
+                self.cleanup_orphans(fingerprint)
+            except Exception as e:
+                print(f"[Catsee] Error cleaning thumbnail cache: {e}")
+        threading.Thread(target=run, name="catsee-thumb-cleanup", daemon=True).start()
+
+    def flush(self):
+        """把来源索引写回磁盘"""
+        with self._lock:
+            if not self._loaded or not self._pending_writes:
+                return
+            data = dict(self._sources)
+            self._pending_writes = 0
+            self._last_flush = time.time()
+        index_path = self.cache_dir / self.INDEX_FILE
+        tmp_path = index_path.with_name(f"{self.INDEX_FILE}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            print(f"[Catsee] Error writing thumbnail index: {e}")
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# 全局缩略图缓存实例
+thumbnail_cache = ThumbnailCache()
+atexit.register(thumbnail_cache.flush)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图预热模块 - 浏览目录后在后台提前生成缩略图
+"""
+import time
+import asyncio
+from pathlib import Path
+
+try:
+    from .config import config
+    from .file_manager import file_manager
+    from .thumbnail_cache import thumbnail_cache, render_thumbnail
+    from .task_executor import task_executor, QueueFullError
+except ImportError:
+    from config import config
+    from file_manager import file_manager
+    from thumbnail_cache import thumbnail_cache, render_thumbnail
+    from task_executor import task_executor, QueueFullError
+
+
+def _comfy_queue_busy():
+    """ComfyUI是否有正在执行或排队的任务（不在ComfyUI中运行时返回False）"""
+    try:
+        from server import PromptServer
+        queue = PromptServer.instance.prompt_queue
+        return queue.get_tasks_remaining() > 0
+    except Exception:
+        return False
+
+
+class ThumbnailPrewarmer:
+    """后台缩略图预热队列
+
+    每次浏览目录时调用 schedule()：先排当前可见页的图片，再排同目录的其余
+    图片，已在缓存中的文件直接剔除。同一时间只有一个预热任务，浏览新目录或
+    调用 cancel() 会取消正在进行的任务。
+
+    节流方式：
+      - 预热在解码池中以独立的 prewarm 任务类型执行，并发数由
+        executor.limits.prewarm 控制（默认1）
+      - 前台缩略图请求排队时暂停，让出解码池
+      - 每张之间间隔 delay_ms；ComfyUI队列非空时改为 busy_delay_ms
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "max_files": 5000,
+        "delay_ms": 20,
+        "busy_delay_ms": 500,
+        "idle_poll_ms": 200
+    }
+
+    def __init__(self, options=None):
+        opts = config.section("prewarm", self.DEFAULTS, options)
+        self.enabled = bool(opts["enabled"])
+        self.max_files = max(0, int(opts["max_files"]))
+        self.delay = max(0, int(opts["delay_ms"])) / 1000
+        self.busy_delay = max(0, int(opts["busy_delay_ms"])) / 1000
+        self.idle_poll = max(10, int(opts["idle_poll_ms"])) / 1000
+
+        self._task = None
+        self._directory = None
+        self._total = 0
+        self._done = 0
+        self._started_at = 0
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def _pending_work(directory, visible_items, max_files):
+        """组合预热顺序（可见页在前）并剔除已缓存的缩略图，在I/O线程中执行"""
+        seen = set()
+        ordered = []
+
+        def push(item):
+            path = item.get("path")
+            if item.get("is_folder") or item.get("type") != "image" or path in seen:
+                return
+            seen.add(path)
+            ordered.append((path, item.get("hash")))
+
+        for item in visible_items:
+            push(item)
+        rest = file_manager.browse_directory(directory, 1, max_files, "image")
+        for item in rest.get("items", []):
+            push(item)
+
+        work = []
+        for path, file_hash in ordered[:max_files]:
+            # 列表条目自带快速哈希，与缩略图缓存键一致，无需再stat
+            if file_hash and thumbnail_cache.contains(file_hash):
+                continue
+            work.append((path, file_hash))
+        return work, len(ordered) - len(work)
+
+    def schedule(self, directory, visible_items):
+        """为目录安排预热，取消之前的任务
+
+        Args:
+            directory: 目录路径
+            visible_items: 当前页的条目（browse_directory 返回的 items）
+        """
+        if not self.enabled or not self.max_files:
+            return
+        self.cancel()
+        self._directory = str(directory)
+        self._total = 0
+        self._done = 0
+        self._started_at = time.time()
+        self._task = asyncio.ensure_future(self._run(self._directory, list(visible_items)))
+
+    def cancel(self, directory=None):
+        """取消正在进行的预热；指定 directory 时只在目录一致时取消
+
+        Returns:
+            是否取消了任务
+        """
+        task = self._task
+        if task is None or task.done():
+            return False
+        if directory is not None and str(directory) != self._directory:
+            return False
+        task.cancel()
+        self._task = None
+        self.cancelled += 1
+        return True
+
+    async def _wait_turn(self):
+        """前台缩略图请求优先；ComfyUI在执行任务时放慢节奏"""
+        while task_executor.pending("thumbnail"):
+            await asyncio.sleep(self.idle_poll)
+        await asyncio.sleep(self.busy_delay if _comfy_queue_busy() else self.delay)
+
+    async def _run(self, directory, visible_items):
+        try:
+            work, cached = await task_executor.run(
+                'io', self._pending_work, directory, visible_items, self.max_files
+            )
+            self.skipped += cached
+            self._total = len(work)
+            for path, file_hash in work:
+                await self._wait_turn()
+                try:
+                    # 前台可能已生成同一张，渲染前再查一次
+                    file_hash, thumb_path = await task_executor.run('io', file_manager.lookup_thumbnail, Path(path))
+                    if not file_hash or thumb_path:
+                        self.skipped += 1
+                    else:
+                        await task_executor.run(
+                            'prewarm', render_thumbnail,
+                            path, str(thumbnail_cache.path_for(file_hash)), file_manager.thumbnail_size
+                        )
+                        await task_executor.run('io', thumbnail_cache.add, file_hash, path)
+                        self.generated += 1
+                except QueueFullError:
+                    # 服务繁忙，稍后继续
+                    await asyncio.sleep(self.idle_poll)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[Catsee] Prewarm failed for {path}: {e}")
+                self._done += 1
+            if work:
+                elapsed = time.time() - self._started_at
+                print(f"[Catsee] Prewarmed {len(work)} thumbnails in {directory} ({elapsed:.1f}s)")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[Catsee] Prewarm error in {directory}: {e}")
+
+    def stats(self):
+        """预热状态"""
+        running = self._task is not None and not self._task.done()
+        return {
+            "enabled": self.enabled,
+            "running": running,
+            "directory": self._directory if running else None,
+            "progress": {"done": self._done, "total": self._total} if running else None,
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "cancelled": self.cancelled
+        }
+
+
+# 全局预热实例
+thumbnail_prewarmer = ThumbnailPrewarmer()
@@ -124,6 +124,7 @@ function toggleBrowser() {
             browser.style.display = 'flex';
         } else {
             browser.style.display = 'none';
+            cancelThumbnailPrewarm();
         }
     } else {
         // 如果浏览器不存在，创建它
@@ -272,6 +273,7 @@ function createBrowser() {
     // 绑定事件
     document.getElementById('close-btn').addEventListener('click', () => {
         browser.style.display = 'none';
+        cancelThumbnailPrewarm();
     });
     
     document.getElementById('back-btn').addEventListener('click', goBack);
@@ -298,6 +300,7 @@ function createBrowser() {
             // 只有在浏览器窗口打开时才处理ESC键
             if (browser && browser.style.display !== 'none') {
                 browser.style.display = 'none';
+                cancelThumbnailPrewarm();
                 e.preventDefault(); // 阻止默认行为
                 e.stopPropagation(); // 阻止事件冒泡
             }
@@ -319,6 +322,8 @@ let historyIndex = -1;
 let currentView = 'grid';
 let currentSort = 'name';
 let allItems = [];
+let currentTotal = 0;  // 目录条目总数（超过单页数量时 allItems 只是第一页）
+let displayedItems = [];  // 当前显示的条目（显示顺序）
 
 // 初始化浏览器
 async function initializeBrowser() {
@@ -572,6 +577,7 @@ async function showDrivesInMain() {
             
             statusBar.textContent = `找到 ${drives.length} 个驱动器`;
             currentPath = '';
+            liveSubscribe(null);
             
         } else {
             showError('未找到驱动器');
@@ -582,6 +588,68 @@ async function showDrivesInMain() {
     }
 }
 
+// 流式浏览：第一屏的条目数
+const STREAM_FIRST_SCREEN = 100;
+let browseLoadToken = 0;
+
+// 流式读取目录（NDJSON）：收到第一屏后调用 onFirstScreen，全部收到后返回与
+// /browser/api/browse 相同结构的结果（条目为扫描顺序，文件夹在前）；接口不可用时返回null
+async function fetchDirectoryStream(path, onFirstScreen) {
+    const response = await fetch('/browser/api/browse/stream?path=' + encodeURIComponent(path));
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!response.ok) {
+        return contentType.includes('json') ? await response.json() : null;
+    }
+    if (!contentType.includes('ndjson') || !response.body) {
+        return null;
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const items = [];
+    let buffer = '';
+    let summary = null;
+    let firstScreenShown = false;
+    const handleLine = (line) => {
+        if (!line.trim()) return;
+        const record = JSON.parse(line);
+        if (record.record === 'summary') {
+            summary = record;
+        } else if (record.record === 'error') {
+            throw new Error(record.error);
+        } else {
+            items.push(record);
+        }
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+        if (!firstScreenShown && items.length >= STREAM_FIRST_SCREEN) {
+            firstScreenShown = true;
+            onFirstScreen(items.slice());
+        }
+    }
+    handleLine(buffer);
+    if (!summary) {
+        throw new Error('目录列表不完整');
+    }
+    return {
+        success: true,
+        streamed: true,
+        data: {
+            items: items,
+            total: summary.total,
+            current_path: summary.current_path,
+            parent_path: summary.parent_path
+        }
+    };
+}
+
 // 浏览路径
 async function browsePath(path) {
     console.log('[CatSee] browsePath called with:', path);
@@ -605,21 +673,37 @@ async function browsePath(path) {
     statusBar.textContent = '正在加载 ' + path + '...';
     contentArea.innerHTML = '<div style="text-align: center; padding: 50px; color: #888;"><div style="font-size: 48px; margin-bottom: 20px;">⏳</div><p style="color: #999;">正在加载...</p></div>';
     
+    const loadToken = ++browseLoadToken;
+    // 先订阅目录变化再读取列表，加载期间收到的变化暂存，加载完成后应用
+    livePending = { path: path, messages: [] };
+    liveSubscribe(path);
     try {
-        const response = await fetch('/browser/api/browse?path=' + encodeURIComponent(path));
-        const text = await response.text();
-        
-        console.log('[CatSee] Browse response:', text.substring(0, 200));
+        // 流式读取：大目录收到第一屏就先显示，全部到齐后按当前排序方式重新渲染
+        let result = await fetchDirectoryStream(path, (firstItems) => {
+            if (loadToken !== browseLoadToken) return;
+            showFiles(firstItems, path);
+            statusBar.textContent = '正在加载 ' + path + '... 已收到 ' + firstItems.length + ' 个项目';
+        });
         
-        let result;
-        try {
-            result = JSON.parse(text);
-        } catch (e) {
-            console.error('[CatSee] JSON parse error:', e);
-            showError('API返回格式错误');
-            return;
+        if (result === null) {
+            // 服务端按当前排序方式返回（文件夹在前）
+            const response = await fetch('/browser/api/browse?path=' + encodeURIComponent(path) + '&sort=' + encodeURIComponent(currentSort));
+            const text = await response.text();
+            
+            console.log('[CatSee] Browse response:', text.substring(0, 200));
+            
+            try {
+                result = JSON.parse(text);
+            } catch (e) {
+                console.error('[CatSee] JSON parse error:', e);
+                showError('API返回格式错误');
+                return;
+            }
         }
         
+        // 加载期间已切换到其他目录
+        if (loadToken !== browseLoadToken) return;
+        
         if (result.success && result.data) {
             const items = result.data.items || [];
             console.log('[CatSee] Found', items.length, 'items');
@@ -634,31 +718,193 @@ async function browsePath(path) {
             }
             currentPath = path;
             allItems = items;
+            currentTotal = result.data.total || items.length;
             
             // 更新面包屑
             updateBreadcrumb(path);
             
-            // 显示文件
-            showFiles(items, path);
+            // 显示文件（流式结果为扫描顺序，在客户端排序）
+            if (result.streamed) {
+                sortFiles(currentSort);
+            } else {
+                showFiles(items, path);
+            }
             
             // 更新状态栏
-            const folders = items.filter(i => i.is_folder).length;
-            const files = items.length - folders;
-            statusBar.textContent = `${items.length} 个项目 | ${folders} 个文件夹, ${files} 个文件`;
+            updateStatusBar();
+            
+            // 应用加载期间推送的变化
+            const pending = livePending && livePending.path === path ? livePending.messages : [];
+            livePending = null;
+            pending.forEach(handleLiveMessage);
             
         } else {
+            livePending = null;
             showError(result.error || '无法访问此位置');
         }
     } catch (error) {
+        if (loadToken === browseLoadToken) livePending = null;
         console.error('[CatSee] Browse error:', error);
         showError('加载失败: ' + error.message);
     }
 }
 
+// 状态栏：当前目录的条目统计
+function updateStatusBar() {
+    const statusBar = document.getElementById('status-bar');
+    if (!statusBar) return;
+    const folders = allItems.filter(i => i.is_folder).length;
+    const files = allItems.length - folders;
+    statusBar.textContent = `${allItems.length} 个项目 | ${folders} 个文件夹, ${files} 个文件`;
+}
+
+// ---- 目录变化推送 ----
+// 通过 /browser/api/ws 订阅当前目录，服务端推送新增/修改/删除的条目，
+// 只更新受影响的条目而不重新加载整个目录
+const LIVE_RETRY_MAX = 30000;
+let liveSocket = null;
+let liveWantedPath = null;  // 应该订阅的目录
+let liveSubscribedPath = null;  // 已经发送订阅的目录
+let liveRetryDelay = 1000;
+let liveConnected = false;  // 曾经连接成功过（重连后重新加载，补上断开期间的变化）
+let livePending = null;  // 正在加载的目录 { path, messages }
+
+function connectLiveUpdates() {
+    if (liveSocket || typeof WebSocket === 'undefined') return;
+    const protocol = location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const socket = new WebSocket(protocol + location.host + '/browser/api/ws');
+    liveSocket = socket;
+    
+    socket.addEventListener('open', () => {
+        liveRetryDelay = 1000;
+        const reconnected = liveConnected;
+        liveConnected = true;
+        liveSubscribedPath = null;
+        if (!liveWantedPath) return;
+        liveSubscribe(liveWantedPath);
+        if (reconnected && liveWantedPath === currentPath && !livePending) {
+            browsePath(currentPath);
+        }
+    });
+    
+    socket.addEventListener('message', (event) => {
+        try {
+            handleLiveMessage(JSON.parse(event.data));
+        } catch (error) {
+            console.warn('[CatSee] 目录变化处理失败:', error);
+        }
+    });
+    
+    socket.addEventListener('close', () => {
+        liveSocket = null;
+        liveSubscribedPath = null;
+        setTimeout(connectLiveUpdates, liveRetryDelay);
+        liveRetryDelay = Math.min(liveRetryDelay * 2, LIVE_RETRY_MAX);
+    });
+}
+
+// 订阅目录变化（path为null时取消订阅）
+function liveSubscribe(path) {
+    liveWantedPath = path;
+    if (!liveSocket) {
+        connectLiveUpdates();
+        return;
+    }
+    if (liveSocket.readyState !== WebSocket.OPEN || liveSubscribedPath === path) return;
+    if (liveSubscribedPath) {
+        liveSocket.send(JSON.stringify({ type: 'unsubscribe', path: liveSubscribedPath }));
+    }
+    liveSubscribedPath = path;
+    if (path) {
+        liveSocket.send(JSON.stringify({ type: 'subscribe', path: path }));
+    }
+}
+
+function handleLiveMessage(message) {
+    if (message.type === 'error') {
+        console.warn('[CatSee] 目录变化推送:', message.error);
+        return;
+    }
+    if (message.type !== 'delta' && message.type !== 'resync') return;
+    if (livePending && livePending.path === message.path) {
+        livePending.messages.push(message);
+        return;
+    }
+    if (message.path !== currentPath) return;
+    
+    if (message.type === 'resync') {
+        // 变化太多或目录本身被删除/改名
+        browsePath(currentPath);
+    } else {
+        applyDirectoryDelta(message);
+    }
+}
+
+// 把一次变化应用到当前目录：删除/替换/插入受影响的条目（按当前排序插入）
+function applyDirectoryDelta(delta) {
+    const changed = [...delta.added, ...delta.modified];
+    const gone = new Set(delta.removed);
+    changed.forEach(item => gone.add(item.path));
+    
+    const before = allItems.length;
+    allItems = allItems.filter(item => !gone.has(item.path)).concat(changed);
+    currentTotal = Math.max(allItems.length, currentTotal + allItems.length - before);
+    
+    const contentArea = document.getElementById('content-area');
+    const container = contentArea && contentArea.querySelector('.file-items');
+    if (!container || displayedItems.length === 0 || allItems.length === 0) {
+        // 空目录的提示页等没有条目容器，整体渲染
+        sortFiles(currentSort);
+        updateStatusBar();
+        return;
+    }
+    
+    const elements = new Map();
+    container.querySelectorAll('.file-item').forEach(el => elements.set(el.dataset.path, el));
+    const pathAttr = (path) => path.replace(/\\/g, '\\\\');
+    
+    gone.forEach(path => {
+        const el = elements.get(pathAttr(path));
+        if (el) el.remove();
+    });
+    displayedItems = displayedItems.filter(item => !gone.has(item.path));
+    
+    const template = document.createElement('template');
+    const inserted = [];
+    changed.forEach(item => {
+        // 二分查找插入位置
+        let low = 0;
+        let high = displayedItems.length;
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (compareItems(displayedItems[mid], item, currentSort) <= 0) low = mid + 1;
+            else high = mid;
+        }
+        template.innerHTML = (currentView === 'grid' ? gridItemHTML(item) : listItemHTML(item)).trim();
+        const el = template.content.firstElementChild;
+        const next = displayedItems[low] && elements.get(pathAttr(displayedItems[low].path));
+        if (next && next.isConnected) {
+            container.insertBefore(el, next);
+        } else {
+            container.appendChild(el);
+        }
+        elements.set(pathAttr(item.path), el);
+        displayedItems.splice(low, 0, item);
+        inserted.push(el);
+    });
+    
+    bindFileItemEvents(inserted);
+    if (currentView === 'grid' && inserted.length > 0) {
+        loadGridThumbnails(contentArea);
+    }
+    updateStatusBar();
+}
+
 // 显示文件列表
 function showFiles(items, path) {
     const contentArea = document.getElementById('content-area');
     if (!contentArea) return;
+    displayedItems = items;
     
     if (items.length === 0) {
         contentArea.innerHTML = `
@@ -685,52 +931,146 @@ function showFiles(items, path) {
 function renderGridView(items, path, contentArea) {
     contentArea.innerHTML = `
         <div style="padding: 0 15px;">
-            <div style="display: grid; grid-template-columns: repeat(auto-fill, minmax(100px, 1fr)); gap: 10px;">
-                ${items.map(item => {
-                    const isFolder = item.is_folder;
-                    const icon = getFileIcon(item.name, isFolder);
-                    const displayName = item.name.length > 18 ? item.name.substring(0, 15) + '...' : item.name;
-                    const isImage = !isFolder && isImageFile(item.name);
-                    const isVideo = !isFolder && isVideoFile(item.name);
-                    
-                    return `
-                        <div class="file-item" data-path="${item.path.replace(/\\/g, '\\\\')}" data-is-folder="${isFolder}" data-item='${JSON.stringify(item).replace(/'/g, "&apos;")}' style="
-                            padding: 10px;
-                            background: #2a2a2a;
-                            border: 1px solid #444;
-                            border-radius: 6px;
-                            cursor: pointer;
-                            text-align: center;
-                            transition: all 0.2s;
-                        ">
-                            ${isImage ? `
-                                <div style="width: 80px; height: 80px; margin: 0 auto 8px; background: #1a1a1a; border-radius: 4px; overflow: hidden; display: flex; align-items: center; justify-content: center;">
-                                    <img src="/browser/api/thumbnail?path=${encodeURIComponent(item.path)}" style="max-width: 100%; max-height: 100%; object-fit: contain;" 
-                                         onload="console.log('[CatSee] 缩略图加载成功:', '${item.name}')" 
-                                         onerror="console.error('[CatSee] 缩略图加载失败:', '${item.name}', this.src); this.style.display='none'; this.parentElement.innerHTML='<div style=\\'font-size: 32px;\\'>${icon}</div>'">
-                                </div>
-                            ` : isVideo ? `
-                                <div style="width: 80px; height: 80px; margin: 0 auto 8px; background: #1a1a1a; border-radius: 4px; display: flex; align-items: center; justify-content: center; position: relative;">
-                                    <div style="font-size: 32px;">${icon}</div>
-                                    <div style="position: absolute; bottom: 5px; right: 5px; font-size: 16px; opacity: 0.8;">▶️</div>
-                                </div>
-                            ` : `
-                                <div style="font-size: 32px; margin-bottom: 8px;">${icon}</div>
-                            `}
-                            <div style="font-size: 11px; color: #e0e0e0; word-break: break-word; line-height: 1.3;" title="${item.name}">${displayName}</div>
-                        </div>
-                    `;
-                }).join('')}
+            <div class="file-items" style="display: grid; grid-template-columns: repeat(auto-fill, minmax(100px, 1fr)); gap: 10px;">
+                ${items.map(gridItemHTML).join('')}
             </div>
         </div>
     `;
+    
+    loadGridThumbnails(contentArea);
+}
+
+// 网格视图中的单个条目
+function gridItemHTML(item) {
+    const isFolder = item.is_folder;
+    const icon = getFileIcon(item.name, isFolder);
+    const displayName = item.name.length > 18 ? item.name.substring(0, 15) + '...' : item.name;
+    const isImage = !isFolder && isImageFile(item.name);
+    const isVideo = !isFolder && isVideoFile(item.name);
+    
+    return `
+        <div class="file-item" data-path="${item.path.replace(/\\/g, '\\\\')}" data-is-folder="${isFolder}" data-item='${JSON.stringify(item).replace(/'/g, "&apos;")}' style="
+            padding: 10px;
+            background: #2a2a2a;
+            border: 1px solid #444;
+            border-radius: 6px;
+            cursor: pointer;
+            text-align: center;
+            transition: all 0.2s;
+        ">
+            ${isImage ? `
+                <div style="width: 80px; height: 80px; margin: 0 auto 8px; background: #1a1a1a; border-radius: 4px; overflow: hidden; display: flex; align-items: center; justify-content: center;">
+                    <img data-thumb-path="${encodeURIComponent(item.path)}" style="max-width: 100%; max-height: 100%; object-fit: contain;" 
+                         onload="console.log('[CatSee] 缩略图加载成功:', '${item.name}')" 
+                         onerror="console.error('[CatSee] 缩略图加载失败:', '${item.name}', this.src); this.style.display='none'; this.parentElement.innerHTML='<div style=\\'font-size: 32px;\\'>${icon}</div>'">
+                </div>
+            ` : isVideo ? `
+                <div style="width: 80px; height: 80px; margin: 0 auto 8px; background: #1a1a1a; border-radius: 4px; display: flex; align-items: center; justify-content: center; position: relative;">
+                    <div style="font-size: 32px;">${icon}</div>
+                    <div style="position: absolute; bottom: 5px; right: 5px; font-size: 16px; opacity: 0.8;">▶️</div>
+                </div>
+            ` : `
+                <div style="font-size: 32px; margin-bottom: 8px;">${icon}</div>
+            `}
+            <div style="font-size: 11px; color: #e0e0e0; word-break: break-word; line-height: 1.3;" title="${item.name}">${displayName}</div>
+        </div>
+    `;
+}
+
+// 关闭浏览器后停止后台缩略图预热（浏览其他目录时服务器会自动切换）
+function cancelThumbnailPrewarm() {
+    fetch('/browser/api/prewarm/cancel', { method: 'POST' }).catch(() => {});
+}
+
+// 批量缩略图：每批一个请求，服务器按生成完成顺序逐帧返回
+const THUMBNAIL_BATCH_SIZE = 100;
+let thumbnailLoadToken = 0;
+
+async function loadGridThumbnails(contentArea) {
+    const token = ++thumbnailLoadToken;
+    // 只加载还没有缩略图的图片（推送新增条目后再次调用时跳过已加载的）
+    const imgs = Array.from(contentArea.querySelectorAll('img[data-thumb-path]:not([data-thumb-done])'))
+        .filter(img => !img.getAttribute('src'));
+    
+    for (let i = 0; i < imgs.length; i += THUMBNAIL_BATCH_SIZE) {
+        // 已切换目录或重新渲染，停止加载旧的缩略图
+        if (token !== thumbnailLoadToken) return;
+        const batch = imgs.slice(i, i + THUMBNAIL_BATCH_SIZE);
+        try {
+            await fetchThumbnailBatch(batch, token);
+        } catch (error) {
+            console.warn('[CatSee] 批量缩略图加载失败，改为逐个加载:', error);
+        }
+        // 没有收到的缩略图回退到单个请求
+        if (token !== thumbnailLoadToken) return;
+        batch.forEach(img => {
+            if (!img.src && !img.dataset.thumbDone) {
+                img.src = '/browser/api/thumbnail?path=' + img.dataset.thumbPath;
+            }
+        });
+    }
+}
+
+async function fetchThumbnailBatch(imgs, token) {
+    const response = await fetch('/browser/api/thumbnails', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ paths: imgs.map(img => decodeURIComponent(img.dataset.thumbPath)) })
+    });
+    if (!response.ok || !response.body) {
+        throw new Error('HTTP ' + response.status);
+    }
+    
+    // 帧格式：4字节大端头长度 + JSON头 {index, status, size, type} + size字节图片
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = new Uint8Array(0);
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (token !== thumbnailLoadToken) {
+            reader.cancel();
+            return;
+        }
+        if (value) {
+            const merged = new Uint8Array(buffer.length + value.length);
+            merged.set(buffer);
+            merged.set(value, buffer.length);
+            buffer = merged;
+        }
+        
+        let offset = 0;
+        while (buffer.length - offset >= 4) {
+            const headerLength = new DataView(buffer.buffer, buffer.byteOffset + offset, 4).getUint32(0);
+            if (buffer.length - offset < 4 + headerLength) break;
+            const header = JSON.parse(decoder.decode(buffer.subarray(offset + 4, offset + 4 + headerLength)));
+            const frameEnd = offset + 4 + headerLength + header.size;
+            if (buffer.length < frameEnd) break;
+            
+            const img = imgs[header.index];
+            if (img) {
+                img.dataset.thumbDone = 'true';
+                if (header.status === 200) {
+                    const url = URL.createObjectURL(new Blob([buffer.slice(offset + 4 + headerLength, frameEnd)], { type: header.type }));
+                    img.addEventListener('load', () => URL.revokeObjectURL(url), { once: true });
+                    img.src = url;
+                } else {
+                    img.dispatchEvent(new Event('error'));
+                }
+            }
+            offset = frameEnd;
+        }
+        buffer = buffer.slice(offset);
+        
+        if (done) break;
+    }
 }
 
 // 列表视图
 function renderListView(items, path, contentArea) {
     contentArea.innerHTML = `
         <div style="padding: 0 15px;">
-            <div style="background: #2a2a2a; border-radius: 6px; border: 1px solid #444; overflow: hidden;">
+            <div class="file-items" style="background: #2a2a2a; border-radius: 6px; border: 1px solid #444; overflow: hidden;">
                 <!-- 表头 -->
                 <div style="display: grid; grid-template-columns: 40px 1fr 120px 150px; padding: 10px 15px; background: #1a1a1a; border-bottom: 1px solid #444; font-size: 12px; color: #888; font-weight: bold;">
                     <div></div>
@@ -739,39 +1079,40 @@ function renderListView(items, path, contentArea) {
                     <div>修改时间</div>
                 </div>
                 <!-- 文件列表 -->
-                ${items.map(item => {
-                    const isFolder = item.is_folder;
-                    const icon = getFileIcon(item.name, isFolder);
-                    const size = isFolder ? '-' : formatFileSize(item.size || 0);
-                    const time = formatTime(item.modified_time);
-                    
-                    return `
-                        <div class="file-item" data-path="${item.path.replace(/\\/g, '\\\\')}" data-is-folder="${isFolder}" data-item='${JSON.stringify(item).replace(/'/g, "&apos;")}' style="
-                            display: grid;
-                            grid-template-columns: 40px 1fr 120px 150px;
-                            padding: 8px 15px;
-                            border-bottom: 1px solid #333;
-                            cursor: pointer;
-                            transition: background 0.2s;
-                            align-items: center;
-                        ">
-                            <div style="font-size: 24px;">${icon}</div>
-                            <div style="color: #e0e0e0; font-size: 13px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="${item.name}">${item.name}</div>
-                            <div style="color: #999; font-size: 12px;">${size}</div>
-                            <div style="color: #999; font-size: 12px;">${time}</div>
-                        </div>
-                    `;
-                }).join('')}
+                ${items.map(listItemHTML).join('')}
             </div>
         </div>
     `;
 }
 
-// 绑定文件项事件
-function bindFileItemEvents() {
-    const allItems = Array.from(document.querySelectorAll('.file-item'));
-    
-    allItems.forEach((item, index) => {
+// 列表视图中的单个条目
+function listItemHTML(item) {
+    const isFolder = item.is_folder;
+    const icon = getFileIcon(item.name, isFolder);
+    const size = isFolder ? '-' : formatFileSize(item.size || 0);
+    const time = formatTime(item.modified_time);
+    
+    return `
+        <div class="file-item" data-path="${item.path.replace(/\\/g, '\\\\')}" data-is-folder="${isFolder}" data-item='${JSON.stringify(item).replace(/'/g, "&apos;")}' style="
+            display: grid;
+            grid-template-columns: 40px 1fr 120px 150px;
+            padding: 8px 15px;
+            border-bottom: 1px solid #333;
+            cursor: pointer;
+            transition: background 0.2s;
+            align-items: center;
+        ">
+            <div style="font-size: 24px;">${icon}</div>
+            <div style="color: #e0e0e0; font-size: 13px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="${item.name}">${item.name}</div>
+            <div style="color: #999; font-size: 12px;">${size}</div>
+            <div style="color: #999; font-size: 12px;">${time}</div>
+        </div>
+    `;
+}
+
+// 绑定文件项事件（默认为全部条目；推送新增的条目单独绑定）
+function bindFileItemEvents(elements = document.querySelectorAll('.file-item')) {
+    elements.forEach((item) => {
         item.addEventListener('click', async function() {
             const path = this.dataset.path;
             const isFolder = this.dataset.isFolder === 'true';
@@ -782,8 +1123,8 @@ function bindFileItemEvents() {
                 // 点击文件，显示预览
                 const itemData = JSON.parse(this.dataset.item || '{}');
                 
-                // 获取所有文件（非文件夹）的列表
-                const fileList = allItems
+                // 获取所有文件（非文件夹）的列表（点击时读取，包含推送更新的条目）
+                const fileList = Array.from(document.querySelectorAll('.file-item'))
                     .filter(el => el.dataset.isFolder !== 'true')
                     .map(el => JSON.parse(el.dataset.item || '{}'));
                 
@@ -1389,21 +1730,27 @@ async function showFilePreview(item, fileList = null, fileIndex = -1) {
         importBtn.addEventListener('click', async (e) => {
             e.stopPropagation();
             
-            // 获取元数据
+            // 摘要元数据只列出可用的子资源，完整工作流在导入时才获取
             const metadata = await metadataPromise;
-            if (!metadata || !metadata.comfy_workflow) {
+            if (!metadata || !(metadata.resources || []).includes('workflow')) {
                 alert('❌ 此图片没有ComfyUI工作流信息');
                 return;
             }
             
             try {
+                const workflowResponse = await fetch(`/browser/api/metadata/workflow?path=${encodeURIComponent(item.path)}`);
+                const workflowResult = await workflowResponse.json();
+                if (!workflowResult.success || !workflowResult.data) {
+                    throw new Error(workflowResult.error || '工作流获取失败');
+                }
+                
                 // 直接使用ComfyUI的app对象导入工作流
                 if (window.app && window.app.loadGraphData) {
                     // 清空当前工作流
                     window.app.graph.clear();
                     
                     // 加载新工作流
-                    await window.app.loadGraphData(metadata.comfy_workflow);
+                    await window.app.loadGraphData(workflowResult.data);
                     
                     importBtn.innerHTML = '✓ 已导入';
                     importBtn.style.background = 'rgba(76, 175, 80, 0.9)';
@@ -1710,9 +2057,9 @@ async function showFilePreview(item, fileList = null, fileIndex = -1) {
                 `;
             }
             
-            // ComfyUI参数
-            if (metadata.comfy_prompt) {
-                const comfyInfo = extractComfyUIInfo(metadata.comfy_prompt);
+            // ComfyUI参数（摘要中由服务端提取为comfy_params，完整元数据时在前端解析）
+            if (metadata.comfy_params || metadata.comfy_prompt) {
+                const comfyInfo = metadata.comfy_params || extractComfyUIInfo(metadata.comfy_prompt);
                 if (comfyInfo && (comfyInfo.positive_prompt || comfyInfo.model)) {
                     metadataHtml += `
                         <div style="margin-top: 20px; padding-top: 15px; border-top: 2px solid #444;">
@@ -2106,30 +2453,38 @@ function sortFiles(sortBy) {
     
     if (allItems.length === 0) return;
     
-    const sorted = [...allItems].sort((a, b) => {
-        // 文件夹始终在前
-        if (a.is_folder && !b.is_folder) return -1;
-        if (!a.is_folder && b.is_folder) return 1;
-        
-        switch (sortBy) {
-            case 'name':
-                return a.name.localeCompare(b.name);
-            case 'date':
-                return (b.modified_time || 0) - (a.modified_time || 0);
-            case 'size':
-                return (b.size || 0) - (a.size || 0);
-            case 'type':
-                const extA = a.name.split('.').pop().toLowerCase();
-                const extB = b.name.split('.').pop().toLowerCase();
-                return extA.localeCompare(extB);
-            default:
-                return 0;
-        }
-    });
+    // 只拿到了部分条目时由服务端排序
+    if (allItems.length < currentTotal) {
+        browsePath(currentPath);
+        return;
+    }
+    
+    const sorted = [...allItems].sort((a, b) => compareItems(a, b, sortBy));
     
     showFiles(sorted, currentPath);
 }
 
+// 排序比较（文件夹始终在前）
+function compareItems(a, b, sortBy) {
+    if (a.is_folder && !b.is_folder) return -1;
+    if (!a.is_folder && b.is_folder) return 1;
+    
+    switch (sortBy) {
+        case 'name':
+            return a.name.localeCompare(b.name);
+        case 'date':
+            return (b.modified_time || 0) - (a.modified_time || 0);
+        case 'size':
+            return (b.size || 0) - (a.size || 0);
+        case 'type':
+            const extA = a.name.split('.').pop().toLowerCase();
+            const extB = b.name.split('.').pop().toLowerCase();
+            return extA.localeCompare(extB);
+        default:
+            return 0;
+    }
+}
+
 // 更新面包屑
 function updateBreadcrumb(path) {
     const breadcrumb = document.getElementById('breadcrumb');